@@ -9,227 +9,2715 @@ DFT or FFT methods.
 
 """
 
-import math, random, time, sys, gc
-import timeDict
+import math, sys, collections, heapq, itertools, threading
+from fourier_array import CoefficientArray
+from fourier_cache import LRUCache
+
+## Importing this module should be quick and do nothing else, since
+## short scripts and worker processes import it just to multiply a few
+## polynomials. So the modules that only some methods need (random,
+## hashlib, and timeDict for profiling) are imported by those methods,
+## and NumPy, which takes longer to import than everything else here,
+## is only imported the first time it is needed (see __load_numpy()).
+
+## NumPy is optional. When it is installed, the 'numpy' engine stores
+## coefficients in complex128 arrays and runs every level of the FFT as
+## whole-array operations, otherwise everything uses plain lists. This
+## is None until NumPy has been imported.
+numpy = None
+__numpy_installed = None ## None until the import has been tried
 
 __DEBUG=False
-__DEMO_MODE=True
+__DEMO_MODE=False
+
+##########################################################
+###### IMPORTANT METHODS #################################
+##########################################################
+
+## the default crossover size: lists of this length or shorter use the
+## DFT instead of an FFT, unless the engine has its own dispatch table
+## (please see the dispatch tables below and fourier_tune.py).
+__optimal_threshold = 2**6
+
+## the name of the FFT engine used when a caller does not ask for a
+## specific one. The engines themselves are registered in __engines at
+## the bottom of this file, once all of their methods are defined.
+__default_engine = 'iterative'
+
+def optimalFT(a_list, engine=None):
+    """
+    The optimalFT method accepts a list of coefficients and determines
+    if the size of the list is suitable for either a Fast Fourier
+    Transformation, or a less than optimal Discrete Fourier
+    Transformation, which is determined by the engine's dispatch table
+    (see use_dft()).
+
+    Essentially, this method is just a wrapper for calling my
+    implementations of Fourier transformations depending on the input
+    size. The engine parameter selects which FFT implementation is
+    used above the threshold (see get_engine()); by default it is the
+    iterative, in-place engine, or the 'numpy' engine if a_list is a
+    NumPy array. The 'numpy' engine accepts lists or arrays and always
+    returns an array.
+
+    Lists of any length can be transformed. The engines that only
+    handle powers of 2 hand other lengths to the mixed-radix engine
+    (see length_engine()).
+
+    A CoefficientArray (please see fourier_array.py) is transformed
+    into a new CoefficientArray.
+    """
+    if isinstance(a_list, CoefficientArray):
+        return __wrap(optimalFT(__unwrap(a_list, engine), engine))
+    engine = __array_engine(a_list, engine)
+    if engine == 'numpy':
+        a_list = numpy.asarray(a_list, dtype=numpy.complex128)
+        list_length = a_list.shape[-1]
+    else:
+        list_length = len(a_list)
+    if use_dft(engine, list_length):
+        (name, method) = ('dft', performDFT)
+    else:
+        name = length_engine(engine, list_length)
+        method = get_engine(name)[0]
+    if __profile is None:
+        return method(a_list)
+    start_time = timeDict.clock()
+    result = method(a_list)
+    __profile.add(name, list_length, 'total', timeDict.clock() - start_time)
+    return result
+
+def optimal_inverseFT(y_list, engine=None):
+    """
+    The optimal_inverseFT method is the inverse of optimalFT, and uses
+    the same dispatch table to pick between the inverse DFT and the
+    inverse FFT of the selected engine.
+    """
+    if isinstance(y_list, CoefficientArray):
+        return __wrap(optimal_inverseFT(__unwrap(y_list, engine), engine))
+    engine = __array_engine(y_list, engine)
+    if engine == 'numpy':
+        y_list = numpy.asarray(y_list, dtype=numpy.complex128)
+        list_length = y_list.shape[-1]
+    else:
+        list_length = len(y_list)
+    if use_dft(engine, list_length):
+        (name, method) = ('dft', perform_inverse_dft)
+    else:
+        name = length_engine(engine, list_length)
+        method = get_engine(name)[1]
+    if __profile is None:
+        return method(y_list)
+    start_time = timeDict.clock()
+    result = method(y_list)
+    __profile.add(name + '_inverse', list_length, 'total',
+                  timeDict.clock() - start_time)
+    return result
+
+def get_engine(engine=None):
+    """
+    The get_engine method accepts the name of an FFT engine and returns
+    a 2-tuple of its (forward, inverse) methods. If no name is given,
+    the default engine is returned. Currently registered engines are:
+
+    - 'recursive': the RECURSIVE-FFT from our class text
+    - 'iterative': a bottom-up, in-place FFT with no recursion
+    - 'numpy': the iterative FFT on NumPy arrays, one whole-array
+      operation per level (if NumPy is not installed, asking for this
+      engine gives the default engine instead)
+    - 'mixed_radix': a Cooley-Tukey FFT for any length, splitting by
+      factors of 2, 3 and 5
+    - 'bluestein': Bluestein's chirp-z FFT for any length, using a
+      power of 2 FFT at least twice as long
+    - 'parallel': the four-step FFT, split over a pool of processes for
+      very large lists (please see fourier_parallel.py)
+    """
+    if engine is None or (engine == 'numpy' and not __load_numpy()):
+        engine = __default_engine
+    try:
+        return __engines[engine]
+    except KeyError:
+        raise ValueError("Unknown FFT engine: " + repr(engine))
+
+def set_default_engine(engine):
+    """
+    Sets the engine used when a caller does not ask for a specific one.
+    """
+    global __default_engine
+    get_engine(engine) ## raises a ValueError for an unknown engine
+    __default_engine = engine
+
+def set_demo_mode(enabled):
+    """
+    Turns printing the polynomials being multiplied on or off. It is
+    off unless it is turned on.
+    """
+    global __DEMO_MODE
+    __DEMO_MODE = enabled
+
+def length_engine(engine, n):
+    """
+    Returns the engine that the named engine uses for lists of length
+    n. The 'iterative' and 'recursive' engines only handle powers of 2,
+    so other lengths use the 'mixed_radix' engine instead (which itself
+    uses Bluestein's FFT for any prime factors above 5). The 'numpy'
+    engine handles other lengths itself.
+    """
+    if n & (n - 1) and engine in ('iterative', 'recursive'):
+        return 'mixed_radix'
+    return engine
+
+def transform_size(length, engine=None):
+    """
+    Returns the length that a product of length coefficients should be
+    padded to before it is computed with the named engine: the next
+    power of 2 for the 'numpy', 'recursive' and 'parallel' engines, the
+    length itself (rounded up to be even) for the 'bluestein' engine,
+    and otherwise the cheapest length made of factors of 2, 3 and 5
+    (please see smooth_size()).
+    """
+    engine = __array_engine(None, engine)
+    if length <= 1:
+        return 1
+    if engine in ('numpy', 'recursive', 'parallel'):
+        return padded_size(length)
+    if engine == 'bluestein':
+        return length + length % 2
+    return smooth_size(length)
+
+def engine_names():
+    """Returns a sorted list of the names of the registered engines."""
+    __load_numpy() ## registers the 'numpy' engine if it can
+    return sorted(__engines)
+
+def __array_engine(a_list, engine):
+    """
+    Returns the name of the engine to use for a_list, which is the
+    'numpy' engine when no engine was asked for and a_list is already a
+    NumPy array, and otherwise the default engine if none was asked for.
+    """
+    if engine is None and is_array(a_list):
+        return 'numpy'
+    if engine is None or (engine == 'numpy' and not __load_numpy()):
+        return __default_engine
+    return engine
+
+def __load_numpy():
+    """
+    Imports NumPy the first time it is called, and registers the 'numpy'
+    engine, and returns True if NumPy is installed.
+    """
+    global numpy, __numpy_installed
+    if __numpy_installed is None:
+        try:
+            import numpy
+        except ImportError:
+            __numpy_installed = False
+            return False
+        __engines['numpy'] = (numpyFFT, numpy_inverseFFT)
+        __numpy_installed = True
+        __late_engines.add('numpy') ## its table is loaded by use_dft()
+    return __numpy_installed
+
+## The dispatch tables used by optimalFT() and optimal_inverseFT(),
+## keyed by engine name. Element k of a table is True if the DFT is
+## faster than that engine's FFT for lists longer than 2^(k-1) and no
+## longer than 2^k, and lists longer than the table always use the
+## FFT. The tables are measured on this machine by fourier_tune.py and
+## loaded from its cache file the first time they are needed. Engines
+## without a table use __optimal_threshold.
+##
+## The dict is never changed once it is published, only replaced, so
+## it can be read without taking the lock.
+__dispatch_tables = None
+__dispatch_lock = threading.Lock()
+
+## the engines registered after the tables may have been loaded (the
+## 'numpy' engine, see __load_numpy()), whose tables are loaded the next
+## time use_dft() needs them rather than when they are registered
+__late_engines = set()
+
+def use_dft(engine, n):
+    """
+    Returns True if a list of length n should be transformed with the
+    DFT rather than the FFT of the named engine.
+    """
+    tables = __dispatch_tables
+    if tables is None:
+        tables = __load_dispatch_tables()
+    table = tables.get(engine)
+    if table is None and engine in __late_engines and tables:
+        __load_engine_table(engine)
+        table = __dispatch_tables.get(engine)
+    if table is None:
+        return n <= __optimal_threshold
+    k = (n - 1).bit_length()
+    return k < len(table) and table[k]
+
+def __load_dispatch_tables():
+    """
+    Loads the dispatch tables with fourier_tune.load_or_tune(), the
+    first time they are needed.
+    """
+    global __dispatch_tables
+    with __dispatch_lock:
+        if __dispatch_tables is None:
+            ## publish an empty dict first, so that the transforms run
+            ## while tuning use __optimal_threshold instead of
+            ## trying to load the tables again
+            __dispatch_tables = {}
+            import fourier_tune
+            ## only the engines registered so far, so as not to import
+            ## NumPy just for its table (see __load_engine_table())
+            __dispatch_tables = dict(fourier_tune.load_or_tune(
+                sorted(__engines)))
+        return __dispatch_tables
+
+def __load_engine_table(engine):
+    """
+    Adds the dispatch table of an engine that was registered after the
+    tables were loaded (see __late_engines), loading or tuning it like
+    the others. The engine is taken out of __late_engines first, so the
+    transforms that tune it use __optimal_threshold instead of coming
+    back here, and the lock is only held to publish the new tables.
+    """
+    global __dispatch_tables
+    try:
+        __late_engines.remove(engine)
+    except KeyError:
+        return ## another thread is already loading it
+    import fourier_tune
+    table = fourier_tune.load_or_tune([engine]).get(engine)
+    if table is None:
+        return
+    with __dispatch_lock:
+        new_tables = dict(__dispatch_tables or {})
+        ## a table set with set_dispatch_tables() meanwhile is kept
+        new_tables.setdefault(engine, tuple(table))
+        __dispatch_tables = new_tables
+
+def get_dispatch_tables():
+    """
+    Returns a copy of the dispatch tables, as a dict mapping each
+    engine name to a list of booleans (please see use_dft()).
+    """
+    tables = __dispatch_tables
+    if tables is None:
+        tables = __load_dispatch_tables()
+    return dict((engine, list(table)) for (engine, table) in tables.items())
+
+def set_dispatch_tables(tables):
+    """
+    Replaces the dispatch tables for the engines in tables, a dict
+    mapping engine names to lists of booleans (please see use_dft()).
+    The tables of the other engines are kept.
+    """
+    global __dispatch_tables
+    with __dispatch_lock:
+        new_tables = dict(__dispatch_tables or {})
+        for (engine, table) in tables.items():
+            new_tables[engine] = tuple(bool(x) for x in table)
+        __dispatch_tables = new_tables
+
+def set_crossover(engine, size):
+    """
+    Sets the dispatch table of an engine (or of the default engine, if
+    engine is None) so that lists of length size or shorter use the
+    DFT, and longer lists use the FFT.
+    """
+    engine = __array_engine(None, engine)
+    set_dispatch_tables({engine: [True] * ((size - 1).bit_length() + 1)})
+
+def autotune(**kwargs):
+    """
+    Measures the DFT/FFT crossover of every engine on this machine,
+    saves it to the tuning cache file and starts using it. Please see
+    fourier_tune.autotune() for the keyword arguments.
+    """
+    import fourier_tune
+    return fourier_tune.autotune(**kwargs)
+
+##########################################################
+###### PROFILING METHODS #################################
+##########################################################
+
+## the timeDict.TimeDict that the transforms add their timings to, or
+## None when profiling is off. Checking it is all that profiling costs
+## when it is off.
+__profile = None
+
+## the timeDict module, once enable_profiling() has imported it
+timeDict = None
+
+def enable_profiling(profile=None):
+    """
+    The enable_profiling method starts timing every transform, from now
+    on, into profile (a new timeDict.TimeDict if it is not given), which
+    is returned. Each call of optimalFT() or optimal_inverseFT() adds
+    its 'total' time under the name of the engine that ran (or 'dft'),
+    for its input size, and the recursive and iterative engines also
+    add the time of their 'split', 'recurse' and 'combine' phases.
+    Please see timeDict.py for exporting the results.
+    """
+    global __profile, timeDict
+    import timeDict ## the timing below only runs once this is set
+    if profile is None:
+        profile = timeDict.TimeDict()
+    __profile = profile
+    return profile
+
+def disable_profiling():
+    """
+    Stops profiling, and returns the TimeDict the timings were added to
+    (or None if profiling was not on).
+    """
+    global __profile
+    profile = __profile
+    __profile = None
+    return profile
+
+def get_profile():
+    """Returns the TimeDict being profiled into, or None."""
+    return __profile
+
+def __add_phases(profile, name, n, time0, time1, time2):
+    """
+    Adds the 'split' (time0 to time1), 'recurse' (time1 to time2) and
+    'combine' (time2 to now) phases of one transform to the profile.
+    Transforms without a recurse phase pass None as time2.
+    """
+    time3 = timeDict.clock()
+    profile.add(name, n, 'split', time1 - time0)
+    if time2 is None:
+        time2 = time1
+    else:
+        profile.add(name, n, 'recurse', time2 - time1)
+    profile.add(name, n, 'combine', time3 - time2)
+
+def optimal_recursiveFFT(a_list):
+    """
+    The recursiveFFT method is a direct implementation of the
+    RECURSIVE-FFT method defined in our class text, Intro to
+    Algorithms (Cormen and Lee). I used a couple helper methods as a
+    difference, however.
+
+    For example, the book has a sequence definition to split the
+    passed list into odd and even indices, while I use a method I
+    designed called unzip_list().
+
+    Also, in the book, they use a running value for omega and the
+    related roots of unity, so that they do not have to recalculate
+    the root of unity each time through the for loop. I instead
+    recalculate it, as the calculation only involves less than a dozen
+    lines of code.
+    """
+    n = len(a_list)
+    if n == 1:
+        return a_list
+    if n % 2:
+        ## the two halves from unzip_list() would be different lengths
+        raise ValueError("List provided is not a power of 2 in length: " +
+                         str(n))
+    # if __DEBUG:
+    #     print "size of list:", n
+    profile = __profile
+    if profile is not None:
+        time0 = timeDict.clock()
+    (a_list0, a_list1) = unzip_list(a_list)
+    if profile is not None:
+        time1 = timeDict.clock()
+    y_list0 = optimalFT(a_list0, 'recursive')
+    y_list1 = optimalFT(a_list1, 'recursive')
+    if profile is not None:
+        time2 = timeDict.clock()
+    # if __DEBUG:
+    #     print "y_list0:", str(y_list0)
+    #     print "y_list1:", str(y_list1)
+    y = [0] * n
+    (twiddles, stride) = get_twiddle_table(n)
+    # the following for loop's definition is slightly different from
+    # the book - I use n/2 instead of n/2 - 1. This is because
+    # Python's xrange() uses the upper bound on the list as an
+    # exclusive limit.
+    for k in xrange(n/2):
+        # if __DEBUG:
+        #     print "on loop iteration:", k
+        w_basen_powerk = twiddles[k * stride] # omega_n ^k
+        # if __DEBUG:
+        #     print "omega base", n, "power", k, ":", w_basen_powerk
+        y[k] = sanitize_value(y_list0[k] + \
+                        (w_basen_powerk * y_list1[k]))
+        y[k+(n/2)] = sanitize_value(y_list0[k] - \
+                        (w_basen_powerk * y_list1[k]))
+    # if __DEBUG:
+    #     print "printing array y:", str(y)
+
+    # y used to be a dict of indices mapped to values, which was turned
+    # into a list with .items() at the end. Filling in a list of the
+    # right length from the start does the same without the dict.
+    if profile is not None:
+        __add_phases(profile, 'recursive', n, time0, time1, time2)
+    return y
+
+def recursive_inverseFFT(y_list):
+    """
+    The recursive_inverseFFT method is just that - the inverse of the
+    recursiveFFT() method. The modifications from recursiveFFT() are
+    as follows:
+
+    - Swapped all instances of a and y
+    - Replaced omega_n with omega_n^-1
+    - Divided each element of the result by n
+
+    The division by n is only done once, here, on the final result.
+    The recursion itself is done by __unscaled_recursive_inverseFFT(),
+    since dividing at every level would divide by n several times over.
+    """
+    n = float(len(y_list))
+    return [sanitize_value(x / n) for x in
+            __unscaled_recursive_inverseFFT(y_list)]
+
+def __unscaled_recursive_inverseFFT(y_list):
+    """
+    The recursive half of recursive_inverseFFT(), which leaves the
+    result multiplied by n.
+    """
+    n = len(y_list)
+    if n == 1:
+        return y_list
+    if n % 2:
+        raise ValueError("List provided is not a power of 2 in length: " +
+                         str(n))
+    profile = __profile
+    if profile is not None:
+        time0 = timeDict.clock()
+    (y_list0, y_list1) = unzip_list(y_list)
+    if profile is not None:
+        time1 = timeDict.clock()
+    a_list0 = __unscaled_recursive_inverseFFT(y_list0)
+    a_list1 = __unscaled_recursive_inverseFFT(y_list1)
+    if profile is not None:
+        time2 = timeDict.clock()
+    a = [0] * n
+    (twiddles, stride) = get_twiddle_table(n)
+    table_size = len(twiddles)
+    # the following for loop's definition is slightly different from
+    # the book - I use n/2 instead of n/2 - 1. This is because
+    # Python's xrange() uses the upper bound on the list as an
+    # exclusive limit.
+    for k in xrange(n/2):
+        w_basen_powerk = twiddles[-k * stride % table_size] # omega_n ^-k
+        a[k] = a_list0[k] + (w_basen_powerk * a_list1[k])
+        a[k+(n/2)] = a_list0[k] - (w_basen_powerk * a_list1[k])
+    if profile is not None:
+        __add_phases(profile, 'recursive_inverse', n, time0, time1, time2)
+    return a
+
+def iterativeFFT(a_list, in_place=False):
+    """
+    The iterativeFFT method is the ITERATIVE-FFT from our class text,
+    which computes the same values as optimal_recursiveFFT() but from
+    the bottom up, so it has no recursion depth limit and does not
+    build new lists or dicts at every level.
+
+    The coefficients are first put into bit-reversed order, after
+    which every level of butterflies is done in place on that one
+    list. If in_place is True, a_list itself is permuted and
+    transformed (and returned), otherwise a_list is copied first and
+    left unchanged.
+
+    The length of a_list must be a power of 2.
+    """
+    if in_place:
+        a = a_list
+    else:
+        a = list(a_list)
+    __iterative_passes(a, 1)
+    return a
+
+def iterative_inverseFFT(y_list, in_place=False):
+    """
+    The iterative_inverseFFT method is the inverse of iterativeFFT(),
+    which uses omega_n^-1 in the butterflies and divides each element
+    of the result by n.
+    """
+    if in_place:
+        a = y_list
+    else:
+        a = list(y_list)
+    __iterative_passes(a, -1)
+    n = float(len(a))
+    for i in xrange(len(a)):
+        a[i] = sanitize_value(a[i] / n)
+    return a
+
+def __iterative_passes(a, direction):
+    """
+    Puts the list a into bit-reversed order and runs every level of
+    butterflies over it, in place (see __iterative_butterflies()). When
+    profiling is on, the two are timed as the 'split' and 'combine'
+    phases.
+    """
+    profile = __profile
+    if profile is None:
+        bit_reverse_permute(a)
+        __iterative_butterflies(a, direction)
+        return
+    time0 = timeDict.clock()
+    bit_reverse_permute(a)
+    time1 = timeDict.clock()
+    __iterative_butterflies(a, direction)
+    name = 'iterative' if direction == 1 else 'iterative_inverse'
+    __add_phases(profile, name, len(a), time0, time1, None)
+
+def __iterative_butterflies(a, direction):
+    """
+    Runs every level of butterflies over the bit-reversed list a, in
+    place. The direction is 1 for the forward FFT and -1 for the
+    inverse (which uses omega_n^-1 as the root of unity).
+
+    The roots of unity come from the shared twiddle table for n (see
+    get_twiddle_table()); a level that combines blocks of size m only
+    uses every (n/m)-th one of them.
+    """
+    n = len(a)
+    if n < 2:
+        return
+    (twiddles, table_stride) = get_twiddle_table(n)
+    table_size = len(twiddles)
+    # the first level always multiplies by omega^0 = 1, so it is done
+    # on its own without any multiplications
+    for i in xrange(0, n, 2):
+        u = a[i]
+        t = a[i+1]
+        a[i] = u + t
+        a[i+1] = u - t
+    half = 2
+    while half < n:
+        block = 2 * half
+        stride = table_stride * (n / block)
+        for k in xrange(half):
+            w = twiddles[direction * k * stride % table_size]
+            for i in xrange(k, n, block):
+                j = i + half
+                t = w * a[j]
+                u = a[i]
+                a[i] = u + t
+                a[j] = u - t
+        half = block
+
+def multiply_polynomials(polynom1, polynom2, engine=None, real=None):
+    """
+    The multiply_polynomials method accepts two polynomials as
+    parameters and multiplies them by using the FFT on each of them,
+    multiplying the resulting point values, and using the inverse FFT
+    on the resulting vector to retrieve the final product of both
+    polynomials.
+
+    Please note that the polynomials are provided in the form of a
+    list, with the elements of the list being the coefficients of each
+    factor, starting with the constant (a_0), all the way up to the
+    coefficient of the highest power factor (a_(n-1)).
+
+    The engine parameter selects the FFT engine to use (see
+    get_engine()), and the default engine is used if none is given.
+
+    The product has all len(polynom1) + len(polynom2) - 1 of its
+    coefficients. Both polynomials are padded with zeroes once, to the
+    best transform length for the engine that fits the whole product
+    (please see transform_size()), which does not have to be a power
+    of 2.
+
+    The 'ntt' engine multiplies polynomials with integer coefficients
+    exactly, with ntt_multiply(), and returns integers. The other
+    engines return exact integers for them too: the product is rounded
+    if its error bound allows it (see product_error_bound()), and
+    otherwise the coefficients are split into smaller limbs that are
+    multiplied separately (see __multiply_integers()).
+
+    If both polynomials have only real coefficients (or real is True),
+    they are multiplied with real_multiply(), which only needs one
+    complex FFT of the same length for both polynomials and an inverse
+    FFT of half the length, and the product is real. The complex method
+    can be forced with real=False.
+
+    Either polynomial may be a PreparedPolynomial (please see
+    prepare_polynomial()), whose spectrum is only computed the first
+    time it is multiplied at each size.
+
+    Short polynomials are not worth an FFT at all: they are multiplied
+    directly with schoolbook_multiply() or karatsuba_multiply(), up to
+    crossover lengths measured on each machine (please see
+    multiply_method()). Those methods can also be picked as the
+    engine, as 'schoolbook' or 'karatsuba'.
+
+    If either polynomial is a CoefficientArray, so is the product.
+    """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(multiply_polynomials(__unwrap(polynom1, engine),
+                                           __unwrap(polynom2, engine),
+                                           engine, real))
+    if __DEMO_MODE:
+        print "Multiplying the following polynomials represented by lists of coefficients (FFT method):"
+        print "Polynomial 1:", str(polynom1)
+        print "Polynomial 2:", str(polynom2)
+    __check_multiply_engine(engine)
+    if engine == 'ntt':
+        return ntt_multiply(__coefficients(polynom1),
+                            __coefficients(polynom2))
+    if engine in ('schoolbook', 'karatsuba'):
+        method = engine
+    else:
+        method = multiply_method(polynom1, polynom2, engine)
+    if method == 'schoolbook':
+        return schoolbook_multiply(__coefficients(polynom1),
+                                   __coefficients(polynom2))
+    if method == 'karatsuba':
+        return karatsuba_multiply(__coefficients(polynom1),
+                                  __coefficients(polynom2))
+    return fft_multiply(polynom1, polynom2, engine, real)
+
+def fft_multiply(polynom1, polynom2, engine=None, real=None):
+    """
+    The fft_multiply method is the FFT part of multiply_polynomials(),
+    which always multiplies with the FFT of the engine, whatever the
+    lengths of the polynomials. If either polynomial is empty, so is
+    the product.
+    """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(fft_multiply(__unwrap(polynom1, engine),
+                                   __unwrap(polynom2, engine), engine, real))
+    if engine is None and (is_array(__coefficients(polynom1)) or
+                           is_array(__coefficients(polynom2))):
+        engine = 'numpy'
+    engine = __array_engine(None, engine)
+    product_length = __product_length(polynom1, polynom2)
+    if product_length < 1:
+        return __integer_result([], engine)
+    size = transform_size(product_length, engine)
+    coefficients1 = __coefficients(polynom1)
+    coefficients2 = __coefficients(polynom2)
+    integer = __is_integer_list(coefficients1) and \
+              __is_integer_list(coefficients2)
+    if isinstance(polynom1, PreparedPolynomial) or \
+       isinstance(polynom2, PreparedPolynomial):
+        ## the cached spectra are only used if the product can simply be
+        ## rounded; otherwise the limbs need spectra of their own
+        if not integer:
+            return __multiply_prepared(polynom1, polynom2, size, engine,
+                                       real)
+        if __integer_error_bound(coefficients1, coefficients2, size) < 0.5:
+            return __round_integers(__multiply_prepared(
+                polynom1, polynom2, size, engine, real))
+    if integer:
+        return __multiply_integers(coefficients1, coefficients2, size,
+                                   engine, real)
+    resultant_vector = __multiply_padded(polynom1, polynom2, size, engine,
+                                         real)
+    ##print "in multiple polyunomials, returning:", str(resultant_vector)
+    return resultant_vector
+
+def __multiply_padded(polynom1, polynom2, size, engine, real=None):
+    """
+    Multiplies two polynomials after padding both of them with zeroes
+    to size, and returns the len(polynom1) + len(polynom2) - 1
+    coefficients of the product.
+    """
+    product_length = __product_length(polynom1, polynom2)
+    if product_length < 1:
+        return pad_list(polynom1[:0], 0)
+    padded1 = pad_list(polynom1, size)
+    padded2 = pad_list(polynom2, size)
+    if real is None:
+        real = is_real(padded1) and is_real(padded2)
+    if real and size > 1:
+        product = real_multiply(padded1, padded2, engine)
+    else:
+        product_vector = multiply_point_values(optimalFT(padded1, engine),
+                                               optimalFT(padded2, engine))
+        product = optimal_inverseFT(product_vector, engine)
+    return product[:product_length]
+
+## the rounding error of a floating point FFT product is at most about
+## 2^-53 * log2(size) * |polynom1| * |polynom2| (the Euclidean norms of
+## the coefficients) times this factor. The worst error measured, with
+## every coefficient as large as it can be, was 0.4 times the estimate
+## without the factor, so the bound has some room to spare.
+__fft_error_factor = 4
+
+## the most limbs that integer coefficients are split into (see
+## __multiply_integers()) before an exact engine is used instead
+__max_limbs = 8
+
+def product_error_bound(polynom1, polynom2, size=None, engine=None):
+    """
+    The product_error_bound method returns a bound on the error of any
+    coefficient of the product of two polynomials when it is computed
+    with floating point FFTs of size (by default, the size
+    multiply_polynomials() would use with the engine), before any
+    rounding. If the coefficients are integers and the bound is under
+    0.5, rounding the product gives exactly the right integers.
+    """
+    if size is None:
+        size = transform_size(len(polynom1) + len(polynom2) - 1, engine)
+    return __error_bound(__norm(polynom1), __norm(polynom2), size)
+
+def norm_error_bound(norm1, norm2, size):
+    """
+    Returns the error bound of product_error_bound() for polynomials
+    whose coefficients have the Euclidean norms norm1 and norm2, for
+    callers that never hold all of the coefficients at once (please
+    see fourier_outofcore.py).
+    """
+    return __error_bound(norm1, norm2, size)
+
+def __error_bound(norm1, norm2, size, others=()):
+    """
+    Returns the error bound of product_error_bound() for polynomials
+    with the Euclidean norms norm1 and norm2.
+
+    A product of more polynomials can be computed from one set of point
+    values too, multiplying them all together before the inverse FFT.
+    Then others are the sums of the absolute values of the coefficients
+    of the rest of them: each of their point values is at most that,
+    and each one adds the relative rounding error of another FFT.
+    """
+    bound = __fft_error_factor * 2.0**-53 * max(size.bit_length() - 1, 1) * \
+            norm1 * norm2 * (1 + len(others))
+    for other in others:
+        bound *= other
+    return bound
+
+def __norm(polynom):
+    """Returns the Euclidean norm of the coefficients of polynom."""
+    return math.sqrt(sum(abs(x)**2 for x in polynom))
+
+def __multiply_integers(polynom1, polynom2, size, engine, real=None):
+    """
+    Multiplies two polynomials with integer coefficients with FFTs of
+    size, and returns the exact integer coefficients of the product.
+
+    If the error bound of the product (see product_error_bound()) is
+    under 0.5, the product is just rounded. Otherwise floats are not
+    precise enough for it, so the coefficients are split into k limbs
+    of b bits, polynom = p_0 + p_1 * 2^b + ... + p_(k-1) * 2^((k-1)b),
+    with b small enough for the products of limbs to be rounded
+    exactly. Every limb is transformed once, the point values of the
+    limbs whose indices add up to s are multiplied and added together,
+    and one inverse FFT of each sum gives the part of the product to
+    be shifted left by s*b bits. With two limbs (say, for 32 bit
+    coefficients split into 16 bit halves) that is four forward and
+    three inverse FFTs. If even __max_limbs limbs are not enough, an
+    exact engine is used (see __exact_engine()).
+    """
+    length = __product_length(polynom1, polynom2)
+    if length < 1:
+        return []
+    if __integer_error_bound(polynom1, polynom2, size) < 0.5:
+        return __round_integers(__multiply_padded(polynom1, polynom2, size,
+                                                  engine, real))
+    (polynom1, polynom2) = (__python_integers(polynom1),
+                            __python_integers(polynom2))
+    bits = max(abs(x) for x in itertools.chain(polynom1, polynom2)) \
+        .bit_length()
+    ## a limb of b bits is less than 2^b, so its norm is at most
+    ## 2^b * sqrt(len), and up to k limb products are added together.
+    ## Limbs of more than 26 bits never fit in a float's 53 bits.
+    root = math.sqrt(len(polynom1) * len(polynom2))
+    for limbs in xrange(2, __max_limbs + 1):
+        limb_bits = -(-bits // limbs)
+        if limb_bits <= 26 and limbs * root * \
+           __error_bound(2**limb_bits, 2**limb_bits, size) < 0.5:
+            break
+    else:
+        bound = sum(abs(x) for x in polynom1) * \
+                sum(abs(x) for x in polynom2)
+        return __integer_result(
+            multiply_polynomials(polynom1, polynom2, __exact_engine(bound)),
+            engine)
+    real = real is not False and size > 1
+    spectra1 = [__spectrum(limb, size, real, engine)
+                for limb in __split_limbs(polynom1, limbs, limb_bits)]
+    spectra2 = [__spectrum(limb, size, real, engine)
+                for limb in __split_limbs(polynom2, limbs, limb_bits)]
+    product = [0] * length
+    for shift in xrange(2 * limbs - 1):
+        spectrum = None
+        for i in xrange(max(0, shift - limbs + 1), min(shift, limbs - 1) + 1):
+            values = multiply_point_values(spectra1[i], spectra2[shift - i])
+            if spectrum is None:
+                spectrum = values
+            elif is_array(spectrum):
+                spectrum += values
+            else:
+                spectrum = [x + y for (x, y) in zip(spectrum, values)]
+        part = __from_spectrum(spectrum, length, real, True, engine)
+        for (k, x) in enumerate(part):
+            product[k] += int(x) << (shift * limb_bits)
+    return __integer_result(product, engine)
+
+def __integer_result(product, engine):
+    """
+    Returns a list of integer coefficients as the 'numpy' engine returns
+    them, as an int64 array (or an array of Python integers if they do
+    not fit), and as it is for the other engines.
+    """
+    if engine != 'numpy':
+        return product
+    try:
+        return numpy.array(product, dtype=numpy.int64)
+    except OverflowError:
+        return numpy.array(product, dtype=object)
+
+def __integer_error_bound(polynom1, polynom2, size, others=()):
+    """
+    Returns the error bound of product_error_bound() for two integer
+    polynomials (times the integer polynomials in others, if any, see
+    __error_bound()), or infinity if their coefficients are too large
+    for floats at all. The sums are taken over Python integers, so
+    they cannot overflow like NumPy's int64.
+    """
+    try:
+        return __error_bound(
+            math.sqrt(sum(float(x)**2 for x in __python_integers(polynom1))),
+            math.sqrt(sum(float(x)**2 for x in __python_integers(polynom2))),
+            size, [sum(abs(float(x)) for x in __python_integers(other))
+                   for other in others])
+    except OverflowError:
+        return float('inf')
+
+def __python_integers(polynom):
+    """
+    Returns the coefficients of an integer NumPy array as a list of
+    Python integers (which cannot overflow), and anything else as it is.
+    """
+    if is_array(polynom):
+        return polynom.tolist()
+    return polynom
+
+def __round_integers(product):
+    """
+    Returns a product whose error bound is under 0.5 rounded to the
+    exact integers: an int64 array for an array, otherwise a list.
+    """
+    if is_array(product):
+        return numpy.rint(product.real).astype(numpy.int64)
+    return [int(round(x.real)) for x in product]
+
+def __split_limbs(polynom, limbs, limb_bits):
+    """
+    Returns the limbs of the integer coefficients of polynom, as a list
+    of limbs polynomials: limb i holds bits i*limb_bits up to
+    (i+1)*limb_bits of every coefficient, and the last limb holds the
+    rest, with the sign.
+    """
+    mask = (1 << limb_bits) - 1
+    result = [[(x >> (i * limb_bits)) & mask for x in polynom]
+              for i in xrange(limbs - 1)]
+    result.append([x >> ((limbs - 1) * limb_bits) for x in polynom])
+    return result
+
+def multiply_polynomials_batch(pairs, engine=None):
+    """
+    The multiply_polynomials_batch method accepts an iterable of
+    (polynom1, polynom2) pairs and yields their products, one at a time
+    and in the same order as the pairs.
+
+    Each product has all len(polynom1) + len(polynom2) - 1 of its
+    coefficients, so the pairs are padded with zeroes to the transform
+    length that fits their product (see transform_size()). Pairs that
+    pad to the same size are then transformed together: with the
+    'numpy' engine (the default when NumPy is installed) each group is
+    one 2-D array with a row for every polynomial, so every level of
+    the FFT is done for the whole group at once and yields arrays.
+    With the other engines the polynomials in a group are transformed
+    one after the other, sharing the same twiddle table, and lists are
+    yielded.
+
+    Pairs of real polynomials are multiplied with real_multiply(), as
+    in multiply_polynomials(), and the 'ntt' engine multiplies each
+    pair exactly with ntt_multiply(). With the list engines, the pairs
+    with a PreparedPolynomial use its cached spectra, while the 'numpy'
+    and 'ntt' engines just use its coefficients.
+
+    Short pairs are multiplied directly with schoolbook_multiply() or
+    karatsuba_multiply() instead, as multiply_method() picks for
+    multiply_polynomials(), and so is every pair if the engine is
+    'schoolbook' or 'karatsuba'.
+    """
+    pairs = list(pairs)
+    __check_multiply_engine(engine)
+    if engine is None and __load_numpy():
+        engine = 'numpy'
+    engine = __array_engine(None, engine)
+    ## the products of pairs with a CoefficientArray are
+    ## CoefficientArrays too
+    wrapped = set(i for (i, pair) in enumerate(pairs)
+                  if isinstance(pair[0], CoefficientArray) or
+                  isinstance(pair[1], CoefficientArray))
+    pairs = [(__unwrap(polynom1, engine), __unwrap(polynom2, engine))
+             for (polynom1, polynom2) in pairs]
+    ## the indices of the pairs in each group, keyed by padded size, in
+    ## the order the sizes are first seen; the pairs that are not worth
+    ## an FFT are multiplied directly instead
+    groups = collections.OrderedDict()
+    results = {}
+    for (i, (polynom1, polynom2)) in enumerate(pairs):
+        if engine in ('schoolbook', 'karatsuba'):
+            method = engine
+        elif engine == 'ntt':
+            method = 'fft'
+        else:
+            method = multiply_method(polynom1, polynom2, engine)
+        if __product_length(polynom1, polynom2) < 1:
+            results[i] = __integer_result([], engine) ## an empty product
+        elif method == 'schoolbook':
+            results[i] = schoolbook_multiply(__coefficients(polynom1),
+                                             __coefficients(polynom2))
+        elif method == 'karatsuba':
+            results[i] = karatsuba_multiply(__coefficients(polynom1),
+                                            __coefficients(polynom2))
+        else:
+            size = transform_size(__product_length(polynom1, polynom2),
+                                  engine)
+            groups.setdefault(size, []).append(i)
+            continue
+        if i in wrapped:
+            results[i] = __wrap(results[i])
+    next_index = 0
+    for (size, indices) in groups.iteritems():
+        ## integer pairs are rounded exactly (see fft_multiply()): the
+        ## ones whose error bound allows it after the batch, and the
+        ## rest with limbs, one pair at a time
+        rounded = set()
+        if engine != 'ntt':
+            batched = []
+            for i in indices:
+                coefficients1 = __coefficients(pairs[i][0])
+                coefficients2 = __coefficients(pairs[i][1])
+                if not (__is_integer_list(coefficients1) and
+                        __is_integer_list(coefficients2)):
+                    batched.append(i)
+                elif __integer_error_bound(coefficients1, coefficients2,
+                                           size) < 0.5:
+                    batched.append(i)
+                    rounded.add(i)
+                else:
+                    results[i] = __multiply_integers(
+                        coefficients1, coefficients2, size, engine)
+            indices = batched
+        group_pairs = [pairs[i] for i in indices]
+        if not group_pairs:
+            products = []
+        elif engine == 'numpy':
+            products = __numpy_multiply_group(
+                [(__coefficients(polynom1), __coefficients(polynom2))
+                 for (polynom1, polynom2) in group_pairs], size)
+        elif engine == 'ntt':
+            products = [ntt_multiply(__coefficients(polynom1),
+                                     __coefficients(polynom2))
+                        for (polynom1, polynom2) in group_pairs]
+        else:
+            products = __multiply_group(group_pairs, size, engine)
+        for (i, product) in zip(indices, products):
+            if i in rounded:
+                product = __round_integers(product)
+            results[i] = product
+        for i in groups[size]:
+            if i in wrapped:
+                results[i] = __wrap(results[i])
+        ## yield every result that is now ready, without skipping ahead
+        ## of the results of groups that are still to come
+        while next_index in results:
+            yield results.pop(next_index)
+            next_index += 1
+    ## the direct products after the last group
+    while next_index in results:
+        yield results.pop(next_index)
+        next_index += 1
+
+def __check_multiply_engine(engine):
+    """
+    Raises a ValueError unless engine names an FFT engine (or is None)
+    or is 'ntt', 'schoolbook' or 'karatsuba', which are not FFT engines
+    but can still be asked for by multiply_polynomials().
+    """
+    if engine not in ('ntt', 'schoolbook', 'karatsuba'):
+        get_engine(engine) ## raises a ValueError for an unknown engine
+
+def __multiply_group(group_pairs, size, engine):
+    """
+    Multiplies every pair of lists in group_pairs, padded to size, one
+    pair at a time, and returns a list of the products.
+    """
+    products = []
+    for (polynom1, polynom2) in group_pairs:
+        if isinstance(polynom1, PreparedPolynomial) or \
+           isinstance(polynom2, PreparedPolynomial):
+            products.append(__multiply_prepared(polynom1, polynom2, size,
+                                                engine))
+        else:
+            products.append(__multiply_padded(polynom1, polynom2, size,
+                                              engine))
+    return products
+
+def __numpy_multiply_group(group_pairs, size):
+    """
+    Multiplies every pair in group_pairs as 2-D arrays of size
+    columns, with the first polynomials of the pairs in the rows of one
+    array and the second polynomials in the rows of the other, and
+    returns a list of the product arrays.
+    """
+    count = len(group_pairs)
+    real = all(is_real(polynom1) and is_real(polynom2)
+               for (polynom1, polynom2) in group_pairs)
+    if real and size > 1:
+        dtype = numpy.float64
+    else:
+        dtype = numpy.complex128
+    rows1 = numpy.zeros((count, size), dtype=dtype)
+    rows2 = numpy.zeros((count, size), dtype=dtype)
+    for (i, (polynom1, polynom2)) in enumerate(group_pairs):
+        rows1[i, :len(polynom1)] = polynom1
+        rows2[i, :len(polynom2)] = polynom2
+    if dtype is numpy.float64:
+        products = real_multiply(rows1, rows2, 'numpy')
+    else:
+        products = optimal_inverseFT(
+            optimalFT(rows1, 'numpy') * optimalFT(rows2, 'numpy'), 'numpy')
+    return [products[i, :__product_length(polynom1, polynom2)]
+            for (i, (polynom1, polynom2)) in enumerate(group_pairs)]
+
+
+##########################################################
+###### DIRECT MULTIPLY METHODS ###########################
+##########################################################
+
+## multiply_polynomials() multiplies polynomials directly when the
+## shorter one has at most crossovers['schoolbook'] coefficients (with
+## schoolbook_multiply()), or, if both have integer coefficients, at
+## most crossovers['karatsuba'] (with karatsuba_multiply()), and uses
+## the FFT otherwise. The crossovers are measured on each machine by
+## fourier_tune.py the first time they are needed, like the dispatch
+## tables, and the defaults below are only used if they cannot be.
+__multiply_crossovers = None
+__default_multiply_crossovers = {'schoolbook': 48, 'karatsuba': 128}
+__crossover_lock = threading.Lock()
+
+## karatsuba_multiply() multiplies halves of this length or shorter
+## with schoolbook_multiply() instead of splitting them again
+__karatsuba_leaf = 32
+
+def multiply_method(polynom1, polynom2, engine=None):
+    """
+    Returns the name of the method multiply_polynomials() uses for two
+    polynomials: 'schoolbook', 'karatsuba' or 'fft'. This only depends
+    on the length of the shorter polynomial (the longer one is handled
+    in pieces of that length, so unbalanced pairs are still cheap to
+    multiply directly), and on whether they have integer coefficients.
+
+    NumPy arrays, the 'numpy' engine and prepared polynomials always
+    use the FFT.
+    """
+    if engine == 'numpy' or isinstance(polynom1, PreparedPolynomial) or \
+       isinstance(polynom2, PreparedPolynomial) or \
+       is_array(polynom1) or is_array(polynom2):
+        return 'fft'
+    crossovers = __multiply_crossovers
+    if crossovers is None:
+        crossovers = get_multiply_crossovers()
+    shorter = min(len(polynom1), len(polynom2))
+    if shorter <= crossovers['schoolbook']:
+        return 'schoolbook'
+    if shorter <= crossovers['karatsuba'] and \
+       __is_integer_list(polynom1) and __is_integer_list(polynom2):
+        return 'karatsuba'
+    return 'fft'
+
+def get_multiply_crossovers():
+    """
+    Returns a copy of the multiplication crossovers (please see
+    multiply_method()), loading them with
+    fourier_tune.load_or_tune_crossovers() the first time.
+    """
+    global __multiply_crossovers
+    with __crossover_lock:
+        if __multiply_crossovers is None:
+            ## publish the defaults first, so that the multiplications
+            ## timed while tuning do not try to load them again
+            __multiply_crossovers = __default_multiply_crossovers
+            import fourier_tune
+            crossovers = dict(__default_multiply_crossovers)
+            crossovers.update(fourier_tune.load_or_tune_crossovers() or {})
+            __multiply_crossovers = crossovers
+        return dict(__multiply_crossovers)
+
+def set_multiply_crossovers(schoolbook=None, karatsuba=None):
+    """
+    Sets the longest shorter polynomial that is multiplied with
+    schoolbook_multiply() and with karatsuba_multiply() (please see
+    multiply_method()). A crossover that is not given is left as it
+    is; a crossover of 0 turns the method off.
+    """
+    global __multiply_crossovers
+    crossovers = get_multiply_crossovers()
+    if schoolbook is not None:
+        crossovers['schoolbook'] = schoolbook
+    if karatsuba is not None:
+        crossovers['karatsuba'] = karatsuba
+    with __crossover_lock:
+        __multiply_crossovers = crossovers
+
+def schoolbook_multiply(polynom1, polynom2):
+    """
+    The schoolbook_multiply method multiplies two polynomials directly,
+    by adding every product of a coefficient of one with a coefficient
+    of the other to the product's coefficient of their combined power.
+    That takes len(polynom1) * len(polynom2) multiplications, but they
+    are plain (usually integer) multiplications, so for short
+    polynomials it is much faster than the FFT, and exact.
+    """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(schoolbook_multiply(__unwrap(polynom1),
+                                          __unwrap(polynom2)))
+    if not len(polynom1) or not len(polynom2):
+        return []
+    if len(polynom1) < len(polynom2):
+        (polynom1, polynom2) = (polynom2, polynom1)
+    product = [0] * (len(polynom1) + len(polynom2) - 1)
+    ## the outer loop is over the shorter polynomial, so the inner loop
+    ## is as long as possible
+    for (j, b) in enumerate(polynom2):
+        if b:
+            for (i, a) in enumerate(polynom1):
+                product[i + j] += a * b
+    return product
+
+def karatsuba_multiply(polynom1, polynom2):
+    """
+    The karatsuba_multiply method multiplies two polynomials with
+    Karatsuba's method, which splits each polynomial into a low half
+    a0 and a high half a1, and gets the product from only three
+    products of halves: a0*b0, a1*b1 and (a0 + a1)*(b0 + b1), since the
+    middle terms a0*b1 + a1*b0 are the last one minus the first two.
+    That takes about n^1.585 multiplications instead of n^2.
+
+    The longer polynomial is multiplied in pieces as long as the
+    shorter one, and the pieces' products are added together, so the
+    halves always have the same length.
+    """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(karatsuba_multiply(__unwrap(polynom1),
+                                         __unwrap(polynom2)))
+    if not len(polynom1) or not len(polynom2):
+        return []
+    if len(polynom1) < len(polynom2):
+        (polynom1, polynom2) = (polynom2, polynom1)
+    polynom2 = list(polynom2)
+    length = len(polynom2)
+    product = [0] * (len(polynom1) + length - 1)
+    for start in xrange(0, len(polynom1), length):
+        piece = list(polynom1[start:start + length])
+        if len(piece) < length:
+            piece_product = schoolbook_multiply(piece, polynom2)
+        else:
+            piece_product = __karatsuba(piece, polynom2)
+        for (i, x) in enumerate(piece_product):
+            product[start + i] += x
+    return product
+
+def __karatsuba(a, b):
+    """
+    Returns the product of the lists a and b, which have the same
+    length, with Karatsuba's method.
+    """
+    n = len(a)
+    if n <= __karatsuba_leaf:
+        return schoolbook_multiply(a, b)
+    half = (n + 1) / 2
+    (a0, a1) = (a[:half], a[half:])
+    (b0, b1) = (b[:half], b[half:])
+    low = __karatsuba(a0, b0)
+    high = __karatsuba(a1, b1)
+    ## the high halves are at most as long as the low halves
+    for (i, x) in enumerate(a1):
+        a0[i] += x
+    for (i, x) in enumerate(b1):
+        b0[i] += x
+    middle = __karatsuba(a0, b0)
+    product = [0] * (2*n - 1)
+    for (i, x) in enumerate(low):
+        product[i] += x
+        middle[i] -= x
+    for (i, x) in enumerate(high):
+        product[i + 2*half] += x
+        middle[i] -= x
+    for (i, x) in enumerate(middle):
+        product[i + half] += x
+    return product
+
+def __is_integer_list(a_list):
+    """Returns True if every value in a_list is an integer."""
+    for value in a_list:
+        if not isinstance(value, (int, long)):
+            return False
+    return True
+
+
+##########################################################
+###### PREPARED POLYNOMIAL METHODS #######################
+##########################################################
+
+## the spectra of prepared polynomials, keyed by a digest of their
+## coefficients and the (size, real, engine) of the spectrum, so that
+## preparing the same coefficients again (anywhere in the program)
+## reuses their spectra. The least recently used are dropped once they
+## take more than the cache's limit (64 MB by default). Please see
+## prepare_polynomial().
+__spectrum_cache = LRUCache(2**26, lambda spectrum: __spectrum_bytes(spectrum))
+
+class PreparedPolynomial:
+    """
+    A polynomial to be multiplied many times (say, a fixed filter),
+    made by prepare_polynomial(), which keeps the spectrum of its
+    coefficients at every size it has been transformed to, so that
+    multiply_polynomials() only transforms it once per size.
+    """
+    def __init__(self, coefficients, digest, real):
+        self.coefficients = coefficients
+        self.digest = digest
+        self.real = real
+        ## maps (size, real, engine) to the spectrum at that size
+        self.spectra = {}
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def __repr__(self):
+        return "PreparedPolynomial(" + repr(self.coefficients) + ")"
+
+def prepare_polynomial(polynom, other_lengths=(), engine=None):
+    """
+    The prepare_polynomial method returns a PreparedPolynomial of
+    polynom (a list or a NumPy array of coefficients), which can be
+    passed to multiply_polynomials() in place of polynom. Its spectrum
+    at each padded size is computed the first time it is needed and
+    kept, so every later product of the same size needs one forward FFT
+    fewer (or none, if both polynomials are prepared).
+
+    The spectra are also kept in a cache keyed by a hash of the
+    coefficients, so preparing equal coefficients again reuses them,
+    as long as they have not been dropped from the cache (see
+    set_spectrum_cache_limit()).
+
+    If other_lengths is given, the spectra for products with
+    polynomials of each of those lengths are computed right away.
+    """
+    if isinstance(polynom, PreparedPolynomial):
+        prepared = polynom
+    else:
+        polynom = __unwrap(polynom, engine)
+        if is_array(polynom):
+            content = str(polynom.dtype) + numpy.ascontiguousarray(
+                polynom).tostring()
+        else:
+            polynom = list(polynom)
+            content = repr(polynom)
+        import hashlib
+        digest = hashlib.sha1(content).hexdigest()
+        prepared = PreparedPolynomial(polynom, digest, is_real(polynom))
+    for length in other_lengths:
+        engine_name = __array_engine(None, engine)
+        size = transform_size(len(prepared) + length - 1, engine_name)
+        real = prepared.real and size > 1
+        __prepared_spectrum(prepared, size, real, engine_name)
+    return prepared
+
+def __prepared_spectrum(prepared, size, real, engine):
+    """
+    Returns the spectrum of a PreparedPolynomial padded to size: from
+    realFFT() if real is True, otherwise from optimalFT(). It is taken
+    from the polynomial itself or the spectrum cache if it is there,
+    and otherwise computed and kept in both.
+    """
+    spectrum_key = (size, real, engine)
+    spectrum = prepared.spectra.get(spectrum_key)
+    if spectrum is not None:
+        return spectrum
+    key = (prepared.digest,) + spectrum_key
+    spectrum = __spectrum_cache.get(key)
+    if spectrum is None:
+        spectrum = __spectrum(prepared.coefficients, size, real, engine)
+        __spectrum_cache.put(key, spectrum)
+    prepared.spectra[spectrum_key] = spectrum
+    return spectrum
+
+def __spectrum(polynom, size, real, engine):
+    """
+    Returns the spectrum of polynom padded to size, with realFFT() if
+    real is True and otherwise with optimalFT().
+    """
+    if real:
+        return realFFT(pad_list(polynom, size), engine)
+    return optimalFT(pad_list(polynom, size), engine)
+
+def __spectrum_bytes(spectrum):
+    """Returns about how many bytes a spectrum takes in memory."""
+    if is_array(spectrum):
+        return spectrum.nbytes
+    return __table_bytes(spectrum)
+
+def __multiply_prepared(polynom1, polynom2, size, engine, real=None):
+    """
+    Multiplies two polynomials, either of which may be a
+    PreparedPolynomial, padded to size, and returns the
+    len(polynom1) + len(polynom2) - 1 coefficients of the product. The
+    spectrum of a prepared polynomial comes from
+    __prepared_spectrum(), and that of a plain list is computed, so
+    the product takes one or two forward FFTs fewer than
+    __multiply_padded().
+    """
+    product_length = __product_length(polynom1, polynom2)
+    if product_length < 1:
+        return []
+    if real is None:
+        real = all(polynom.real if isinstance(polynom, PreparedPolynomial)
+                   else is_real(polynom) for polynom in (polynom1, polynom2))
+    real = real and size > 1
+    spectra = []
+    for polynom in (polynom1, polynom2):
+        if isinstance(polynom, PreparedPolynomial):
+            spectra.append(__prepared_spectrum(polynom, size, real, engine))
+        else:
+            spectra.append(__spectrum(polynom, size, real, engine))
+    product_spectrum = multiply_point_values(spectra[0], spectra[1])
+    if real:
+        product = inverse_realFFT(product_spectrum, engine)
+    else:
+        product = optimal_inverseFT(product_spectrum, engine)
+    return product[:product_length]
+
+def __coefficients(polynom):
+    """
+    Returns the coefficients of polynom, which may be a
+    PreparedPolynomial.
+    """
+    if isinstance(polynom, PreparedPolynomial):
+        return polynom.coefficients
+    return polynom
+
+def __product_length(polynom1, polynom2):
+    """
+    Returns the number of coefficients of the product of two
+    polynomials: len(polynom1) + len(polynom2) - 1, or 0 if either of
+    them has no coefficients, since then the product is empty too (as
+    with schoolbook_multiply()).
+    """
+    if not len(polynom1) or not len(polynom2):
+        return 0
+    return len(polynom1) + len(polynom2) - 1
+
+def set_spectrum_cache_limit(limit_bytes):
+    """
+    Sets the most memory, in bytes, that the cached spectra of prepared
+    polynomials may use. The most recently used spectrum is always
+    kept, even if it is larger than the limit by itself. The spectra
+    that a PreparedPolynomial keeps itself are not affected.
+    """
+    __spectrum_cache.set_limit(limit_bytes)
+
+def clear_spectrum_cache():
+    """Empties the spectrum cache."""
+    __spectrum_cache.clear()
+
+def spectrum_cache_info():
+    """
+    Returns a dict with the number of spectra in the cache, the bytes
+    they take, the limit and the number of cache hits and misses.
+    """
+    info = __spectrum_cache.info()
+    info['spectra'] = info.pop('count')
+    return info
+
+
+##########################################################
+###### REAL INPUT METHODS ################################
+##########################################################
+
+def realFFT(a_list, engine=None):
+    """
+    The realFFT method computes the FFT of a list of real numbers with
+    a complex FFT of half the length. The even-indexed values are used
+    as the real parts and the odd-indexed values as the imaginary
+    parts of the half-length list, and the two halves of its FFT are
+    then separated and combined (with omega_n^k) into the FFT of the
+    whole list.
+
+    The FFT of a real list is Hermitian symmetric (y_(n-k) is the
+    complex conjugate of y_k), so only y_0 to y_(n/2) are returned.
+    Please see inverse_realFFT() for the inverse. The length n must be
+    even (or 1), otherwise a ValueError is raised; optimalFT() takes
+    lists of any length.
+    """
+    if isinstance(a_list, CoefficientArray):
+        return __wrap(realFFT(__unwrap(a_list, engine), engine))
+    engine = __array_engine(a_list, engine)
+    n = __real_length(a_list, engine)
+    if engine == 'numpy':
+        return __numpy_realFFT(a_list)
+    if n < 2:
+        return optimalFT(a_list, engine)
+    half = n / 2
+    packed = [complex(a_list[2*j], a_list[2*j + 1]) for j in xrange(half)]
+    packed_spectrum = optimalFT(packed, engine)
+    (twiddles, stride) = get_twiddle_table(n)
+    spectrum = []
+    for k in xrange(half + 1):
+        z = packed_spectrum[k % half]
+        z_conjugate = packed_spectrum[(half - k) % half].conjugate()
+        even = (z + z_conjugate) * 0.5
+        odd = (z - z_conjugate) * -0.5j
+        spectrum.append(even + twiddles[k * stride] * odd)
+    return spectrum
+
+def inverse_realFFT(spectrum, engine=None):
+    """
+    The inverse_realFFT method is the inverse of realFFT(), and
+    accepts the n/2 + 1 values y_0 to y_(n/2) of a Hermitian symmetric
+    spectrum. The even and odd halves are packed back into one complex
+    list of length n/2, and its inverse FFT has the even-indexed
+    results as its real parts and the odd-indexed results as its
+    imaginary parts. The list of n real numbers is returned.
+
+    The length n is always taken to be even, as for realFFT(), since
+    the spectrum of a list of odd length n + 1 has the same number of
+    values.
+    """
+    if isinstance(spectrum, CoefficientArray):
+        return __wrap(inverse_realFFT(__unwrap(spectrum, engine), engine))
+    engine = __array_engine(spectrum, engine)
+    if engine == 'numpy':
+        return __numpy_inverse_realFFT(spectrum)
+    half = len(spectrum) - 1
+    if half < 1:
+        return [sanitize_value(y.real) for y in
+                optimal_inverseFT(spectrum, engine)]
+    n = 2 * half
+    (twiddles, stride) = get_twiddle_table(n)
+    table_size = len(twiddles)
+    packed_spectrum = []
+    for k in xrange(half):
+        y = spectrum[k]
+        y_conjugate = spectrum[half - k].conjugate()
+        even = (y + y_conjugate) * 0.5
+        odd = (y - y_conjugate) * 0.5 * twiddles[-k * stride % table_size]
+        packed_spectrum.append(even + 1j * odd)
+    packed = optimal_inverseFT(packed_spectrum, engine)
+    a_list = [0] * n
+    for j in xrange(half):
+        a_list[2*j] = sanitize_value(packed[j].real)
+        a_list[2*j + 1] = sanitize_value(packed[j].imag)
+    return a_list
+
+def real_multiply(polynom1, polynom2, engine=None):
+    """
+    The real_multiply method multiplies two polynomials with real
+    coefficients and of the same even length, in the same way as
+    multiply_polynomials(), and raises a ValueError otherwise.
+
+    Both polynomials are transformed with one complex FFT, with
+    polynom1 as the real parts and polynom2 as the imaginary parts.
+    Because both of their spectra are Hermitian symmetric they can be
+    separated again, and only the first half of their product is
+    computed, which is turned back into the (real) product with
+    inverse_realFFT().
+    """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(real_multiply(__unwrap(polynom1, engine),
+                                    __unwrap(polynom2, engine), engine))
+    engine = __array_engine(polynom1, engine)
+    n = __real_length(polynom1, engine)
+    if n != __real_length(polynom2, engine):
+        raise ValueError("Lists provided are not of the same length: " +
+                         str(n) + " and " + str(__real_length(polynom2,
+                                                              engine)))
+    if engine == 'numpy':
+        return __numpy_real_multiply(polynom1, polynom2)
+    packed = [complex(polynom1[j], polynom2[j]) for j in xrange(n)]
+    packed_spectrum = optimalFT(packed, engine)
+    product_spectrum = []
+    for k in xrange(n / 2 + 1):
+        z = packed_spectrum[k]
+        z_conjugate = packed_spectrum[-k % n].conjugate()
+        ## the spectra of polynom1 and polynom2 at k are
+        ## (z + z_conjugate) / 2 and (z - z_conjugate) / 2i
+        product_spectrum.append((z*z - z_conjugate*z_conjugate) * -0.25j)
+    return inverse_realFFT(product_spectrum, engine)
+
+def __real_length(a_list, engine):
+    """
+    Returns the length of a_list (of each of its rows, for the 'numpy'
+    engine), and raises a ValueError if it is odd, since realFFT() and
+    real_multiply() pack pairs of values into one complex value.
+    """
+    n = numpy.shape(a_list)[-1] if engine == 'numpy' else len(a_list)
+    if n > 1 and n % 2:
+        raise ValueError("List provided is not of even length: " + str(n))
+    return n
+
+def is_real(a_list):
+    """
+    Returns True if none of the values in a_list are complex numbers.
+    """
+    if is_array(a_list):
+        return not numpy.iscomplexobj(a_list)
+    for value in a_list:
+        if isinstance(value, complex):
+            return False
+    return True
+
+
+##########################################################
+###### ARBITRARY LENGTH METHODS ##########################
+##########################################################
+
+def mixed_radixFFT(a_list):
+    """
+    The mixed_radixFFT method computes the FFT of a list of any
+    length. It is the same divide and conquer as the recursive FFT,
+    except that a list whose length n has a factor p of 3 or 5 is split
+    into p lists, of every p-th element, instead of always into 2. The
+    FFTs of the p lists are combined with omega_n^rk and a small DFT of
+    length p.
+
+    If the length has a prime factor above 5, Bluestein's FFT is used
+    for the lists that cannot be split any further.
+    """
+    return __mixed_radix(list(a_list), 1)
+
+def mixed_radix_inverseFFT(y_list):
+    """
+    The mixed_radix_inverseFFT method is the inverse of
+    mixed_radixFFT(), which uses omega_n^-1 and divides each element of
+    the result by n.
+    """
+    n = float(len(y_list))
+    return [sanitize_value(x / n) for x in __mixed_radix(list(y_list), -1)]
+
+def __mixed_radix(a, direction):
+    """
+    The recursive part of mixed_radixFFT(), where direction is 1 for
+    the forward FFT and -1 for the inverse (without dividing by n).
+
+    The factors of 3 and 5 are split off first, so that the lists left
+    at the bottom of the recursion have a power of 2 length, and those
+    are done in place with the iterative butterflies.
+    """
+    n = len(a)
+    if n < 2:
+        return a
+    if __is_power_of_2(n):
+        __iterative_passes(a, direction)
+        return a
+    for p in (3, 5, 2):
+        if not n % p:
+            break
+    else:
+        return __bluestein(a, direction)
+    m = n / p
+    y_lists = [__mixed_radix(a[r::p], direction) for r in xrange(p)]
+    (twiddles, stride) = get_twiddle_table(n)
+    table_size = len(twiddles)
+    ## omega_p^e, which is omega_n^(e*m)
+    p_roots = [twiddles[direction * e * m * stride % table_size]
+               for e in xrange(p)]
+    result = [0] * n
+    if p == 2:
+        (y_list0, y_list1) = y_lists
+        for k in xrange(m):
+            t = twiddles[direction * k * stride % table_size] * y_list1[k]
+            result[k] = y_list0[k] + t
+            result[k + m] = y_list0[k] - t
+    elif p == 3:
+        (y_list0, y_list1, y_list2) = y_lists
+        (w, w_squared) = p_roots[1:]
+        for k in xrange(m):
+            index = direction * k * stride
+            t0 = y_list0[k]
+            t1 = twiddles[index % table_size] * y_list1[k]
+            t2 = twiddles[2 * index % table_size] * y_list2[k]
+            result[k] = t0 + t1 + t2
+            result[k + m] = t0 + t1*w + t2*w_squared
+            result[k + 2*m] = t0 + t1*w_squared + t2*w
+    else:
+        for k in xrange(m):
+            terms = [y_lists[0][k]]
+            for r in xrange(1, p):
+                terms.append(twiddles[direction * r * k * stride %
+                                      table_size] * y_lists[r][k])
+            for q in xrange(p):
+                value = terms[0]
+                for r in xrange(1, p):
+                    value += terms[r] * p_roots[r * q % p]
+                result[k + q*m] = value
+    return result
+
+def bluesteinFFT(a_list):
+    """
+    The bluesteinFFT method computes the FFT of a list of any length
+    n with Bluestein's chirp-z algorithm. Since jk = (j^2 + k^2 -
+    (k-j)^2) / 2, every y_k can be written as a chirp (omega_2n^(k^2))
+    times the convolution of the coefficients (each multiplied by its
+    own chirp) with the conjugate chirps. That convolution is done with
+    power of 2 FFTs at least 2n - 1 long.
+    """
+    return __bluestein(list(a_list), 1)
+
+def bluestein_inverseFFT(y_list):
+    """
+    The bluestein_inverseFFT method is the inverse of bluesteinFFT().
+    """
+    n = float(len(y_list))
+    return [sanitize_value(x / n) for x in __bluestein(list(y_list), -1)]
+
+def __bluestein(a, direction):
+    """
+    The main part of bluesteinFFT(), where direction is 1 for the
+    forward FFT and -1 for the inverse (without dividing by n).
+    """
+    n = len(a)
+    if n < 2:
+        return a
+    (twiddles, stride) = get_twiddle_table(2 * n)
+    table_size = len(twiddles)
+    chirps = [twiddles[direction * (j * j % (2 * n)) * stride % table_size]
+              for j in xrange(n)]
+    m = padded_size(2*n - 1)
+    weighted = [a[j] * chirps[j] for j in xrange(n)] + [0] * (m - n)
+    conjugates = [0] * m
+    for j in xrange(n):
+        conjugates[j] = conjugates[-j % m] = complex(chirps[j]).conjugate()
+    bit_reverse_permute(weighted)
+    __iterative_butterflies(weighted, 1)
+    bit_reverse_permute(conjugates)
+    __iterative_butterflies(conjugates, 1)
+    convolution = [x * y for (x, y) in zip(weighted, conjugates)]
+    bit_reverse_permute(convolution)
+    __iterative_butterflies(convolution, -1)
+    return [chirps[k] * convolution[k] / m for k in xrange(n)]
+
+
+##########################################################
+###### STREAMING METHODS #################################
+##########################################################
+
+def convolve_stream(stream, kernel, block_size=None, method='overlap_add',
+                    engine=None):
+    """
+    The convolve_stream method multiplies a polynomial whose
+    coefficients come from any iterable (stream), which may be far too
+    long to keep in memory, by a fixed kernel polynomial. It is a
+    generator that yields the coefficients of the product in lists, a
+    block at a time, as the stream is read, so only a block of the
+    stream and of the product are in memory at once. Altogether the
+    blocks are the len(stream) + len(kernel) - 1 coefficients of the
+    product, the same as multiply_polynomials(stream, kernel).
+
+    The stream is read in blocks of block_size coefficients (by default,
+    enough to fill an FFT of about four times the kernel's length), and
+    each block is multiplied by the kernel with one FFT, its spectrum
+    times the kernel's spectrum, and one inverse FFT. The kernel's
+    spectrum is only computed once. The products of neighbouring
+    blocks overlap by len(kernel) - 1 coefficients, which is handled
+    with either method:
+
+    - 'overlap_add': the end of each block's product is added to the
+      start of the next block's product.
+    - 'overlap_save': each FFT is of the block with the last
+      len(kernel) - 1 coefficients of the stream before it, and the
+      start of its (circular) product, which wrapped around, is thrown
+      away.
+
+    Real streams and kernels use realFFT(), like real_multiply().
+    """
+    if method not in ('overlap_add', 'overlap_save'):
+        raise ValueError("Unknown convolution method: " + str(method))
+    kernel = list(__unwrap(kernel))
+    overlap = len(kernel) - 1
+    if overlap < 0:
+        raise ValueError("The kernel must have at least one coefficient")
+    engine = __array_engine(None, engine)
+    if block_size is None:
+        size = transform_size(4 * len(kernel), engine)
+        block_size = size - overlap
+    else:
+        size = transform_size(block_size + overlap, engine)
+    kernel_spectra = {}
+    stream = iter(stream)
+    if method == 'overlap_add':
+        blocks = __overlap_add(stream, kernel, kernel_spectra, block_size,
+                               size, engine)
+    else:
+        blocks = __overlap_save(stream, kernel, kernel_spectra, block_size,
+                                size, engine)
+    for block in blocks:
+        yield block
+
+def __overlap_add(stream, kernel, kernel_spectra, block_size, size, engine):
+    """
+    Yields the product blocks of convolve_stream() with overlap-add.
+    """
+    overlap = len(kernel) - 1
+    tail = [0] * overlap
+    read_any = False
+    for block in __stream_blocks(stream, block_size):
+        read_any = True
+        product = __circular_product(block, kernel, kernel_spectra, size,
+                                     engine)
+        for i in xrange(overlap):
+            product[i] = sanitize_value(product[i] + tail[i])
+        length = len(block)
+        yield product[:length]
+        tail = product[length:length + overlap]
+    if read_any and overlap:
+        yield tail
+
+def __overlap_save(stream, kernel, kernel_spectra, block_size, size,
+                   engine):
+    """
+    Yields the product blocks of convolve_stream() with overlap-save.
+    """
+    overlap = len(kernel) - 1
+    history = [0] * overlap
+    def save(block):
+        segment = history + block
+        history[:] = segment[len(segment) - overlap:]
+        product = __circular_product(segment, kernel, kernel_spectra, size,
+                                     engine)
+        return product[overlap:len(segment)]
+    read_any = False
+    for block in __stream_blocks(stream, block_size):
+        read_any = True
+        yield save(block)
+    if read_any:
+        ## the last len(kernel) - 1 coefficients of the product only
+        ## need the history, which is pushed out with zeroes
+        for start in xrange(0, overlap, block_size):
+            yield save([0] * min(block_size, overlap - start))
+
+def __stream_blocks(stream, block_size):
+    """
+    Yields lists of the next block_size values of the iterator stream,
+    until it runs out (the last list may be shorter).
+    """
+    while True:
+        block = list(itertools.islice(stream, block_size))
+        if not block:
+            return
+        yield block
+
+def __circular_product(block, kernel, kernel_spectra, size, engine):
+    """
+    Returns the circular product (of length size) of block and kernel,
+    both padded with zeroes, using the kernel's spectrum from
+    kernel_spectra, which is computed and kept there the first time it
+    is needed. The real and complex spectra are kept separately.
+    """
+    real = is_real(block) and is_real(kernel) and size > 1
+    spectrum = kernel_spectra.get(real)
+    if spectrum is None:
+        if real:
+            spectrum = realFFT(pad_list(kernel, size), engine)
+        else:
+            spectrum = optimalFT(pad_list(kernel, size), engine)
+        kernel_spectra[real] = spectrum
+    if real:
+        block_spectrum = realFFT(pad_list(block, size), engine)
+        product = inverse_realFFT([x * y for (x, y) in
+                                   zip(block_spectrum, spectrum)], engine)
+    else:
+        block_spectrum = optimalFT(pad_list(block, size), engine)
+        product = optimal_inverseFT([x * y for (x, y) in
+                                     zip(block_spectrum, spectrum)], engine)
+    return list(product)
+
+
+##########################################################
+###### POWER AND PRODUCT METHODS #########################
+##########################################################
+
+## product_tree() multiplies pairs of polynomials until this many are
+## left, and then multiplies those all at once in the spectral domain.
+## Each of them takes a forward FFT of the final size, plus one inverse
+## FFT at the end, while finishing the tree would take three FFTs per
+## product, at about the final size per level.
+__product_fan_in = 4
+
+def polynomial_power(polynom, exponent, engine=None):
+    """
+    The polynomial_power method returns polynom raised to the (whole,
+    non-negative) exponent, which has exponent * (len(polynom) - 1) + 1
+    coefficients.
+
+    Rather than multiplying polynom by itself over and over, which goes
+    back to the coefficients after every product, polynom is padded to
+    the size of the final product and transformed once, each of its
+    point values is raised to the exponent, and one inverse FFT gives
+    the power. Real polynomials use realFFT().
+
+    With integer coefficients the result is rounded to integers, as
+    long as the FFT is precise enough for that (its error bound, as in
+    product_error_bound(), is under 0.5). If it is not, or the engine
+    is 'ntt', 'schoolbook' or 'karatsuba', the power is computed by
+    repeated squaring with multiply_polynomials() instead, which
+    multiplies integers exactly (see __multiply_integers()).
+    """
+    if isinstance(polynom, CoefficientArray):
+        return __wrap(polynomial_power(__unwrap(polynom, engine), exponent,
+                                       engine))
+    if exponent < 0 or exponent != int(exponent):
+        raise ValueError("The exponent must be a whole number of at least "
+                         "0: " + str(exponent))
+    exponent = int(exponent)
+    if exponent == 0:
+        return [1]
+    if not len(polynom):
+        return []
+    if exponent == 1:
+        return list(polynom)
+    integer = __is_integer_list(polynom)
+    if engine in ('ntt', 'schoolbook', 'karatsuba'):
+        return __power_by_squaring(polynom, exponent, engine)
+    engine = __array_engine(polynom, engine)
+    length = exponent * (len(polynom) - 1) + 1
+    size = transform_size(length, engine)
+    if integer and not __integer_error_bound(
+            polynom, polynom, size, [polynom] * (exponent - 2)) < 0.5:
+        return __integer_result(
+            __power_by_squaring(polynom, exponent, engine), engine)
+    real = is_real(polynom) and size > 1
+    spectrum = __spectrum(polynom, size, real, engine)
+    if is_array(spectrum):
+        powered = spectrum ** exponent
+    else:
+        powered = [y ** exponent for y in spectrum]
+    return __from_spectrum(powered, length, real, integer, engine)
+
+def __power_by_squaring(polynom, exponent, engine):
+    """
+    Returns polynom raised to exponent (at least 1) by repeated
+    squaring, with multiply_polynomials() and the named engine.
+    """
+    result = None
+    square = polynom
+    while True:
+        if exponent & 1:
+            if result is None:
+                result = square
+            else:
+                result = multiply_polynomials(result, square, engine)
+        exponent >>= 1
+        if not exponent:
+            return list(result)
+        square = multiply_polynomials(square, square, engine)
+
+def product_tree(polynoms, engine=None):
+    """
+    The product_tree method returns the product of every polynomial in
+    polynoms (p1 * p2 * ... * pk).
+
+    The products are done as a balanced binary tree rather than one
+    after the other: the two shortest polynomials are always multiplied
+    first, so the intermediate products stay as short as they can be
+    and each coefficient only takes part in about log2(k) products.
+    Once only __product_fan_in polynomials are left, they are padded to
+    the size of the final product, transformed, and multiplied together
+    as point values, so only one inverse FFT is done for all of them.
+
+    With integer coefficients every product is exact (see
+    __multiply_integers()). The last polynomials are only multiplied
+    as point values if the error bound of their product (as in
+    product_error_bound()) is under 0.5, so that it can be rounded to
+    the exact integers, and are otherwise multiplied in pairs too.
+    """
+    polynoms = list(polynoms)
+    if any(isinstance(polynom, CoefficientArray) for polynom in polynoms):
+        return __wrap(product_tree([__unwrap(polynom, engine)
+                                    for polynom in polynoms], engine))
+    if not polynoms:
+        return [1]
+    if any(not len(polynom) for polynom in polynoms):
+        return []
+    integer = all(__is_integer_list(polynom) for polynom in polynoms)
+    exact_engine = engine in ('ntt', 'schoolbook', 'karatsuba')
+    length = sum(len(polynom) for polynom in polynoms) - len(polynoms) + 1
+    fan_in = 1 if exact_engine else __product_fan_in
+    ## a heap of (length, order, polynomial), so that the two shortest
+    ## polynomials are always the next ones multiplied
+    heap = [(len(polynom), i, polynom) for (i, polynom) in
+            enumerate(polynoms)]
+    heapq.heapify(heap)
+    order = len(heap)
+    while len(heap) > fan_in:
+        (length1, i, polynom1) = heapq.heappop(heap)
+        (length2, j, polynom2) = heapq.heappop(heap)
+        product = multiply_polynomials(polynom1, polynom2, engine)
+        heapq.heappush(heap, (len(product), order, product))
+        order += 1
+    last = [polynom for (length1, i, polynom) in heap]
+    if len(last) == 1:
+        return list(last[0])
+    engine = __array_engine(last[0], engine)
+    size = transform_size(length, engine)
+    if integer and not __integer_error_bound(last[0], last[1], size,
+                                             last[2:]) < 0.5:
+        product = last[0]
+        for polynom in last[1:]:
+            product = multiply_polynomials(product, polynom, engine)
+        return __integer_result(list(product), engine)
+    real = all(is_real(polynom) for polynom in last) and size > 1
+    product_spectrum = None
+    for polynom in last:
+        spectrum = __spectrum(polynom, size, real, engine)
+        if product_spectrum is None:
+            product_spectrum = spectrum
+        else:
+            product_spectrum = multiply_point_values(product_spectrum,
+                                                     spectrum)
+    return __from_spectrum(product_spectrum, length, real, integer, engine)
+
+def __from_spectrum(spectrum, length, real, integer, engine):
+    """
+    Returns the first length coefficients of the inverse FFT of a
+    spectrum (a half spectrum from realFFT() if real is True), rounded
+    to integers if integer is True.
+    """
+    if real:
+        result = inverse_realFFT(spectrum, engine)[:length]
+    else:
+        result = optimal_inverseFT(spectrum, engine)[:length]
+    if not integer:
+        return result
+    if is_array(result):
+        return numpy.rint(result.real).astype(numpy.int64)
+    return [int(round(complex(x).real)) for x in result]
+
+def __exact_engine(bound):
+    """
+    Returns the engine that multiplies integer polynomials exactly when
+    their product's coefficients are at most bound: 'ntt' if the
+    product of the NTT primes is large enough for them, and otherwise
+    'karatsuba', which multiplies Python's unlimited integers.
+    """
+    modulus = 1
+    for (prime, generator, k) in __ntt_primes:
+        modulus *= prime
+    if modulus > 2 * bound:
+        return 'ntt'
+    return 'karatsuba'
+
+
+##########################################################
+###### EVALUATION METHODS ################################
+##########################################################
+
+## the DFT and FFT evaluate polynomials at the roots of unity. These
+## methods evaluate them at any points, and interpolate them back, with
+## the "subproduct tree" of the points: a binary tree whose leaves are
+## the polynomials (x - x_i), and whose every other node is the product
+## of its two children. A polynomial's values at the points under a
+## node only depend on its remainder modulo the node's polynomial, so
+## its remainders can be passed down the tree, getting shorter at
+## every level, with O(n log^2 n) work altogether.
+
+## quotients of this many coefficients or fewer are found with long
+## division rather than with the reciprocal (see polynomial_divmod())
+__division_leaf = 32
+
+## a floating point division also falls back to long division if the
+## reciprocal of the divisor grows past this many times its first
+## coefficient, since the quotient's rounding errors grow with it
+__reciprocal_growth = 2**20
+
+## remainders of this many coefficients or fewer are evaluated at each
+## of their points with Horner's rule instead of being divided further
+__evaluation_leaf = 16
+
+## evaluate_points() uses Horner's rule at every point, rather than the
+## subproduct tree, for up to this many points. It is measured on each
+## machine by fourier_tune.py the first time it is needed, like the
+## multiplication crossovers, and the default is only used if it
+## cannot be.
+__evaluation_crossover = None
+__default_evaluation_crossover = 4096
+
+## a floating point remainder (or the product of the quotient and the
+## divisor it was found with) that is this many times larger than the
+## values of the polynomial can be has lost too many digits to
+## rounding, so its points are evaluated with Horner's rule instead
+__remainder_growth = 2**20
+
+def get_evaluation_crossover():
+    """
+    Returns the most points that evaluate_points() evaluates with
+    Horner's rule, loading it with
+    fourier_tune.load_or_tune_evaluation_crossover() the first time.
+    """
+    global __evaluation_crossover
+    with __crossover_lock:
+        crossover = __evaluation_crossover
+        if crossover is None:
+            ## publish the default first, so that the evaluations timed
+            ## while tuning do not try to load it again
+            __evaluation_crossover = __default_evaluation_crossover
+    if crossover is not None:
+        return crossover
+    ## the tuning is done outside of the lock, since the products it
+    ## times take the lock for the multiplication crossovers
+    import fourier_tune
+    crossover = fourier_tune.load_or_tune_evaluation_crossover()
+    with __crossover_lock:
+        if crossover is not None and \
+           __evaluation_crossover == __default_evaluation_crossover:
+            __evaluation_crossover = crossover
+        return __evaluation_crossover
+
+def set_evaluation_crossover(points):
+    """
+    Sets the most points that evaluate_points() evaluates with
+    Horner's rule instead of the subproduct tree (0 always uses the
+    tree).
+    """
+    global __evaluation_crossover
+    with __crossover_lock:
+        __evaluation_crossover = points
+
+def polynomial_reciprocal(polynom, length, engine=None):
+    """
+    The polynomial_reciprocal method returns the first length
+    coefficients of the power series 1 / polynom, whose constant
+    coefficient must not be 0.
+
+    It uses Newton's iteration: if g is the reciprocal to k
+    coefficients, g * (2 - polynom * g) is the reciprocal to 2k
+    coefficients, so the number of correct coefficients doubles with
+    every two products, and the last (longest) products take about as
+    long as all of the others together.
+
+    If polynom has integer coefficients and a constant of 1 or -1, so
+    does its reciprocal, and it is computed exactly.
+    """
+    polynom = list(__unwrap(polynom, engine))
+    if not polynom or polynom[0] == 0:
+        raise ValueError("A polynomial with a constant coefficient of 0 "
+                         "has no reciprocal")
+    if __is_integer_list(polynom) and polynom[0] in (1, -1):
+        reciprocal = [polynom[0]]
+    else:
+        reciprocal = [1.0 / polynom[0]]
+    known = 1
+    while known < length:
+        known = min(2 * known, length)
+        error = __multiply_exact(polynom[:known], reciprocal, engine)[:known]
+        correction = [-x for x in error]
+        correction[0] += 2
+        reciprocal = __multiply_exact(reciprocal, correction,
+                                      engine)[:known]
+    return reciprocal[:length]
+
+def polynomial_divmod(dividend, divisor, engine=None):
+    """
+    The polynomial_divmod method divides two polynomials and returns a
+    2-tuple of the quotient and the remainder, which has fewer
+    coefficients than the divisor. Zero coefficients at the end (the
+    highest powers) of the divisor are ignored.
+
+    Reversing the order of the coefficients of a polynomial of degree
+    d, rev(a) = x^d * a(1/x), turns the division into a product of
+    power series: rev(quotient) is rev(dividend) times the reciprocal
+    of rev(divisor) (see polynomial_reciprocal()), to as many
+    coefficients as the quotient has. So the division only takes a few
+    multiplications, instead of the quadratic time of long division,
+    which is still used for short quotients.
+
+    The division is exact for integer polynomials if the divisor's
+    leading coefficient is 1 or -1 (as it is for every polynomial in a
+    subproduct tree), and uses floats otherwise. With floats, the
+    reciprocal grows geometrically if the divisor has roots outside the
+    unit circle, and the FFT's rounding errors (which are relative to
+    its largest coefficient) would swamp the quotient, so then long
+    division is used after all.
+    """
+    dividend = __trim(__unwrap(dividend, engine))
+    divisor = __trim(__unwrap(divisor, engine))
+    if not divisor:
+        raise ValueError("Division by the zero polynomial")
+    quotient_length = len(dividend) - len(divisor) + 1
+    if quotient_length < 1:
+        return ([], dividend)
+    if quotient_length <= __division_leaf or len(divisor) == 1:
+        return __long_division(dividend, divisor)
+    exact = __is_integer_list(divisor) and divisor[-1] in (1, -1)
+    try:
+        reciprocal = polynomial_reciprocal(divisor[::-1], quotient_length,
+                                           engine)
+    except (OverflowError, ValueError): ## the reciprocal blew up
+        return __long_division(dividend, divisor)
+    ## the growth is compared in floats, which cannot overflow here
+    ## (__largest() gives infinity instead)
+    if not exact and not __largest(reciprocal) * __largest(divisor[-1:]) \
+       <= __reciprocal_growth:
+        return __long_division(dividend, divisor)
+    reversed_quotient = __multiply_exact(
+        dividend[::-1][:quotient_length], reciprocal,
+        engine)[:quotient_length]
+    quotient = reversed_quotient[::-1]
+    product = __multiply_exact(quotient, divisor, engine)
+    remainder = __trim([dividend[i] - product[i]
+                        for i in xrange(len(divisor) - 1)])
+    return (quotient, remainder)
+
+def __long_division(dividend, divisor):
+    """
+    Returns the quotient and remainder of dividend / divisor (with no
+    zeroes at the end of divisor) by long division.
+    """
+    remainder = list(dividend)
+    leading = divisor[-1]
+    exact = leading in (1, -1) and __is_integer_list(dividend) and \
+            __is_integer_list(divisor)
+    degree = len(divisor) - 1
+    quotient = [0] * (len(dividend) - degree)
+    for i in xrange(len(quotient) - 1, -1, -1):
+        if exact:
+            factor = remainder[i + degree] * leading
+        else:
+            factor = remainder[i + degree] / (1.0 * leading)
+        quotient[i] = factor
+        if factor:
+            for (j, b) in enumerate(divisor):
+                remainder[i + j] -= factor * b
+    return (quotient, __trim(remainder[:degree]))
+
+def evaluate_points(polynom, points, engine=None, method=None):
+    """
+    The evaluate_points method returns the values of polynom at every
+    one of the points (which can be any numbers), in the same order.
+
+    The remainders of polynom modulo the subproduct tree of the points
+    are passed down the tree (see the comment above), and once a
+    remainder is short it is evaluated at its points with Horner's
+    rule. With integer coefficients and points the values are exact.
+
+    With floats the remainders are only accurate if the points are
+    evenly spread (like roots of unity, or Chebyshev points): otherwise
+    they get much larger than the values, which are then what is left
+    after the rounding errors of large numbers cancel out. So a
+    remainder that grows too large (or overflows) is dropped, and its
+    points are evaluated with Horner's rule on polynom itself.
+
+    Horner's rule takes time proportional to the number of points
+    times the number of coefficients, but it is so much simpler than
+    the tree that it is faster up to thousands of points, so it is
+    used for up to get_evaluation_crossover() points. It is always
+    used for integer polynomials and points, since the coefficients of
+    the tree's nodes grow like the points to the power of their
+    degree, and dividing by them is slower than Horner's rule at any
+    number of points. Passing method='horner' or method='tree' uses
+    that method regardless.
+    """
+    polynom = __trim(__unwrap(polynom, engine))
+    points = list(__unwrap(points))
+    if not points:
+        return []
+    exact = __is_integer_list(polynom) and __is_integer_list(points)
+    if method is None:
+        if exact or len(points) <= __evaluation_leaf or \
+           len(polynom) <= __evaluation_leaf or \
+           len(points) <= get_evaluation_crossover():
+            method = 'horner'
+        else:
+            method = 'tree'
+    if method == 'horner':
+        return [__horner(polynom, x) for x in points]
+    if method != 'tree':
+        raise ValueError("Unknown evaluation method: " + repr(method))
+    limit = None ## no limit on exact remainders
+    if not exact:
+        ## |polynom(x)| is at most the sum of its coefficients' sizes
+        ## times |x|^degree, for |x| >= 1
+        try:
+            limit = __remainder_growth * \
+                    sum(abs(complex(x)) for x in polynom) * \
+                    max(1.0, __largest(points))**(len(polynom) - 1)
+        except OverflowError:
+            limit = float('inf')
+        if not limit < float('inf'):
+            return [__horner(polynom, x) for x in points]
+    order = __tree_order(points)
+    points = [points[i] for i in order]
+    tree = __subproduct_tree(points, engine)
+    values = [0] * len(points)
+    __evaluate_node(polynom, tree, len(tree) - 1, 0, points, values,
+                    engine, polynom, limit)
+    result = [0] * len(points)
+    for (i, value) in zip(order, values):
+        result[i] = value
+    return result
+
+def __evaluate_node(remainder, tree, level, index, points, values,
+                    engine, polynom, limit):
+    """
+    Evaluates remainder at the points under node index of the tree
+    level, writing their values into values. If limit is not None, a
+    child's remainder that is larger than limit (or was found from a
+    quotient and divisor whose sizes multiply to more than limit) is
+    not trusted, and the child's points are evaluated with polynom
+    itself instead.
+    """
+    width = 2**level
+    start = index * width
+    stop = min(start + width, len(points))
+    if len(remainder) <= __evaluation_leaf or level == 0:
+        for i in xrange(start, stop):
+            values[i] = __horner(remainder, points[i])
+        return
+    for child in (2 * index, 2 * index + 1):
+        if child >= len(tree[level - 1]):
+            continue
+        divisor = tree[level - 1][child]
+        try:
+            (quotient, child_remainder) = polynomial_divmod(
+                remainder, divisor, engine)
+            trusted = limit is None or \
+                      (__largest(child_remainder) <= limit and
+                       __largest(quotient) * __largest(divisor) <= limit)
+        except (OverflowError, ValueError): ## a float overflowed
+            trusted = False
+        if trusted:
+            __evaluate_node(child_remainder, tree, level - 1, child,
+                            points, values, engine, polynom, limit)
+        else:
+            child_start = child * 2**(level - 1)
+            for i in xrange(child_start,
+                            min(child_start + 2**(level - 1), stop)):
+                values[i] = __horner(polynom, points[i])
+
+def interpolate(points, values, engine=None):
+    """
+    The interpolate method returns the polynomial with len(points)
+    coefficients whose value at each of the points (which must all be
+    different) is the matching one of values. It is the inverse of
+    evaluate_points().
+
+    With M the product of every (x - x_i), Lagrange's formula gives
+    the polynomial as the sum of values_i / M'(x_i) * M / (x - x_i).
+    The M'(x_i) are found with evaluate_points(), and the sum is built
+    up the subproduct tree: the sum for a node is the sum for its left
+    child times its right child's polynomial, plus the other way
+    around.
+
+    The weights values_i / M'(x_i) are generally fractions. If the
+    points are integers, the M'(x_i) are exact integers, which soon
+    get too large for floats, so the sums are kept exactly, as integer
+    polynomials over a common denominator (see __interpolate_exact()),
+    and each coefficient is an integer if it is one and otherwise the
+    nearest float. For other points the coefficients are floats
+    (rounded off with sanitize_value()).
+    """
+    points = list(__unwrap(points))
+    values = list(__unwrap(values))
+    if len(points) != len(values):
+        raise ValueError("There must be as many values as points")
+    if not points:
+        return []
+    order = __tree_order(points)
+    points = [points[i] for i in order]
+    values = [values[i] for i in order]
+    tree = __subproduct_tree(points, engine)
+    root = tree[-1][0]
+    derivative = [i * root[i] for i in xrange(1, len(root))]
+    weights = evaluate_points(derivative, points, engine)
+    if 0 in weights:
+        raise ValueError("The points must all be different")
+    if __is_integer_list(points):
+        if not any(isinstance(value, complex) for value in values):
+            return __interpolate_exact(tree, values, weights, engine)
+        ## interpolation is linear, so the real and imaginary parts
+        ## are interpolated separately
+        real = __interpolate_exact(tree, [value.real for value in values],
+                                   weights, engine)
+        imag = __interpolate_exact(tree, [value.imag for value in values],
+                                   weights, engine)
+        return [complex(x, y) if y else x for (x, y) in zip(real, imag)]
+    sums = [[value / (1.0 * weight)]
+            for (value, weight) in zip(values, weights)]
+    for level in xrange(len(tree) - 1):
+        nodes = tree[level]
+        combined = []
+        for i in xrange(0, len(sums) - 1, 2):
+            left = __multiply_exact(sums[i], nodes[i + 1], engine)
+            right = __multiply_exact(sums[i + 1], nodes[i], engine)
+            combined.append([left[j] + right[j] if j < len(right)
+                             else left[j] for j in xrange(len(left))])
+        if len(sums) % 2:
+            combined.append(sums[-1])
+        sums = combined
+    result = [sanitize_value(x) for x in sums[0]]
+    return result + [0] * (len(points) - len(result))
+
+def __interpolate_exact(tree, values, weights, engine):
+    """
+    Returns the coefficients of Lagrange's formula (see interpolate())
+    for the subproduct tree of integer points, the real values and
+    the integer weights M'(x_i), computed exactly. The sum for each
+    node is an integer polynomial and a denominator, and two sums are
+    added over the least common multiple of their denominators, so
+    every product is of integer polynomials and is exact.
+    """
+    import fractions
+    sums = []
+    for (value, weight) in zip(values, weights):
+        fraction = fractions.Fraction(value) / weight
+        sums.append(([fraction.numerator], fraction.denominator))
+    for level in xrange(len(tree) - 1):
+        nodes = tree[level]
+        combined = []
+        for i in xrange(0, len(sums) - 1, 2):
+            ((left, left_denominator), (right, right_denominator)) = \
+                (sums[i], sums[i + 1])
+            denominator = left_denominator * right_denominator / \
+                          fractions.gcd(left_denominator, right_denominator)
+            left = __multiply_exact(
+                [x * (denominator / left_denominator) for x in left],
+                nodes[i + 1], engine)
+            right = __multiply_exact(
+                [x * (denominator / right_denominator) for x in right],
+                nodes[i], engine)
+            combined.append(([left[j] + right[j] if j < len(right)
+                              else left[j] for j in xrange(len(left))],
+                             denominator))
+        if len(sums) % 2:
+            combined.append(sums[-1])
+        sums = combined
+    (numerators, denominator) = sums[0]
+    result = []
+    for numerator in numerators:
+        if numerator % denominator:
+            result.append(float(fractions.Fraction(numerator, denominator)))
+        else:
+            result.append(numerator / denominator)
+    return result + [0] * (len(values) - len(result))
+
+def __subproduct_tree(points, engine):
+    """
+    Returns the subproduct tree of the points as a list of levels, from
+    the leaves (x - x_i) up to the root, the product of all of them.
+    Node i of a level is the product of nodes 2i and 2i+1 of the level
+    below (or just node 2i, if it is the last one).
+    """
+    level = [[-x, 1] for x in points]
+    tree = [level]
+    while len(level) > 1:
+        next_level = [__multiply_exact(level[i], level[i + 1], engine)
+                      for i in xrange(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        tree.append(next_level)
+        level = next_level
+    return tree
+
+def __tree_order(points):
+    """
+    Returns the order (a list of indices) to put the points in at the
+    leaves of their subproduct tree.
+
+    Any order gives the same values, but the coefficients of a node's
+    polynomial grow exponentially with its degree if its points are
+    close together (at worst they are binomial coefficients), and so do
+    the rounding errors of floating point remainders. So the points are
+    sorted (by their angle, if any are complex) and dealt out like the
+    bit reversal of the FFT: the even positions of the sorted order to
+    the left subtree, the odd positions to the right one, and so on
+    down, which spreads each node's points across all of them. For the
+    n-th roots of unity this makes every node x^m - c.
+    """
+    if any(isinstance(x, complex) and x.imag for x in points):
+        key = lambda i: (math.atan2(points[i].imag, points[i].real),
+                         abs(points[i]))
+    else:
+        key = lambda i: points[i].real
+    return __deal(sorted(xrange(len(points)), key=key))
+
+def __deal(indices):
+    """
+    Returns indices reordered with the even positions (recursively
+    reordered) first and then the odd positions (the same way).
+    """
+    if len(indices) <= 2:
+        return indices
+    return __deal(indices[0::2]) + __deal(indices[1::2])
+
+def __multiply_exact(polynom1, polynom2, engine):
+    """
+    Returns the product of two polynomials from multiply_polynomials(),
+    as a list. Products of integer polynomials are exact (see
+    __multiply_integers()), whatever the engine.
+    """
+    return list(multiply_polynomials(polynom1, polynom2, engine))
+
+def __largest(polynom):
+    """
+    Returns the largest absolute value of the coefficients of polynom
+    as a float (0.0 for no coefficients), or infinity if one is too
+    large for a float or is not a number.
+    """
+    try:
+        sizes = [abs(complex(x)) for x in polynom]
+    except OverflowError:
+        return float('inf')
+    if any(size != size for size in sizes): ## NaN
+        return float('inf')
+    return max([0.0] + sizes)
+
+def __horner(polynom, x):
+    """Returns the value of polynom at x, with Horner's rule."""
+    value = 0
+    for coefficient in reversed(polynom):
+        value = value * x + coefficient
+    return value
+
+def __trim(polynom):
+    """
+    Returns polynom as a list, without the zero coefficients at its end
+    (the zero polynomial is the empty list).
+    """
+    polynom = list(polynom)
+    while polynom and polynom[-1] == 0:
+        polynom.pop()
+    return polynom
+
 
 ##########################################################
-###### IMPORTANT METHODS #################################
+###### PARALLEL METHODS ##################################
 ##########################################################
 
-__optimal_threshold = 2**6
+def parallelFFT(a_list):
+    """
+    The parallelFFT method runs the four-step FFT over a pool of
+    processes. Please see fourier_parallel.py, which is only imported
+    when this engine is first used.
+    """
+    import fourier_parallel
+    return fourier_parallel.parallelFFT(a_list)
 
-def optimalFT(a_list):
+def parallel_inverseFFT(y_list):
     """
-    The optimalFT method accepts a list of coefficients and determines
-    if the size of the list is suitable for either a Fast Fourier
-    Transformation, or a less than optimal Discrete Fourier
-    Transformation, which is determined by the global variable,
-    __optimal_threshold.
+    The parallel_inverseFFT method is the inverse of parallelFFT().
+    """
+    import fourier_parallel
+    return fourier_parallel.parallel_inverseFFT(y_list)
 
-    Essentially, this method is just a wrapper for calling my
-    implementations of Fourier transformations depending on the input
-    size.
+def set_parallel(workers=None, min_size=None):
     """
-    list_length = len(a_list)
-    if list_length <= __optimal_threshold:
-        return performDFT(a_list)
-    else:
-        return optimal_recursiveFFT(a_list)
-
-def run_test(input_size):
-    """
-    The run_test method will generate random lists and perform tests
-    using the optimalFT method. Timing measurements are made and
-    results are printed between timings/tests.
-    """
-    global __optimal_threshold 
-    print "----Now running 5 tests"
-    # note: the xrange function in Python uses an inclusive lower
-    # bound and an exclusive upper bound.
-    for i in xrange(1,6):
-        print "----Now running test", i
-        current_list = gen_random_list(2**input_size)
-        for current_threshold in xrange(3,input_size if input_size < 12 else 11):
-            __optimal_threshold = 2**current_threshold
-            start_time = time.time()
-            optimalFT(current_list)
-            end_time = time.time()
-            total_time = end_time - start_time
-            print "Total_time,threshold_size,n:", \
-                repr(total_time)+ \
-                ","+str(current_threshold) + \
-                ","+str(i)
-            sys.stdout.flush()
-        current_list = None
-        gc.collect()
-   
-## variable for keeping track of times. For class definition please
-## see timeDict.py
-td = timeDict.TimeDict()
+    Sets the number of worker processes used by the 'parallel' engine
+    (None for one per CPU) and, if given, the smallest length that it
+    transforms in parallel.
+    """
+    import fourier_parallel
+    fourier_parallel.set_parallel(workers, min_size)
 
-def optimal_recursiveFFT(a_list):
+
+def multiply_polynomial_files(path1, path2, out_path, block_size=None,
+                              temp_dir=None):
     """
-    The recursiveFFT method is a direct implementation of the
-    RECURSIVE-FFT method defined in our class text, Intro to
-    Algorithms (Cormen and Lee). I used a couple helper methods as a
-    difference, however.
+    The multiply_polynomial_files method is the file-in, file-out
+    version of multiply_polynomials(), for polynomials too large to fit
+    in memory. Please see fourier_outofcore.py, which is only imported
+    when this method is first used.
+    """
+    import fourier_outofcore
+    return fourier_outofcore.multiply_polynomial_files(
+        path1, path2, out_path, block_size, temp_dir)
 
-    For example, the book has a sequence definition to split the
-    passed list into odd and even indices, while I use a method I
-    designed called unzip_list().
 
-    Also, in the book, they use a running value for omega and the
-    related roots of unity, so that they do not have to recalculate
-    the root of unity each time through the for loop. I instead
-    recalculate it, as the calculation only involves less than a dozen
-    lines of code.
+##########################################################
+###### NTT METHODS #######################################
+##########################################################
+
+## The primes used by the Number-Theoretic Transform, as 3-tuples of
+## (prime, generator, k), where the prime is c * 2^k + 1 and the
+## generator is a primitive root modulo the prime. A prime of that
+## form has an n-th root of unity for every power of 2 up to 2^k, so
+## the primes with the largest k come first.
+__ntt_primes = [
+    (2013265921, 31, 27),
+    (469762049, 3, 26),
+    (1811939329, 13, 26),
+    (167772161, 3, 25),
+    (2113929217, 5, 25),
+    (1711276033, 29, 25),
+    (754974721, 11, 24),
+    (1224736769, 3, 24),
+    (998244353, 3, 23),
+]
+
+def nttFT(a_list, prime=998244353, generator=3):
     """
-    n = len(a_list)
-    if n == 1:
-        return a_list
-    # if __DEBUG:
-    #     print "size of list:", n
-    (a_list0, a_list1) = unzip_list(a_list)
-    y_list0 = optimalFT(a_list0)
-    y_list1 = optimalFT(a_list1)
-    # if __DEBUG:
-    #     print "y_list0:", str(y_list0)
-    #     print "y_list1:", str(y_list1)
-    y = {}
-    # the following for loop's definition is slightly different from
-    # the book - I use n/2 instead of n/2 - 1. This is because
-    # Python's xrange() uses the upper bound on the list as an
-    # exclusive limit.
-    for k in xrange(n/2):
-        # if __DEBUG:
-        #     print "on loop iteration:", k
-        w_basen_powerk = getRoU(n, k) # omega_n ^k
-        # if __DEBUG:
-        #     print "omega base", n, "power", k, ":", w_basen_powerk
-        y[k] = sanitize_value(y_list0[k] + \
-                        (w_basen_powerk * y_list1[k]))
-        y[k+(n/2)] = sanitize_value(y_list0[k] - \
-                        (w_basen_powerk * y_list1[k]))
-    # if __DEBUG:
-    #     print "printing array y:", str(y)
-    
-    # the return variable uses list comprehension to create a list of
-    # values from a dict of keys mapped to values in python. The list
-    # comprehension translates roughly to: taking the second item from
-    # every item in the entire dict, if each element was converted to
-    # a 2-tuple consisting of (key, value), which is what .items() does.
-    return_me = [x[1] for x in y.items()]
-    return return_me
-
-def timed_recursiveFFT(a_list):
-    global td
-    time0 = time.time()
-    n = len(a_list)
-    if n == 1:
-        return a_list
-    # if __DEBUG:
-    #     print "size of list:", n
-    (a_list0, a_list1) = unzip_list(a_list)
-    time1 = time.time()
-    y_list0 = recursiveFFT(a_list0)
-    y_list1 = recursiveFFT(a_list1)
-    # if __DEBUG:
-    #     print "y_list0:", str(y_list0)
-    #     print "y_list1:", str(y_list1)
-    time2 = time.time()
-    y = {}
-    # the following for loop's definition is slightly different from
-    # the book - I use n/2 instead of n/2 - 1. This is because
-    # Python's xrange() uses the upper bound on the list as an
-    # exclusive limit.
-    for k in xrange(n/2):
-        # if __DEBUG:
-        #     print "on loop iteration:", k
-        w_basen_powerk = getRoU(n, k) # omega_n ^k
-        # if __DEBUG:
-        #     print "omega base", n, "power", k, ":", w_basen_powerk
-        y[k] = sanitize_value(y_list0[k] + \
-                        (w_basen_powerk * y_list1[k]))
-        y[k+(n/2)] = sanitize_value(y_list0[k] - \
-                        (w_basen_powerk * y_list1[k]))
-    # if __DEBUG:
-    #     print "printing array y:", str(y)
-    
-    # the return variable uses list comprehension to create a list of
-    # values from a dict of keys mapped to values in python. The list
-    # comprehension translates roughly to: taking the second item from
-    # every item in the entire dict, if each element was converted to
-    # a 2-tuple consisting of (key, value), which is what .items() does.
-    return_me = [x[1] for x in y.items()]
-    time3 = time.time()
-    td.add(time0, time1, time2, time3, n)
-    return return_me
-
-def get_time_dict():
-    global td
-    return td
+    The nttFT method is the Number-Theoretic Transform of a list of
+    integers, which is the same as the FFT except that all of the
+    arithmetic is done modulo a prime, and omega_n is an n-th root of
+    unity modulo the prime (generator^((prime-1)/n)) instead of a
+    complex number. Since there are no floating point numbers, the
+    results are exact.
 
-def recursive_inverseFFT(y_list):
+    The length of a_list must be a power of 2 that divides prime - 1.
     """
-    The recursive_inverseFFT method is just that - the inverse of the
-    recursiveFFT() method. The modifications from recursiveFFT() are
-    as follows:
+    a = [x % prime for x in a_list]
+    bit_reverse_permute(a)
+    __ntt_butterflies(a, prime, __ntt_root(len(a), prime, generator))
+    return a
 
-    - Swapped all instances of a and y
-    - Replaced omega_n with omega_n^-1
-    - Divided each element of the result by n
+def inverse_nttFT(y_list, prime=998244353, generator=3):
+    """
+    The inverse_nttFT method is the inverse of nttFT(), which uses
+    omega_n^-1 and multiplies each element of the result by the
+    inverse of n, modulo the prime.
     """
     n = len(y_list)
-    if n == 1:
-        return y_list[0]
-    (y_list0, y_list1) = unzip_list(y_list)
-    a_list0 = recursiveFFT(y_list0)
-    a_list1 = recursiveFFT(y_list1)
-    a = {}
-    # the following for loop's definition is slightly different from
-    # the book - I use n/2 instead of n/2 - 1. This is because
-    # Python's xrange() uses the upper bound on the list as an
-    # exclusive limit.
-    for k in xrange(n/2):
-        w_basen_powerk = getRoU(n, -k) # omega_n ^k
-        a[k] = sanitize_value((a_list0[k] + \
-                            (w_basen_powerk * a_list1[k])) / n)
-        a[k+(n/2)] = sanitize_value((a_list0[k] - \
-                            (w_basen_powerk * a_list1[k])) / n)
-    # the return statement uses list comprehension to create a list of
-    # values from a dict of keys mapped to values in python. The list
-    # comprehension translates roughly to: taking the second item from
-    # every item in the entire dict, if each element was converted to
-    # a 2-tuple consisting of (key, value), which is what .items() does.
-    return [x[1] for x in a.items()]
+    a = [y % prime for y in y_list]
+    bit_reverse_permute(a)
+    root = __ntt_root(n, prime, generator)
+    __ntt_butterflies(a, prime, pow(root, prime - 2, prime))
+    inverse_n = pow(n, prime - 2, prime)
+    return [x * inverse_n % prime for x in a]
+
+def ntt_multiply(polynom1, polynom2, length=None):
+    """
+    The ntt_multiply method multiplies two polynomials with integer
+    coefficients exactly, and returns the product's integer
+    coefficients.
 
+    The product is computed with the NTT modulo as many of the primes
+    in __ntt_primes as are needed for the product of the primes to be
+    more than twice the largest possible coefficient of the product.
+    The coefficients are then put back together from their values
+    modulo each prime with the Chinese Remainder Theorem, and the
+    coefficients above half of the product of the primes are the
+    negative ones.
 
-def multiply_polynomials(polynom1, polynom2):
+    All len(polynom1) + len(polynom2) - 1 coefficients are returned,
+    unless length is given, in which case the product is wrapped
+    around to length coefficients like the product of two lists of
+    that length from multiply_polynomials().
     """
-    The multiply_polynomials method accepts two polynomials as
-    parameters and multiplies them by using the FFT on each of them,
-    multiplying the resulting point values, and using the inverse FFT
-    on the resulting vector to retrieve the final product of both
-    polynomials.
+    polynom1 = __integer_list(polynom1)
+    polynom2 = __integer_list(polynom2)
+    product_length = __product_length(polynom1, polynom2)
+    if product_length < 1:
+        return [0] * (length or 0)
+    size = padded_size(product_length)
+    bound = max(abs(x) for x in polynom1) * \
+            max(abs(x) for x in polynom2) * \
+            min(len(polynom1), len(polynom2))
+    residues = []
+    modulus = 1
+    for (prime, generator, k) in __ntt_primes:
+        if residues and modulus > 2 * bound:
+            break
+        if size > 2**k:
+            raise ValueError("Product is too long for the NTT: " +
+                             str(product_length))
+        padded1 = polynom1 + [0] * (size - len(polynom1))
+        padded2 = polynom2 + [0] * (size - len(polynom2))
+        point_values = [x * y % prime for (x, y) in
+                        zip(nttFT(padded1, prime, generator),
+                            nttFT(padded2, prime, generator))]
+        residues.append((prime,
+                         inverse_nttFT(point_values, prime, generator)))
+        modulus *= prime
+    if modulus <= 2 * bound:
+        raise ValueError("Coefficients are too large for the NTT primes")
+    product = __crt_combine(residues, product_length)
+    half_modulus = modulus / 2
+    product = [x - modulus if x > half_modulus else x for x in product]
+    if length is None:
+        return product
+    wrapped = [0] * length
+    for (i, x) in enumerate(product):
+        wrapped[i % length] += x
+    return wrapped
 
-    Please note that the polynomials are provided in the form of a
-    list, with the elements of the list being the coefficients of each
-    factor, starting with the constant (a_0), all the way up to the
-    coefficient of the highest power factor (a_(n-1)).
+def __ntt_root(n, prime, generator):
+    """Returns the n-th root of unity modulo the prime."""
+    if (prime - 1) % n:
+        raise ValueError("No " + str(n) + "-th root of unity modulo " +
+                         str(prime))
+    return pow(generator, (prime - 1) / n, prime)
+
+def __ntt_butterflies(a, prime, root):
     """
-    if __DEMO_MODE:
-        print "Multiplying the following polynomials represented by lists of coefficients (recursive FFT method):"
-        print "Polynomial 1:", str(polynom1)
-        print "Polynomial 2:", str(polynom2)
-    fft_poly1 = recursiveFFT(polynom1)
-    fft_poly2 = recursiveFFT(polynom2)
-    product_vector = multiply_point_values(fft_poly1, fft_poly2)
-    resultant_vector = recursive_inverseFFT(product_vector)
-    ##print "in multiple polyunomials, returning:", str(resultant_vector)
-    return resultant_vector
+    Runs every level of butterflies over the bit-reversed list a, in
+    place and modulo the prime, as in __iterative_butterflies(), where
+    root is the n-th root of unity to use.
+    """
+    n = len(a)
+    roots = [1] * max(n / 2, 1)
+    for k in xrange(1, n / 2):
+        roots[k] = roots[k - 1] * root % prime
+    half = 1
+    while half < n:
+        block = 2 * half
+        stride = n / block
+        for k in xrange(half):
+            w = roots[k * stride]
+            for i in xrange(k, n, block):
+                j = i + half
+                t = w * a[j] % prime
+                u = a[i]
+                a[i] = (u + t) % prime
+                a[j] = (u - t) % prime
+        half = block
+
+def __crt_combine(residues, length):
+    """
+    Accepts a list of (prime, values) pairs and returns the first
+    length values modulo the product of the primes that have all of
+    the given values modulo each prime, using Garner's method: each
+    prime in turn corrects the value found for the primes before it.
+    """
+    (modulus, values) = residues[0]
+    combined = values[:length]
+    for (prime, values) in residues[1:]:
+        inverse = pow(modulus % prime, prime - 2, prime)
+        for i in xrange(length):
+            t = (values[i] - combined[i]) * inverse % prime
+            combined[i] += modulus * t
+        modulus *= prime
+    return combined
+
+def __integer_list(a_list):
+    """
+    Returns a_list as a list of Python integers, or raises a ValueError
+    if any of its values are not integers.
+    """
+    if is_array(a_list):
+        a_list = a_list.tolist()
+    integers = []
+    for value in a_list:
+        ## whole floats (say, from a CoefficientArray) are integers too
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, (int, long)):
+            raise ValueError("The NTT only multiplies polynomials with "
+                             "integer coefficients, not " + repr(value))
+        integers.append(value)
+    return integers
 
 
 ##########################################################
@@ -258,7 +2746,9 @@ def getRoU(base, power):
         ## both by power
         base = base / power
         power = 1 ## equals 1 because power/power=1
-    current_angle = math.radians((360/base) * power)
+    ## 360.0 rather than 360, since integer division would give an
+    ## angle of zero for any base over 360.
+    current_angle = math.radians((360.0/base) * power)
     ## in python, imaginary numbers are represented with a j after the
     ## digit, and are multiples of i plus a constant, so the imaginary
     ## number i must be represented as (0+1j), with parentheses and
@@ -267,6 +2757,111 @@ def getRoU(base, power):
             ((0+1j)*math.sin(current_angle))
     return value
 
+## The twiddle tables hold all n of the n-th roots of unity for the
+## transform sizes that have been used recently, so that they do not
+## have to be recalculated with cos and sin for every butterfly (or
+## for every term of a DFT). They are kept in least-recently-used
+## order, and the least recently used tables are dropped once the
+## tables take up more than the cache's limit (64 MB by default).
+__twiddle_cache = LRUCache(2**26, lambda table: __table_bytes(table))
+
+def get_twiddle_table(n):
+    """
+    The get_twiddle_table method returns a 2-tuple of (table, stride),
+    where table[k * stride] is omega_n^k for every k between 0 and n.
+
+    If a table for a size that n divides is already cached (the same
+    size, or a larger power of 2 when n is a power of 2), that table is
+    shared and the stride skips over the roots that are not needed,
+    otherwise a new table is built with compute_twiddles() and cached.
+    """
+    (size, table) = __twiddle_cache.lookup(n, lambda size: not size % n)
+    if table is not None:
+        return (table, size / n)
+    ## the table is built outside of the cache's lock, since it is the
+    ## slow part. Two threads may build the same table, which is
+    ## harmless.
+    table = compute_twiddles(n)
+    __twiddle_cache.put(n, table)
+    return (table, 1)
+
+def compute_twiddles(n):
+    """
+    The compute_twiddles method returns a list of all n of the n-th
+    roots of unity, where element k is omega_n^k.
+
+    When n is a multiple of 8, cos and sin are only evaluated for the
+    first eighth of the circle. The rest of the first quarter is the
+    same values with cos and sin swapped, and every later quarter is
+    the previous one multiplied by i, which only swaps and negates the
+    real and imaginary parts, so it is exact.
+    """
+    if n % 8:
+        return [1] + [getRoU(n, k) for k in xrange(1, n)]
+    quarter = n / 4
+    eighth = n / 8
+    step = 2 * math.pi / n
+    cosines = [math.cos(step * k) for k in xrange(eighth + 1)]
+    sines = [math.sin(step * k) for k in xrange(eighth + 1)]
+    first_quarter = [complex(cosines[k], sines[k]) for k in xrange(eighth)]
+    for k in xrange(eighth, quarter):
+        first_quarter.append(complex(sines[quarter - k],
+                                     cosines[quarter - k]))
+    second_quarter = [complex(-w.imag, w.real) for w in first_quarter]
+    table = first_quarter + second_quarter
+    table.extend([-w for w in table])
+    table[0] = 1
+    return table
+
+def __table_bytes(table):
+    """An estimate of the memory used by a twiddle table, in bytes."""
+    return sys.getsizeof(table) + len(table) * sys.getsizeof(0j)
+
+def set_twiddle_cache_limit(limit_bytes):
+    """
+    Sets the most memory, in bytes, that the cached twiddle tables may
+    use. The most recently used table is always kept, even if it is
+    larger than the limit by itself.
+    """
+    __twiddle_cache.set_limit(limit_bytes)
+
+def clear_twiddle_cache():
+    """Drops every cached twiddle table."""
+    __twiddle_cache.clear()
+
+def twiddle_cache_info():
+    """
+    Returns a dict describing the twiddle cache: the cached sizes (from
+    least to most recently used), the bytes they use, the byte limit,
+    and the number of cache hits and misses so far.
+    """
+    info = __twiddle_cache.info()
+    del info['count']
+    info['sizes'] = __twiddle_cache.keys()
+    return info
+
+
+def __unwrap(a_list, engine=None):
+    """
+    Returns the values of a CoefficientArray as a list, or, for the
+    'numpy' engine, as a NumPy array that shares its storage. Anything
+    else is returned as it is.
+    """
+    if not isinstance(a_list, CoefficientArray):
+        return a_list
+    if __array_engine(None, engine) == 'numpy':
+        return a_list.as_numpy()
+    return a_list.tolist()
+
+def __wrap(values):
+    """
+    Returns a new CoefficientArray of values (a list or a NumPy
+    array).
+    """
+    if is_array(values):
+        return CoefficientArray.frombytes(
+            numpy.ascontiguousarray(values, dtype=numpy.complex128).tostring())
+    return CoefficientArray(values)
 
 def unzip_list(list_of_coefficients):
     """
@@ -274,15 +2869,106 @@ def unzip_list(list_of_coefficients):
     this list into two lists, one list with the even indices from the
     passed list, and the other with the odd indices.
 
-    I was helped by the following web site in writing the code for
-    splitting the list into even/odd indices using map:
-    http://desk.stinkpot.org:8080/tricks/index.php/2007/10/extract-odd-or-even-elements-from-a-python-list/
+    Using map() and filter() over a list of indices instead builds
+    four lists and calls a lambda for every index. Slicing with a step
+    of 2 does the same thing in one pass each, and for a
+    CoefficientArray the halves are views of the same storage, so
+    nothing is copied at all.
+    """
+    if isinstance(list_of_coefficients, CoefficientArray):
+        return (list_of_coefficients.even(), list_of_coefficients.odd())
+    return (list_of_coefficients[0::2], list_of_coefficients[1::2])
+
+def __is_power_of_2(n):
+    """Returns True if n is a power of 2."""
+    return n > 0 and not n & (n - 1)
+
+def padded_size(length):
+    """
+    Returns the smallest power of 2 that is at least length (and at
+    least 1).
+    """
+    size = 1
+    while size < length:
+        size *= 2
+    return size
+
+## the relative cost of one level of radix 3 and radix 5 butterflies,
+## per element, against one level of radix 2 butterflies, which
+## smooth_size() uses to compare transform lengths. These were timed
+## with mixed_radixFFT() on lengths of 2^k, 3^2 * 2^k and 5^2 * 2^k.
+__radix_costs = {2: 1.0, 3: 2.0, 5: 7.0}
+
+def smooth_size(length):
+    """
+    Returns the even length, at least length, made only of factors of
+    2, 3 and 5 that should be the fastest to transform with the mixed
+    radix engine. The next power of 2 can be almost twice as long as
+    length, while there is always a length made of those factors much
+    closer to it, but radix 3 and 5 levels cost more per element, so
+    each candidate is weighed by __radix_costs.
+    """
+    limit = padded_size(length)
+    best = (limit * (limit.bit_length() - 1), limit)
+    power5 = 1
+    while power5 <= limit:
+        power35 = power5
+        while power35 <= limit:
+            candidate = power35 * 2
+            while candidate < length:
+                candidate *= 2
+            if candidate <= limit:
+                cost = candidate * __smooth_cost(candidate)
+                best = min(best, (cost, candidate))
+            power35 *= 3
+        power5 *= 5
+    return best[1]
+
+def __smooth_cost(n):
+    """The cost per element of all of the levels for a length n."""
+    cost = 0
+    for radix in (2, 3, 5):
+        while not n % radix:
+            cost += __radix_costs[radix]
+            n /= radix
+    return cost
+
+def pad_list(a_list, size):
+    """
+    Returns a copy of a_list (a list or a NumPy array) with zeroes
+    added to the end, so that it has size elements. All of the zeroes
+    are added at once.
+    """
+    if is_array(a_list):
+        padded = numpy.zeros(a_list.shape[:-1] + (size,), dtype=a_list.dtype)
+        padded[..., :a_list.shape[-1]] = a_list
+        return padded
+    return list(a_list) + [0] * (size - len(a_list))
+
+def bit_reverse_permute(a_list):
     """
-    even_indices = map(lambda i: list_of_coefficients[i], 
-              filter(lambda i: i%2 == 0, range(len(list_of_coefficients))))
-    odd_indices = map(lambda i: list_of_coefficients[i], 
-              filter(lambda i: i%2 == 1, range(len(list_of_coefficients))))
-    return (even_indices, odd_indices)
+    The bit_reverse_permute method accepts a list whose length is a
+    power of 2 and reorders it in place, so that the element at index
+    i is swapped with the element at the index whose binary digits are
+    the reverse of i's. This is the BIT-REVERSE-COPY step from our
+    class text, done without a second list.
+    """
+    n = len(a_list)
+    if n & (n - 1):
+        raise ValueError("List provided is not a power of 2 in length: " +
+                         str(n))
+    ## build the reversed indices one bit at a time: reversing the
+    ## indices of a list twice as long puts a 0 or a 1 in front of the
+    ## reversed indices of the shorter list.
+    reversed_indices = [0]
+    while len(reversed_indices) < n:
+        reversed_indices = [2*r for r in reversed_indices] + \
+                           [2*r + 1 for r in reversed_indices]
+    for i in xrange(n):
+        r = reversed_indices[i]
+        if i < r:
+            a_list[i], a_list[r] = a_list[r], a_list[i]
+    return a_list
 
 def sanitize_value(value):
     """
@@ -333,38 +3019,52 @@ def multiply_point_values(list1, list2):
 
     I am assuming that the input to multiplying polynomials will be
     lists of equal size, but I included a method to pad out the lists
-    in case lists of unequal sizes are provided.
+    in case lists of unequal sizes are provided. It only prints that it
+    did so in debug mode.
+
+    If either list is a NumPy array, the products are computed as one
+    array operation and an array is returned.
     """
+    if is_array(list1) or is_array(list2):
+        return __numpy_multiply_point_values(list1, list2)
     list1len = len(list1)
     list2len = len(list2)
     if list1len != list2len:
-        print "Lists are of unequal length. Buffering smaller list with zeroes."
+        if __DEBUG:
+            print "Lists are of unequal length. Buffering smaller list with zeroes."
         zeroes_to_add = max(list1len, list2len) - min(list1len, list2len)
+        ## the zeroes are added at the front of the list all at once,
+        ## since inserting them one at a time moves the whole list
+        ## every time
         if min(list1len, list2len) == list1len:
-            for i in xrange(zeroes_to_add):
-                list1.insert(0,0) ##insert a zero at the front of the
-                                  ##list
-        else:
-            for i in xrange(zeroes_to_add):
-                list2.insert(0,0)
-        if len(list1) == len(list2):
-            print "sucessfully padded list"
+            list1 = [0] * zeroes_to_add + list(list1)
         else:
-            print "failed to pad list"
+            list2 = [0] * zeroes_to_add + list(list2)
+        if __DEBUG:
+            if len(list1) == len(list2):
+                print "sucessfully padded list"
+            else:
+                print "failed to pad list"
     resultant_list = []
     for i in xrange(len(list1)): ## which is also len(list2)
         resultant_list.append(list1[i] * list2[i])
     return resultant_list
 
-def gen_random_list(list_size):
+def gen_random_list(list_size, seed=None):
     """
     The gen_random_list method will create a list of random numbers of
     length of the size passed as an argument. The numbers within the
-    list will be between [-20, 20].
+    list will be between [-20, 20]. If a seed is given, the same seed
+    always gives the same list.
     """
+    import random
+    if seed is None:
+        generator = random
+    else:
+        generator = random.Random(seed)
     random_list = []
     for i in xrange(list_size):
-        random_list.append(random.randint(-20, 20))
+        random_list.append(generator.randint(-20, 20))
     return random_list
 
 
@@ -375,8 +3075,13 @@ def gen_random_list(list_size):
 def performDFT(list_of_coefficients):
     """
     The performDFT method accepts a list of coefficients and computes
-    a list of point values to return.
+    a list of point values to return. If it is given a NumPy array,
+    numpy_DFT() is used instead, and an array is returned.
     """
+    if isinstance(list_of_coefficients, CoefficientArray):
+        return __wrap(performDFT(list_of_coefficients.tolist()))
+    if is_array(list_of_coefficients):
+        return numpy_DFT(list_of_coefficients)
     y_point_values = []
     for i in xrange(len(list_of_coefficients)):
         y_point_values.append(gety(i, list_of_coefficients))
@@ -387,8 +3092,13 @@ def perform_inverse_dft(list_of_ys):
     """
     The perform_inverse_dft method accepts a list of point values and
     returns a list of computed coefficients that relate to the point
-    values.
+    values. If it is given a NumPy array, numpy_inverse_DFT() is used
+    instead, and an array is returned.
     """
+    if isinstance(list_of_ys, CoefficientArray):
+        return __wrap(perform_inverse_dft(list_of_ys.tolist()))
+    if is_array(list_of_ys):
+        return numpy_inverse_DFT(list_of_ys)
     coefficients = []
     for i in xrange(len(list_of_ys)):
         coefficients.append(geta(i, list_of_ys))
@@ -403,14 +3113,13 @@ def gety(y_base, list_of_coefficients):
     provided with this assignment, y_base is equivalent to k.
     """
     unity_root = len(list_of_coefficients)
-    pwr = math.log(unity_root, 2)
-    if 2**pwr != unity_root:
-        print "List provided is not a power of 2 in length,", \
-            "output may be incorrect."
+    (twiddles, stride) = get_twiddle_table(unity_root)
+    table_size = len(twiddles)
     y = 0
     ## xrange will iterate over all integers 0 to unity_root
     for j in xrange(unity_root): 
-        y += list_of_coefficients[j] * getRoU(unity_root, (y_base*j))
+        y += list_of_coefficients[j] * \
+             twiddles[y_base * j * stride % table_size]
     return sanitize_value(y)
     
 def geta(a_base, list_of_ys):
@@ -421,30 +3130,296 @@ def geta(a_base, list_of_ys):
     equivalent to k.
     """
     unity_root = len(list_of_ys)
-    pwr = math.log(unity_root, 2)
-    if 2**pwr != unity_root:
-        print "List provided is not a power of 2 in length,", \
-            "output may be incorrect."
+    (twiddles, stride) = get_twiddle_table(unity_root)
+    table_size = len(twiddles)
     a = 0
     ## xrange will iterate over all integers 0 to unity_root
     for j in xrange(unity_root): 
-        a += list_of_ys[j] * getRoU(unity_root, (-1*a_base*j))
+        a += list_of_ys[j] * \
+             twiddles[-1 * a_base * j * stride % table_size]
     ##print "in geta, returning:", str(a/unity_root)
     return sanitize_value(a/unity_root)
 
 def multiply_polynomialsDFT(polynom1, polynom2):
     """
     This method is the same as multiply_polynomials above, but uses
-    the dft method of solving the problem.
+    the dft method of solving the problem. The DFT works for any
+    length, so both polynomials are only padded to the length of the
+    product.
     """
+    if isinstance(polynom1, CoefficientArray) or \
+       isinstance(polynom2, CoefficientArray):
+        return __wrap(multiply_polynomialsDFT(__unwrap(polynom1),
+                                              __unwrap(polynom2)))
     if __DEMO_MODE:
         print "Multiplying the following polynomials represented by lists of coefficients (DFT method):"
         print "Polynomial 1:", str(polynom1)
         print "Polynomial 2:", str(polynom2)
-    dft_poly1 = performDFT(polynom1)
-    dft_poly2 = performDFT(polynom2)
+    product_length = __product_length(polynom1, polynom2)
+    if product_length < 1:
+        return []
+    dft_poly1 = performDFT(pad_list(polynom1, product_length))
+    dft_poly2 = performDFT(pad_list(polynom2, product_length))
     product_vector = multiply_point_values(dft_poly1, dft_poly2)
     resultant_vector = perform_inverse_dft(product_vector)
     ##print "in multiple polyunomials, returning:", str(resultant_vector)
     return resultant_vector
 
+
+##########################################################
+###### NUMPY METHODS #####################################
+##########################################################
+
+## NumPy copies of the twiddle tables and the DFT (Vandermonde)
+## matrices, keyed by (kind, n). They are kept in least-recently-used
+## order like the twiddle tables, in a cache of their own.
+__numpy_cache = LRUCache(2**26, lambda cached: cached.nbytes)
+
+def is_array(a_list):
+    """
+    Returns True if a_list is a NumPy array (and NumPy is installed).
+    Nothing can be an array unless something has imported NumPy, so
+    this never imports it, and only registers the 'numpy' engine (which
+    the callers then use) if a_list is an array.
+    """
+    module = sys.modules.get('numpy')
+    if module is None or not isinstance(a_list, module.ndarray):
+        return False
+    return __load_numpy()
+
+def numpyFFT(a_array):
+    """
+    The numpyFFT method computes the same values as iterativeFFT(), but
+    on a complex128 NumPy array. After the bit-reversal permutation,
+    each level of butterflies is done as a few whole-array operations,
+    by viewing the array as rows of blocks and combining the first
+    and second half of every block at once.
+
+    If a_array has more than one dimension, every row (along the last
+    axis) is transformed. A new array is always returned. Lengths that
+    are not a power of 2 use Bluestein's FFT (see bluesteinFFT()), with
+    power of 2 FFTs done in the same way.
+    """
+    if __is_power_of_2(numpy.shape(a_array)[-1]):
+        return __numpy_butterflies(a_array, 1)
+    return __numpy_bluestein(a_array, 1)
+
+def numpy_inverseFFT(y_array):
+    """
+    The numpy_inverseFFT method is the inverse of numpyFFT().
+    """
+    n = numpy.shape(y_array)[-1]
+    if __is_power_of_2(n):
+        return __sanitize_array(__numpy_butterflies(y_array, -1) / n)
+    return __sanitize_array(__numpy_bluestein(y_array, -1) / n)
+
+def numpy_DFT(a_array):
+    """
+    The numpy_DFT method computes the same values as performDFT(), but
+    as one matrix-vector product against the cached n x n matrix of
+    roots of unity (whose element (j, k) is omega_n^jk).
+    """
+    a = numpy.asarray(a_array, dtype=numpy.complex128)
+    return __sanitize_array(numpy.dot(a, __numpy_dft_matrix(a.shape[-1])))
+
+def numpy_inverse_DFT(y_array):
+    """
+    The numpy_inverse_DFT method is the inverse of numpy_DFT(), which
+    uses the complex conjugate of the matrix (omega_n^-jk) and divides
+    by n.
+    """
+    y = numpy.asarray(y_array, dtype=numpy.complex128)
+    n = y.shape[-1]
+    return __sanitize_array(
+        numpy.dot(y, __numpy_dft_matrix(n).conj()) / n)
+
+def __numpy_butterflies(a_array, direction):
+    """
+    Runs every level of butterflies over the last axis of a_array, as
+    in __iterative_butterflies(), and returns the result.
+    """
+    a = numpy.array(a_array, dtype=numpy.complex128)
+    n = a.shape[-1]
+    if n & (n - 1):
+        raise ValueError("List provided is not a power of 2 in length: " +
+                         str(n))
+    if n < 2:
+        return a
+    a = a[..., __numpy_bit_reversed_indices(n)]
+    twiddles = __numpy_twiddles(n)
+    if direction < 0:
+        twiddles = twiddles.conj()
+    rows = a.shape[:-1]
+    half = 1
+    while half < n:
+        block = 2 * half
+        blocks = a.reshape(rows + (n / block, block))
+        top = blocks[..., :half]
+        bottom = blocks[..., half:]
+        t = bottom * twiddles[:n/2:n/block]
+        numpy.subtract(top, t, out=bottom)
+        top += t
+        half = block
+    return a
+
+def __numpy_bluestein(a_array, direction):
+    """
+    The NumPy version of __bluestein(), for every row of a_array.
+    """
+    a = numpy.asarray(a_array, dtype=numpy.complex128)
+    n = a.shape[-1]
+    if n < 2:
+        return a.copy()
+    j = numpy.arange(n)
+    chirps = __numpy_twiddles(2 * n)[j * j % (2 * n)]
+    if direction < 0:
+        chirps = chirps.conj()
+    m = padded_size(2*n - 1)
+    weighted = numpy.zeros(a.shape[:-1] + (m,), dtype=numpy.complex128)
+    weighted[..., :n] = a * chirps
+    conjugates = numpy.zeros(m, dtype=numpy.complex128)
+    conjugates[:n] = chirps.conj()
+    conjugates[m - n + 1:] = chirps[:0:-1].conj()
+    convolution = __numpy_butterflies(
+        __numpy_butterflies(weighted, 1) * __numpy_butterflies(conjugates, 1),
+        -1)
+    return chirps * convolution[..., :n] / m
+
+def __numpy_realFFT(a_array):
+    """
+    The NumPy version of realFFT(), for every row of a_array.
+    """
+    a = numpy.asarray(a_array, dtype=numpy.float64)
+    n = a.shape[-1]
+    if n < 2:
+        return optimalFT(a, 'numpy')
+    half = n / 2
+    packed_spectrum = optimalFT(a[..., 0::2] + 1j * a[..., 1::2], 'numpy')
+    k = numpy.arange(half + 1)
+    z = packed_spectrum[..., k % half]
+    z_conjugate = packed_spectrum[..., (half - k) % half].conj()
+    even = (z + z_conjugate) * 0.5
+    odd = (z - z_conjugate) * -0.5j
+    return even + __numpy_twiddles(n)[k] * odd
+
+def __numpy_inverse_realFFT(spectrum):
+    """
+    The NumPy version of inverse_realFFT(), for every row of spectrum.
+    """
+    y = numpy.asarray(spectrum, dtype=numpy.complex128)
+    half = y.shape[-1] - 1
+    if half < 1:
+        return optimal_inverseFT(y, 'numpy').real
+    n = 2 * half
+    k = numpy.arange(half)
+    y_conjugate = y[..., half - k].conj()
+    even = (y[..., :half] + y_conjugate) * 0.5
+    odd = (y[..., :half] - y_conjugate) * 0.5 * __numpy_twiddles(n)[-k % n]
+    packed = optimal_inverseFT(even + 1j * odd, 'numpy')
+    a = numpy.empty(y.shape[:-1] + (n,), dtype=numpy.float64)
+    a[..., 0::2] = packed.real
+    a[..., 1::2] = packed.imag
+    return a
+
+def __numpy_real_multiply(polynom1, polynom2):
+    """
+    The NumPy version of real_multiply(), for every pair of rows of
+    polynom1 and polynom2.
+    """
+    packed = numpy.asarray(polynom1, dtype=numpy.float64) + \
+             1j * numpy.asarray(polynom2, dtype=numpy.float64)
+    n = packed.shape[-1]
+    packed_spectrum = optimalFT(packed, 'numpy')
+    k = numpy.arange(n / 2 + 1)
+    z = packed_spectrum[..., k]
+    z_conjugate = packed_spectrum[..., -k % n].conj()
+    return __numpy_inverse_realFFT((z*z - z_conjugate*z_conjugate) * -0.25j)
+
+def __numpy_multiply_point_values(list1, list2):
+    """
+    The NumPy version of multiply_point_values(), which pads the
+    shorter array at the front with zeroes in the same way.
+    """
+    array1 = numpy.asarray(list1)
+    array2 = numpy.asarray(list2)
+    length_difference = array1.shape[-1] - array2.shape[-1]
+    if length_difference > 0:
+        array2 = numpy.concatenate(
+            (numpy.zeros(length_difference, array2.dtype), array2))
+    elif length_difference < 0:
+        array1 = numpy.concatenate(
+            (numpy.zeros(-length_difference, array1.dtype), array1))
+    return array1 * array2
+
+def __sanitize_array(a_array):
+    """
+    The array version of sanitize_value(), which rounds off the real
+    and imaginary parts that are within 1e-12 of an integer.
+    """
+    real = a_array.real
+    imag = a_array.imag
+    rounded_real = numpy.round(real)
+    rounded_imag = numpy.round(imag)
+    real = numpy.where(numpy.abs(real - rounded_real) < 1e-12,
+                       rounded_real, real)
+    imag = numpy.where(numpy.abs(imag - rounded_imag) < 1e-12,
+                       rounded_imag, imag)
+    return real + 1j * imag
+
+def __numpy_twiddles(n):
+    """
+    Returns the twiddle table for n (see get_twiddle_table()) as a
+    complex128 array.
+    """
+    def build():
+        (table, stride) = get_twiddle_table(n)
+        return numpy.array(table[::stride], dtype=numpy.complex128)
+    return __numpy_cached('twiddles', n, build)
+
+def __numpy_dft_matrix(n):
+    """
+    Returns the n x n array whose element (j, k) is omega_n^jk.
+    """
+    def build():
+        indices = numpy.arange(n)
+        return __numpy_twiddles(n)[numpy.outer(indices, indices) % n]
+    return __numpy_cached('dft', n, build)
+
+def __numpy_bit_reversed_indices(n):
+    """
+    Returns an array of the indices 0 to n, in bit-reversed order.
+    """
+    def build():
+        indices = numpy.arange(n)
+        bit_reverse_permute(indices)
+        return indices
+    return __numpy_cached('bit_reverse', n, build)
+
+def __numpy_cached(kind, n, build):
+    """
+    Returns the cached array for (kind, n), calling build() to make it
+    if it is not cached.
+    """
+    key = (kind, n)
+    cached = __numpy_cache.get(key)
+    if cached is None:
+        cached = build()
+        __numpy_cache.put(key, cached)
+    return cached
+
+
+##########################################################
+###### ENGINES ###########################################
+##########################################################
+
+## maps the name of each FFT engine to its (forward, inverse) methods.
+## Please see get_engine() for how an engine is selected.
+__engines = {
+    'recursive': (optimal_recursiveFFT, recursive_inverseFFT),
+    'iterative': (iterativeFFT, iterative_inverseFFT),
+}
+__engines['mixed_radix'] = (mixed_radixFFT, mixed_radix_inverseFFT)
+__engines['bluestein'] = (bluesteinFFT, bluestein_inverseFFT)
+__engines['parallel'] = (parallelFFT, parallel_inverseFFT)
+## the 'numpy' engine is registered by __load_numpy(), the first time
+## NumPy is needed
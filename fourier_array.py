@@ -0,0 +1,215 @@
+"""
+A module with a compact container for the coefficients (or point
+values) of a polynomial, which every transform and multiplication in
+fourier.py accepts in place of a list.
+
+A Python list of complex numbers takes a pointer and a 32 byte complex
+object for every coefficient. A CoefficientArray keeps them in one
+array('d') instead, with the real and imaginary parts of each value
+next to each other, so each one only takes 16 bytes, and the whole
+array can be written to and read from raw bytes (or a file) in one
+step, without converting each value.
+
+Slicing a CoefficientArray does not copy anything: the slice is a view
+of the same storage, with its own offset and stride, so the even and
+odd halves of a polynomial (see even() and odd()) are just two views.
+
+"""
+
+from array import array
+
+class CoefficientArray(object):
+    """
+    A sequence of complex numbers, stored as interleaved real and
+    imaginary parts in an array('d'). Element i is at storage index
+    2 * (offset + i * stride).
+    """
+    def __init__(self, values=()):
+        if isinstance(values, CoefficientArray):
+            values = values.tolist()
+        elif not isinstance(values, (list, tuple, array)):
+            values = list(values) ## it may only be iterable once
+        try:
+            ## real values are copied into the real parts all at once
+            real = array('d', values)
+            self.storage = array('d', [0.0]) * (2 * len(real))
+            self.storage[0::2] = real
+        except TypeError:
+            parts = []
+            for value in values:
+                value = complex(value)
+                parts.append(value.real)
+                parts.append(value.imag)
+            self.storage = array('d', parts)
+        self.offset = 0
+        self.stride = 1
+        self.length = len(self.storage) / 2
+
+    @classmethod
+    def view(cls, storage, offset, stride, length):
+        """
+        Returns a CoefficientArray that shares storage (an array('d') of
+        interleaved parts) with anything else using it.
+        """
+        result = cls.__new__(cls)
+        result.storage = storage
+        result.offset = offset
+        result.stride = stride
+        result.length = length
+        return result
+
+    @classmethod
+    def zeros(cls, length):
+        """Returns a new CoefficientArray of length zeroes."""
+        return cls.view(array('d', [0.0]) * (2 * length), 0, 1, length)
+
+    @classmethod
+    def frombytes(cls, data):
+        """
+        Returns a new CoefficientArray of the interleaved complex values
+        (8 byte real part, 8 byte imaginary part, in the machine's byte
+        order) in the string data.
+        """
+        storage = array('d')
+        storage.fromstring(data)
+        return cls.view(storage, 0, 1, len(storage) / 2)
+
+    @classmethod
+    def from_real_bytes(cls, data):
+        """
+        Returns a new CoefficientArray of the real values (8 bytes each)
+        in the string data, with imaginary parts of 0, as written by
+        array('d').tostring() or fourier_outofcore.py.
+        """
+        real = array('d')
+        real.fromstring(data)
+        result = cls.zeros(len(real))
+        result.storage[0::2] = real
+        return result
+
+    @classmethod
+    def load(cls, path):
+        """Returns a new CoefficientArray read from a file of save()."""
+        with open(path, 'rb') as in_file:
+            return cls.frombytes(in_file.read())
+
+    def save(self, path):
+        """Writes the values to a file, as tobytes() would return them."""
+        with open(path, 'wb') as out_file:
+            self.compact().storage.tofile(out_file)
+
+    def tobytes(self):
+        """Returns the interleaved values as a string of raw bytes."""
+        return self.compact().storage.tostring()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            (start, stop, step) = index.indices(self.length)
+            return CoefficientArray.view(self.storage,
+                                         self.offset + start * self.stride,
+                                         self.stride * step,
+                                         len(xrange(start, stop, step)))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("CoefficientArray index out of range")
+        i = 2 * (self.offset + index * self.stride)
+        return complex(self.storage[i], self.storage[i + 1])
+
+    def __setitem__(self, index, value):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("CoefficientArray index out of range")
+        value = complex(value)
+        i = 2 * (self.offset + index * self.stride)
+        self.storage[i] = value.real
+        self.storage[i + 1] = value.imag
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __repr__(self):
+        return "CoefficientArray(" + repr(self.tolist()) + ")"
+
+    def even(self):
+        """Returns a view of the values at the even indices."""
+        return self[0::2]
+
+    def odd(self):
+        """Returns a view of the values at the odd indices."""
+        return self[1::2]
+
+    def real_parts(self):
+        """Returns an array('d') of the real parts of the values."""
+        return self.__parts(0)
+
+    def imag_parts(self):
+        """Returns an array('d') of the imaginary parts of the values."""
+        return self.__parts(1)
+
+    def __parts(self, part):
+        if not self.length:
+            return array('d')
+        start = 2 * self.offset + part
+        return self.storage[start:self.__stop(start, 2):2 * self.stride]
+
+    def __stop(self, start, scale):
+        """
+        Returns the stop of a slice, with a step of scale * stride, that
+        ends just past the last value from start. A view with a
+        negative stride that ends at index 0 needs a stop of None.
+        """
+        last = start + scale * (self.length - 1) * self.stride
+        if self.stride > 0:
+            return last + 1
+        if last > 0:
+            return last - 1
+        return None
+
+    def is_real(self):
+        """Returns True if none of the values have an imaginary part."""
+        return not any(self.imag_parts())
+
+    def tolist(self):
+        """
+        Returns the values as a list: of floats if they are all real,
+        and otherwise of complex numbers.
+        """
+        real = self.real_parts()
+        imag = self.imag_parts()
+        if not any(imag):
+            return real.tolist()
+        return [complex(x, y) for (x, y) in zip(real, imag)]
+
+    def compact(self):
+        """
+        Returns a CoefficientArray with its own contiguous storage, or
+        this one if its storage already is exactly its values.
+        """
+        if self.offset == 0 and self.stride == 1 and \
+           len(self.storage) == 2 * self.length:
+            return self
+        result = CoefficientArray.zeros(self.length)
+        result.storage[0::2] = self.real_parts()
+        result.storage[1::2] = self.imag_parts()
+        return result
+
+    def as_numpy(self):
+        """
+        Returns a complex128 NumPy array that shares this array's
+        storage (changing one changes the other).
+        """
+        import numpy
+        values = numpy.frombuffer(self.storage, dtype=numpy.complex128)
+        if not self.length:
+            return values[:0]
+        return values[self.offset:self.__stop(self.offset, 1):self.stride]
+
+    @property
+    def nbytes(self):
+        """The bytes taken by the values (not the whole storage)."""
+        return 16 * self.length
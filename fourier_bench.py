@@ -0,0 +1,231 @@
+"""
+A benchmark suite for the transforms and polynomial multiplication in
+fourier.py, to see whether a change actually made them faster.
+
+Every benchmark is run on seeded random inputs (see
+fourier.gen_random_list()), so two runs time exactly the same work.
+Each one is run a few times untimed to warm up the caches (and the
+twiddle tables), then timed repeatedly with the garbage collector
+turned off, and summarized by the median and interquartile range of
+its times, which are much less sensitive to a busy machine than the
+mean.
+
+The results are saved as JSON, and a saved result file can be given
+as a baseline, in which case every benchmark whose median got slower
+by more than the tolerance (and by more than the baseline's spread)
+is reported as a regression.
+
+Usage: python fourier_bench.py --max-power 14 --output new.json
+                               --baseline old.json
+"""
+
+import argparse, gc, json, platform, socket, sys, timeit
+import fourier
+
+## the multiplication paths that can be benchmarked, as (name, method)
+## pairs. Each method takes the two polynomials.
+MULTIPLY_PATHS = (
+    ('multiply', lambda p1, p2: fourier.multiply_polynomials(p1, p2)),
+    ('multiply_fft', lambda p1, p2: fourier.fft_multiply(p1, p2)),
+    ('multiply_complex', lambda p1, p2:
+        fourier.fft_multiply(p1, p2, real=False)),
+    ('multiply_schoolbook', lambda p1, p2:
+        fourier.schoolbook_multiply(p1, p2)),
+    ('multiply_karatsuba', lambda p1, p2:
+        fourier.karatsuba_multiply(p1, p2)),
+    ('multiply_ntt', lambda p1, p2:
+        fourier.multiply_polynomials(p1, p2, 'ntt')),
+    ('multiply_dft', lambda p1, p2:
+        fourier.multiply_polynomialsDFT(p1, p2)),
+)
+
+## the DFT is quadratic, so it is only benchmarked up to this power of 2
+__max_dft_power = 10
+
+def time_runs(method, args, repeats=7, warmup=2):
+    """
+    Runs method(*args) warmup times untimed and then repeats times
+    timed, with the garbage collector off (after a collection, so that
+    garbage from earlier benchmarks is not collected during this one),
+    and returns the list of times in seconds.
+    """
+    for i in xrange(warmup):
+        method(*args)
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        for i in xrange(repeats):
+            start_time = timeit.default_timer()
+            method(*args)
+            times.append(timeit.default_timer() - start_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return times
+
+def summarize(times):
+    """
+    Returns a dict of the median, the interquartile range (iqr), the
+    min and the max of a list of times.
+    """
+    ordered = sorted(times)
+    return {'median': __quantile(ordered, 0.5),
+            'iqr': __quantile(ordered, 0.75) - __quantile(ordered, 0.25),
+            'min': ordered[0], 'max': ordered[-1]}
+
+def __quantile(ordered, q):
+    """
+    Returns the q quantile of a sorted list, interpolating between the
+    two nearest values.
+    """
+    position = q * (len(ordered) - 1)
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def benchmarks(min_power, max_power, engines=None, multiply_paths=None):
+    """
+    Returns the list of (name, n, method, make_args) benchmarks to run:
+    the forward and inverse transform of every engine (every registered
+    engine, if engines is None) and every multiplication path (every one
+    in MULTIPLY_PATHS, if multiply_paths is None) at each size 2^k for k
+    from min_power to max_power. make_args(seed) builds the inputs.
+    """
+    if engines is None:
+        engines = fourier.engine_names()
+    paths = [(name, method) for (name, method) in MULTIPLY_PATHS
+             if multiply_paths is None or name in multiply_paths]
+    result = []
+    for k in xrange(min_power, max_power + 1):
+        n = 2**k
+        one_list = lambda seed, n=n: (fourier.gen_random_list(n, seed),)
+        two_lists = lambda seed, n=n: (fourier.gen_random_list(n, seed),
+                                       fourier.gen_random_list(n, seed + 1))
+        for engine in engines:
+            result.append(('fft_' + engine, n,
+                           lambda a, engine=engine:
+                               fourier.optimalFT(a, engine), one_list))
+            result.append(('inverse_fft_' + engine, n,
+                           lambda y, engine=engine:
+                               fourier.optimal_inverseFT(y, engine),
+                           one_list))
+        for (name, method) in paths:
+            if name == 'multiply_dft' and k > __max_dft_power:
+                continue
+            result.append((name, n, method, two_lists))
+    return result
+
+def run(min_power=4, max_power=12, engines=None, multiply_paths=None,
+        repeats=7, warmup=2, seed=0, verbose=True):
+    """
+    Runs the benchmarks (see benchmarks()) and returns the results, as
+    a dict with the machine, the settings and a list of one summary
+    (see summarize()) per benchmark, which also has its name, n and
+    times.
+    """
+    settings = {'min_power': min_power, 'max_power': max_power,
+                'repeats': repeats, 'warmup': warmup, 'seed': seed}
+    results = []
+    for (name, n, method, make_args) in benchmarks(min_power, max_power,
+                                                   engines, multiply_paths):
+        times = time_runs(method, make_args(seed), repeats, warmup)
+        summary = summarize(times)
+        summary.update({'name': name, 'n': n, 'times': times})
+        results.append(summary)
+        if verbose:
+            print "%-28s n=%-8d median %.6fs  iqr %.6fs" % \
+                (name, n, summary['median'], summary['iqr'])
+            sys.stdout.flush()
+    return {'machine': machine_info(), 'settings': settings,
+            'results': results}
+
+def machine_info():
+    """Returns a dict describing the machine and Python the run was on."""
+    return {'host': socket.gethostname(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': fourier.numpy.__version__
+                     if 'numpy' in fourier.engine_names() else None}
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares results against baseline results (both as returned by
+    run()), and returns a list of (name, n, old_median, new_median)
+    regressions: the benchmarks whose median is more than tolerance
+    (a fraction) slower than in the baseline, and also slower by more
+    than the baseline's interquartile range, so that noise alone is not
+    reported.
+    """
+    old = dict(((result['name'], result['n']), result)
+               for result in baseline['results'])
+    regressions = []
+    for result in results['results']:
+        previous = old.get((result['name'], result['n']))
+        if previous is None:
+            continue
+        slower = result['median'] - previous['median']
+        if slower > tolerance * previous['median'] and \
+           slower > previous['iqr']:
+            regressions.append((result['name'], result['n'],
+                                previous['median'], result['median']))
+    return regressions
+
+def save_results(results, path):
+    """Saves results (as returned by run()) to a JSON file."""
+    with open(path, 'w') as out_file:
+        json.dump(results, out_file, indent=1, sort_keys=True)
+
+def load_results(path):
+    """Loads results saved by save_results()."""
+    with open(path) as in_file:
+        return json.load(in_file)
+
+def main(argv=None):
+    """
+    Runs the benchmarks with the command line arguments in argv (or
+    sys.argv), and returns the exit status: 1 if there were regressions
+    against the baseline, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the transforms and polynomial "
+                    "multiplication in fourier.py.")
+    parser.add_argument('--min-power', type=int, default=4,
+                        help="smallest size, as a power of 2")
+    parser.add_argument('--max-power', type=int, default=12,
+                        help="largest size, as a power of 2")
+    parser.add_argument('--engines', nargs='*', default=None,
+                        help="transform engines (default: all)")
+    parser.add_argument('--multiply', nargs='*', default=None,
+                        choices=[name for (name, method) in MULTIPLY_PATHS],
+                        help="multiplication paths (default: all)")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file to save results to")
+    parser.add_argument('--baseline',
+                        help="JSON results to check for regressions against")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="slowdown (as a fraction) that counts as a "
+                             "regression")
+    args = parser.parse_args(argv)
+    fourier.set_demo_mode(False)
+    results = run(args.min_power, args.max_power, args.engines,
+                  args.multiply, args.repeats, args.warmup, args.seed)
+    if args.output:
+        save_results(results, args.output)
+    if not args.baseline:
+        return 0
+    regressions = compare(results, load_results(args.baseline),
+                          args.tolerance)
+    for (name, n, old_median, new_median) in regressions:
+        print "REGRESSION: %s n=%d median %.6fs -> %.6fs (%+.1f%%)" % \
+            (name, n, old_median, new_median,
+             100.0 * (new_median - old_median) / old_median)
+    if not regressions:
+        print "No regressions against", args.baseline
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+A module with the least-recently-used cache that fourier.py keeps its
+twiddle tables, NumPy arrays and the spectra of prepared polynomials
+in.
+
+Each cache is bounded by the memory its values take, as measured by a
+function given to it, rather than by how many there are, since a
+table for a large transform can take as much as thousands of small
+ones. The least recently used values are dropped once they take more
+than the limit, but the most recently used one is always kept, even if
+it is larger than the limit by itself. Every cache has its own lock,
+so threads using different caches do not wait for each other.
+
+"""
+
+import collections, threading
+
+class LRUCache(object):
+    """
+    A dict-like cache of at most about limit_bytes bytes of values,
+    where size_of(value) is the number of bytes a value takes. It
+    counts its hits and misses, which info() reports.
+    """
+    def __init__(self, limit_bytes, size_of):
+        self.limit = limit_bytes
+        self.size_of = size_of
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.__values = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__values)
+
+    def keys(self):
+        """Returns the keys, from least to most recently used."""
+        with self.lock:
+            return list(self.__values)
+
+    def get(self, key):
+        """Returns the value cached for key, or None if there is none."""
+        return self.lookup(key)[1]
+
+    def lookup(self, key, matches=None):
+        """
+        Returns a 2-tuple of a cached key and its value: key itself if
+        it is cached, otherwise (if matches is given) the most recently
+        used key for which matches(key) is True, or (None, None) if
+        there is no such key. The value found becomes the most recently
+        used.
+        """
+        with self.lock:
+            found = key if key in self.__values else None
+            if found is None and matches is not None:
+                for cached in reversed(self.__values):
+                    if matches(cached):
+                        found = cached
+                        break
+            if found is None:
+                self.misses += 1
+                return (None, None)
+            self.hits += 1
+            value = self.__values.pop(found)
+            self.__values[found] = value ## re-insert as most recently used
+            return (found, value)
+
+    def put(self, key, value):
+        """
+        Caches value for key, unless the key is already cached (by
+        another thread, say), and drops the least recently used values
+        that no longer fit.
+        """
+        value_bytes = self.size_of(value)
+        with self.lock:
+            if key not in self.__values:
+                self.__values[key] = value
+                self.bytes += value_bytes
+            self.__evict()
+
+    def set_limit(self, limit_bytes):
+        """Sets the byte limit, dropping the values that no longer fit."""
+        with self.lock:
+            self.limit = limit_bytes
+            self.__evict()
+
+    def clear(self):
+        """Drops every cached value."""
+        with self.lock:
+            self.__values.clear()
+            self.bytes = 0
+
+    def info(self):
+        """
+        Returns a dict with the number of cached values ('count'), the
+        bytes they take, the limit, and the number of hits and misses.
+        """
+        with self.lock:
+            return {'count': len(self.__values), 'bytes': self.bytes,
+                    'limit': self.limit, 'hits': self.hits,
+                    'misses': self.misses}
+
+    def __evict(self):
+        ## the caller holds the lock
+        while self.bytes > self.limit and len(self.__values) > 1:
+            (key, value) = self.__values.popitem(last=False)
+            self.bytes -= self.size_of(value)
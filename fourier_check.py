@@ -0,0 +1,490 @@
+"""
+A self-check for fourier.py, which compares every transform engine and
+every way of multiplying polynomials against a simple reference, so
+that a faster hot path can be shown to still give the right answers.
+
+Each transform is compared against the quadratic DFT (performDFT()),
+and transforming back must give the input again, and so is realFFT()
+for real lists of even length. Each product is
+compared against schoolbook_multiply(): products of integer
+polynomials must come back as exactly the same integers, and those of
+floating point or complex polynomials must agree to within a small
+error relative to the size of their coefficients. The products are
+checked for single pairs, batches (see multiply_polynomials_batch()),
+prepared polynomials (see prepare_polynomial()), CoefficientArrays,
+NumPy arrays if NumPy is installed, and integers too large for the
+floating point FFT to round exactly, and for powers and products of
+many polynomials (see polynomial_power() and product_tree()).
+
+Evaluating polynomials at many points (see evaluate_points()) is
+compared against Horner's rule, with the subproduct tree and without,
+at points that the tree handles well and at points that make its
+remainders blow up, and interpolate() must give back the polynomial
+the values came from. Polynomials in files are multiplied with
+multiply_polynomial_files() too.
+
+Usage: python fourier_check.py --seed 0
+"""
+
+import argparse, cmath, math, numbers, os, random, shutil, sys, tempfile
+from array import array
+import fourier, fourier_bench
+from fourier_array import CoefficientArray
+
+## the transform lengths that are checked: powers of 2 and lengths
+## with other (and prime) factors, around the DFT crossover too
+TRANSFORM_SIZES = (1, 2, 3, 4, 5, 6, 8, 12, 15, 16, 17, 30, 32, 64, 100,
+                   128, 256, 360, 512)
+
+## the (len(polynom1), len(polynom2)) pairs that products are checked
+## for, including an empty polynomial, whose products are empty
+PRODUCT_LENGTHS = ((0, 3), (1, 1), (1, 6), (2, 2), (7, 3), (16, 16),
+                   (64, 65), (100, 37), (300, 300), (1000, 700))
+
+## the largest error allowed in a transform or a product of floating
+## point values, relative to the largest coefficient of the reference
+__tolerance = 1e-9
+
+class CheckFailed(Exception):
+    """Raised by a check whose result does not match the reference."""
+    pass
+
+def close(result, expected, exact=False):
+    """
+    Raises CheckFailed unless result (a list, CoefficientArray or NumPy
+    array) has the same length as the list expected and each value
+    matches. If exact is True every value must be an integer equal to
+    the expected one, otherwise they may differ by a small error.
+    """
+    if hasattr(result, 'tolist'):
+        result = result.tolist()
+    result = list(result)
+    if len(result) != len(expected):
+        raise CheckFailed("%d values instead of %d" %
+                          (len(result), len(expected)))
+    if exact:
+        for (i, (value, wanted)) in enumerate(zip(result, expected)):
+            if not isinstance(value, numbers.Integral) or value != wanted:
+                raise CheckFailed("value %d is %r instead of %r" %
+                                  (i, value, wanted))
+        return
+    scale = max([1.0] + [abs(wanted) for wanted in expected])
+    error = max([0.0] + [abs(value - wanted)
+                         for (value, wanted) in zip(result, expected)])
+    if error > __tolerance * scale:
+        raise CheckFailed("error %.3g is larger than %.3g" %
+                          (error, __tolerance * scale))
+
+def random_polynomial(generator, length, kind, bits=4):
+    """
+    Returns a list of length random coefficients of the given kind:
+    'int' (of up to bits bits, with a random sign), 'float' or
+    'complex'.
+    """
+    if kind == 'int':
+        return [generator.randint(-2**bits, 2**bits) for i in xrange(length)]
+    if kind == 'float':
+        return [generator.uniform(-1, 1) for i in xrange(length)]
+    return [complex(generator.uniform(-1, 1), generator.uniform(-1, 1))
+            for i in xrange(length)]
+
+def transform_checks(engines, seed):
+    """
+    Yields a (name, check) pair for each engine and transform size,
+    where check() compares optimalFT() against performDFT() and checks
+    that optimal_inverseFT() undoes it.
+    """
+    for engine in engines:
+        for n in TRANSFORM_SIZES:
+            def check(engine=engine, n=n):
+                generator = random.Random((seed, engine, n))
+                a_list = random_polynomial(generator, n, 'complex')
+                spectrum = fourier.optimalFT(list(a_list), engine)
+                close(spectrum, fourier.performDFT(a_list))
+                close(fourier.optimal_inverseFT(spectrum, engine), a_list)
+            yield ('transform %s n=%d' % (engine, n), check)
+
+def real_checks(engines, seed):
+    """
+    Yields a (name, check) pair for each engine and transform size,
+    where check() compares realFFT() against the first half of
+    performDFT() and checks that inverse_realFFT() undoes it, and that
+    real_multiply() agrees with schoolbook_multiply(). Odd sizes (other
+    than 1) must raise a ValueError instead.
+    """
+    for engine in engines:
+        for n in TRANSFORM_SIZES:
+            def check(engine=engine, n=n):
+                generator = random.Random((seed, 'real', engine, n))
+                a_list = random_polynomial(generator, n, 'float')
+                b_list = random_polynomial(generator, n, 'float')
+                if n > 1 and n % 2:
+                    for (method, args) in ((fourier.realFFT, (a_list,)),
+                                           (fourier.real_multiply,
+                                            (a_list, b_list))):
+                        try:
+                            method(*args + (engine,))
+                        except ValueError:
+                            continue
+                        raise CheckFailed("%s() took an odd length" %
+                                          method.__name__)
+                    return
+                spectrum = fourier.realFFT(list(a_list), engine)
+                close(spectrum, fourier.performDFT(a_list)[:n/2 + 1])
+                close(fourier.inverse_realFFT(spectrum, engine), a_list)
+                ## the product of two halves fits in the length n
+                half = (n + 1) / 2
+                a_list[half:] = b_list[half:] = [0.0] * (n - half)
+                close(fourier.real_multiply(a_list, b_list, engine),
+                      fourier.schoolbook_multiply(a_list[:half],
+                                                  b_list[:half]) +
+                      [0.0] * (n - 2*half + 1))
+            yield ('real transform %s n=%d' % (engine, n), check)
+
+def product_checks(engines, seed):
+    """
+    Yields a (name, check) pair for every multiplication path in
+    fourier_bench.MULTIPLY_PATHS, and for multiply_polynomials() and
+    fft_multiply() with each engine, for every length pair in
+    PRODUCT_LENGTHS and every kind of coefficient.
+    """
+    paths = list(fourier_bench.MULTIPLY_PATHS)
+    for engine in engines:
+        paths.append(('multiply[%s]' % engine, lambda p1, p2, engine=engine:
+                      fourier.multiply_polynomials(p1, p2, engine)))
+        paths.append(('multiply_fft[%s]' % engine,
+                      lambda p1, p2, engine=engine:
+                          fourier.fft_multiply(p1, p2, engine)))
+    for (name, method) in paths:
+        for kind in ('int', 'float', 'complex'):
+            if name in ('multiply_ntt', 'multiply_karatsuba') and \
+               kind != 'int':
+                continue ## they only take integers
+            for (length1, length2) in PRODUCT_LENGTHS:
+                if name == 'multiply_dft' and length1 + length2 > 200:
+                    continue ## the DFT is quadratic
+                def check(method=method, kind=kind, length1=length1,
+                          length2=length2, exact=name != 'multiply_dft'):
+                    generator = random.Random((seed, kind, length1, length2))
+                    polynom1 = random_polynomial(generator, length1, kind)
+                    polynom2 = random_polynomial(generator, length2, kind)
+                    close(method(polynom1, polynom2),
+                          fourier.schoolbook_multiply(polynom1, polynom2),
+                          exact and kind == 'int')
+                yield ('%s %s %dx%d' % (name, kind, length1, length2), check)
+
+def batch_checks(engines, seed):
+    """
+    Yields a (name, check) pair for multiply_polynomials_batch() with
+    each engine (and 'ntt', 'schoolbook' and 'karatsuba'), on a batch
+    that mixes the lengths in PRODUCT_LENGTHS, kinds of coefficient,
+    prepared polynomials and CoefficientArrays, and checks that an
+    unknown engine is rejected.
+    """
+    for engine in list(engines) + ['ntt', 'schoolbook', 'karatsuba']:
+        for kind in ('int', 'float', 'complex'):
+            if engine in ('ntt', 'karatsuba') and kind != 'int':
+                continue ## they only take integers
+            def check(engine=engine, kind=kind):
+                generator = random.Random((seed, engine, kind))
+                pairs = []
+                for (length1, length2) in PRODUCT_LENGTHS:
+                    pairs.append((random_polynomial(generator, length1, kind),
+                                  random_polynomial(generator, length2, kind)))
+                expected = [fourier.schoolbook_multiply(polynom1, polynom2)
+                            for (polynom1, polynom2) in pairs]
+                ## the same pairs again, prepared or in CoefficientArrays
+                for (polynom1, polynom2) in list(pairs):
+                    pairs.append((fourier.prepare_polynomial(polynom1),
+                                  polynom2))
+                expected = expected + expected
+                if kind != 'int': ## a CoefficientArray holds complex values
+                    pairs.extend((CoefficientArray(polynom1), polynom2)
+                                 for (polynom1, polynom2) in pairs[:2])
+                    expected.extend(expected[:2])
+                products = list(fourier.multiply_polynomials_batch(pairs,
+                                                                   engine))
+                if len(products) != len(expected):
+                    raise CheckFailed("%d products instead of %d" %
+                                      (len(products), len(expected)))
+                for (product, wanted) in zip(products, expected):
+                    close(product, wanted, kind == 'int')
+            yield ('batch %s %s' % (engine, kind), check)
+    def check():
+        for method in (fourier.multiply_polynomials,
+                       lambda p1, p2, engine: list(
+                           fourier.multiply_polynomials_batch([(p1, p2)],
+                                                              engine))):
+            try:
+                method([1, 2, 3], [1, 1], 'no such engine')
+            except ValueError:
+                continue
+            raise CheckFailed("an unknown engine was accepted")
+    yield ('unknown engine', check)
+
+def prepared_checks(engines, seed):
+    """
+    Yields a (name, check) pair for multiply_polynomials() with one and
+    with both polynomials prepared, for each engine.
+    """
+    for engine in engines:
+        for kind in ('int', 'float', 'complex'):
+            def check(engine=engine, kind=kind):
+                generator = random.Random((seed, 'prepared', engine, kind))
+                for (length1, length2) in PRODUCT_LENGTHS:
+                    polynom1 = random_polynomial(generator, length1, kind)
+                    polynom2 = random_polynomial(generator, length2, kind)
+                    expected = fourier.schoolbook_multiply(polynom1, polynom2)
+                    prepared1 = fourier.prepare_polynomial(polynom1)
+                    prepared2 = fourier.prepare_polynomial(polynom2)
+                    close(fourier.multiply_polynomials(prepared1, polynom2,
+                                                       engine),
+                          expected, kind == 'int')
+                    close(fourier.fft_multiply(prepared1, prepared2, engine),
+                          expected, kind == 'int')
+            yield ('prepared %s %s' % (engine, kind), check)
+
+def large_integer_checks(engines, seed):
+    """
+    Yields a (name, check) pair for each engine, multiplying integers
+    too large for the floating point FFT to round exactly, on their
+    own, prepared and in a batch, which must still give exactly the
+    schoolbook product.
+    """
+    for engine in engines:
+        for (length, bits) in ((2000, 30), (300, 60), (40, 200)):
+            def check(engine=engine, length=length, bits=bits):
+                generator = random.Random((seed, 'large', engine, bits))
+                polynom1 = random_polynomial(generator, length, 'int', bits)
+                polynom2 = random_polynomial(generator, length, 'int', bits)
+                expected = fourier.karatsuba_multiply(polynom1, polynom2)
+                close(fourier.multiply_polynomials(polynom1, polynom2,
+                                                   engine), expected, True)
+                close(fourier.fft_multiply(polynom1, polynom2, engine),
+                      expected, True)
+                close(fourier.fft_multiply(
+                          fourier.prepare_polynomial(polynom1), polynom2,
+                          engine), expected, True)
+                (product,) = fourier.multiply_polynomials_batch(
+                    [(polynom1, polynom2)], engine)
+                close(product, expected, True)
+            yield ('large %s %dx%d bits=%d' % (engine, length, length, bits),
+                   check)
+
+def power_checks(seed):
+    """
+    Yields a (name, check) pair for polynomial_power() and
+    product_tree() on integers (including powers too large for the
+    floating point FFT, and NumPy arrays of integers if NumPy is
+    installed) and floats, against repeated schoolbook_multiply().
+    """
+    arrays = 'numpy' in fourier.engine_names()
+    for (kind, length, count) in (('int', 4, 30), ('int', 50, 8),
+                                  ('float', 50, 8)):
+        def check(kind=kind, length=length, count=count):
+            generator = random.Random((seed, 'power', kind, length))
+            polynom = random_polynomial(generator, length, kind)
+            polynoms = [random_polynomial(generator, length, kind)
+                        for i in xrange(count)]
+            expected_power = [1]
+            expected_product = [1]
+            for other in polynoms:
+                expected_power = fourier.schoolbook_multiply(expected_power,
+                                                             polynom)
+                expected_product = fourier.schoolbook_multiply(
+                    expected_product, other)
+            exact = kind == 'int'
+            close(fourier.polynomial_power(polynom, count), expected_power,
+                  exact)
+            close(fourier.product_tree(polynoms), expected_product, exact)
+            if arrays and exact:
+                numpy = fourier.numpy
+                close(fourier.polynomial_power(numpy.array(polynom), count),
+                      expected_power, exact)
+                close(fourier.product_tree([numpy.array(other)
+                                            for other in polynoms]),
+                      expected_product, exact)
+        yield ('power and product tree %s %d^%d' % (kind, length, count),
+               check)
+
+def horner(polynom, x):
+    """Returns the value of polynom at x, with Horner's rule."""
+    value = 0
+    for coefficient in reversed(polynom):
+        value = value * x + coefficient
+    return value
+
+def evaluation_checks(seed):
+    """
+    Yields a (name, check) pair for evaluate_points(), with its own
+    choice of method and with the subproduct tree, against Horner's
+    rule: at integer points (where the values must be exact), at
+    roots of unity, and at random real points and random points on
+    the unit circle, whose remainders blow up. Also yields checks that
+    interpolate() gives back the polynomial that integer values came
+    from, and interpolates complex values as their real and imaginary
+    parts.
+    """
+    cases = (('int', 'integers', 512), ('float', 'roots', 1024),
+             ('float', 'reals', 400), ('complex', 'circle', 1024))
+    for (kind, where, n) in cases:
+        for method in (None, 'tree'):
+            def check(kind=kind, where=where, n=n, method=method):
+                generator = random.Random((seed, 'evaluate', where, n))
+                polynom = random_polynomial(generator, n, kind)
+                if where == 'integers':
+                    points = range(-n / 2, n / 2)
+                elif where == 'roots':
+                    points = [cmath.exp(2j * math.pi * k / n)
+                              for k in xrange(n)]
+                elif where == 'reals':
+                    points = [generator.uniform(-1, 1) for i in xrange(n)]
+                else:
+                    points = [cmath.exp(2j * math.pi * generator.random())
+                              for i in xrange(n)]
+                close(fourier.evaluate_points(polynom, points,
+                                              method=method),
+                      [horner(polynom, x) for x in points], kind == 'int')
+            yield ('evaluate %s at %d %s, method %s' %
+                   (kind, n, where, method), check)
+    for n in (40, 512):
+        def check(n=n):
+            generator = random.Random((seed, 'interpolate', n))
+            polynom = random_polynomial(generator, n, 'int')
+            points = range(n)
+            close(fourier.interpolate(points,
+                                      [horner(polynom, x) for x in points]),
+                  polynom, True)
+            real = random_polynomial(generator, n, 'int')
+            imag = random_polynomial(generator, n, 'int')
+            close(fourier.interpolate(points, [complex(x, y) for (x, y)
+                                               in zip(real, imag)]),
+                  [complex(x, y) for (x, y) in
+                   zip(fourier.interpolate(points, real),
+                       fourier.interpolate(points, imag))])
+        yield ('interpolate %d integer points' % n, check)
+
+def file_checks(seed):
+    """
+    Yields a (name, check) pair for multiply_polynomial_files() on
+    files of integer and floating point coefficients, and on an empty
+    file, in a temporary directory.
+    """
+    for (kind, length1, length2) in (('int', 300, 200), ('float', 300, 200),
+                                     ('int', 0, 5)):
+        def check(kind=kind, length1=length1, length2=length2):
+            generator = random.Random((seed, 'file', kind))
+            polynom1 = [float(x) for x in
+                        random_polynomial(generator, length1, kind, 10)]
+            polynom2 = [float(x) for x in
+                        random_polynomial(generator, length2, kind, 10)]
+            temp_dir = tempfile.mkdtemp()
+            try:
+                paths = [os.path.join(temp_dir, name)
+                         for name in ('1.bin', '2.bin', 'product.bin')]
+                for (path, polynom) in zip(paths, (polynom1, polynom2)):
+                    with open(path, 'wb') as out_file:
+                        out_file.write(array('d', polynom).tostring())
+                fourier.multiply_polynomial_files(paths[0], paths[1],
+                                                  paths[2], block_size=64)
+                product = array('d')
+                with open(paths[2], 'rb') as in_file:
+                    product.fromstring(in_file.read())
+            finally:
+                shutil.rmtree(temp_dir)
+            expected = fourier.schoolbook_multiply(polynom1, polynom2)
+            if kind == 'int':
+                ## the exact check fails on any value that is not an integer
+                close([int(x) if x.is_integer() else x for x in product],
+                      [int(x) for x in expected], True)
+            else:
+                close(product, expected)
+        yield ('files %s %dx%d' % (kind, length1, length2), check)
+
+def numpy_checks(seed):
+    """
+    Yields a (name, check) pair for multiplying NumPy arrays of each
+    kind of coefficient, if NumPy is installed.
+    """
+    if 'numpy' not in fourier.engine_names():
+        return
+    numpy = fourier.numpy
+    for kind in ('int', 'float', 'complex'):
+        def check(kind=kind):
+            generator = random.Random((seed, 'numpy', kind))
+            for (length1, length2) in PRODUCT_LENGTHS:
+                polynom1 = random_polynomial(generator, length1, kind)
+                polynom2 = random_polynomial(generator, length2, kind)
+                close(fourier.multiply_polynomials(numpy.array(polynom1),
+                                                   numpy.array(polynom2)),
+                      fourier.schoolbook_multiply(polynom1, polynom2),
+                      kind == 'int')
+        yield ('numpy arrays %s' % kind, check)
+
+def checks(engines=None, seed=0):
+    """
+    Yields a (name, check) pair for every check, where check() raises
+    CheckFailed (or any other exception) if fourier.py gets it wrong.
+    """
+    if not engines:
+        engines = fourier.engine_names()
+    for make_checks in (transform_checks, real_checks, product_checks,
+                        batch_checks, prepared_checks,
+                        large_integer_checks):
+        for pair in make_checks(engines, seed):
+            yield pair
+    for pair in power_checks(seed):
+        yield pair
+    for pair in evaluation_checks(seed):
+        yield pair
+    for pair in file_checks(seed):
+        yield pair
+    for pair in numpy_checks(seed):
+        yield pair
+
+def run(engines=None, seed=0, verbose=False):
+    """
+    Runs every check and returns a list of the (name, message) of each
+    one that failed. Each failure is printed, and so is each check
+    that passed if verbose is True.
+    """
+    failures = []
+    for (name, check) in checks(engines, seed):
+        try:
+            check()
+        except Exception as error:
+            message = "%s: %s" % (type(error).__name__, error)
+            failures.append((name, message))
+            print "FAIL: %s: %s" % (name, message)
+        else:
+            if verbose:
+                print "ok: %s" % name
+        sys.stdout.flush()
+    return failures
+
+def main(argv=None):
+    """
+    Runs the checks with the command line arguments in argv (or
+    sys.argv), and returns the exit status: 1 if any check failed,
+    otherwise 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Checks the transforms and polynomial multiplication "
+                    "in fourier.py against the DFT and the schoolbook "
+                    "method.")
+    parser.add_argument('--engines', nargs='*', default=None,
+                        help="transform engines (default: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true',
+                        help="print every check, not just the failures")
+    args = parser.parse_args(argv)
+    fourier.set_demo_mode(False)
+    failures = run(args.engines, args.seed, args.verbose)
+    if failures:
+        print "%d checks failed" % len(failures)
+    else:
+        print "All checks passed"
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+A module for multiplying polynomials that are too large to fit in
+memory, by keeping their coefficients in files instead of lists.
+
+The coefficients are read from binary files of 8 byte floating point
+numbers (in the machine's byte order, as written by array('d')), with
+the constant (a_0) first, and the product is written the same way. The
+transforms themselves work on temporary files of complex numbers (an
+8 byte real part followed by an 8 byte imaginary part), which are
+mapped into memory with mmap, so the operating system only keeps the
+parts that are in use in memory.
+
+The FFT of a file is done with the four-step FFT (please see
+fourier_parallel.py), but with the matrix transposed on disk between
+the steps, so that every FFT is done on a row that is stored
+contiguously, and every pass over a file reads and writes it in
+order, a block of rows at a time. Only one block and a couple of rows
+(each about sqrt(n) long) are in memory at once.
+
+"""
+
+import math, mmap, os, tempfile
+from array import array
+import fourier
+from fourier_parallel import TwiddlePowers
+
+## the bytes taken by one complex number in a work file
+__complex_bytes = 16
+
+## the number of complex numbers read into memory at once
+__block_size = 2**16
+
+def multiply_polynomial_files(path1, path2, out_path, block_size=None,
+                              temp_dir=None):
+    """
+    The multiply_polynomial_files method multiplies the polynomials in
+    two coefficient files and writes the len1 + len2 - 1 coefficients
+    of their product to out_path.
+
+    Like real_multiply() in fourier.py, both (real) polynomials are
+    transformed together with one complex FFT, the first as the real
+    parts and the second as the imaginary parts. The product's
+    spectrum is formed from each pair of values k and n-k, and one
+    more FFT of its complex conjugate gives n times the product.
+
+    If every coefficient of both polynomials is an integer, and the
+    error bound of the product (please see fourier.norm_error_bound())
+    is under 0.5, the product is rounded to exact integers, as with
+    multiply_polynomials(). An empty file is an empty polynomial, and
+    so is its product with any other.
+
+    The temporary files are made in temp_dir, or in the same directory
+    as out_path if it is not given, since the system's temporary
+    directory is often too small for them.
+    """
+    if block_size is None:
+        block_size = __block_size
+    if temp_dir is None:
+        temp_dir = os.path.dirname(os.path.abspath(out_path))
+    length1 = os.path.getsize(path1) / 8
+    length2 = os.path.getsize(path2) / 8
+    if length1 < 1 or length2 < 1:
+        open(out_path, 'wb').close()
+        return 0
+    product_length = length1 + length2 - 1
+    n = fourier.padded_size(product_length)
+    work = __WorkFiles(n, temp_dir)
+    try:
+        (norm1, norm2, integer) = __pack_files(path1, path2, work.first, n,
+                                               block_size)
+        result = __fft_file(work, n, block_size)
+        __product_spectrum(result, n, block_size)
+        work.swap() ## the second FFT starts from the product spectrum
+        result = __fft_file(work, n, block_size)
+        rounded = integer and fourier.norm_error_bound(norm1, norm2, n) < 0.5
+        __write_product(result, out_path, product_length, n, block_size,
+                        rounded)
+    finally:
+        work.close()
+    return product_length
+
+def fft_file(in_path, out_path, block_size=None, temp_dir=None):
+    """
+    The fft_file method computes the FFT of a file of complex numbers
+    (whose length must be a power of 2) and writes it to out_path, in
+    the same format.
+    """
+    if block_size is None:
+        block_size = __block_size
+    if temp_dir is None:
+        temp_dir = os.path.dirname(os.path.abspath(out_path))
+    n = os.path.getsize(in_path) / __complex_bytes
+    if n != fourier.padded_size(n):
+        raise ValueError("the length of %s is not a power of 2" % in_path)
+    work = __WorkFiles(n, temp_dir)
+    try:
+        with open(in_path, 'rb') as in_file:
+            for start in xrange(0, n, block_size):
+                stop = min(start + block_size, n)
+                work.first[__complex_bytes * start:
+                           __complex_bytes * stop] = \
+                    in_file.read(__complex_bytes * (stop - start))
+        result = __fft_file(work, n, block_size)
+        with open(out_path, 'wb') as out_file:
+            for start in xrange(0, n, block_size):
+                stop = min(start + block_size, n)
+                out_file.write(result[__complex_bytes * start:
+                                      __complex_bytes * stop])
+    finally:
+        work.close()
+
+class __WorkFiles:
+    """
+    Two temporary files of n complex numbers, mapped into memory. The
+    FFT passes read from one and write to the other, and swap() swaps
+    which one is first.
+    """
+    def __init__(self, n, temp_dir):
+        self.files = []
+        self.maps = []
+        size = max(n, 1) * 16 ## 16 bytes per complex number
+        for i in xrange(2):
+            (handle, path) = tempfile.mkstemp(suffix='.fft', dir=temp_dir)
+            os.ftruncate(handle, size)
+            self.files.append((handle, path))
+            self.maps.append(mmap.mmap(handle, size))
+        (self.first, self.second) = self.maps
+
+    def swap(self):
+        (self.first, self.second) = (self.second, self.first)
+
+    def close(self):
+        for mapped in self.maps:
+            mapped.close()
+        for (handle, path) in self.files:
+            os.close(handle)
+            os.remove(path)
+
+def __fft_file(work, n, block_size):
+    """
+    Runs the four-step FFT of the n complex numbers in work.first, and
+    returns the mapped file (work.first or work.second) that holds the
+    result, in order.
+
+    Thinking of the file as a matrix of C rows of R numbers (so that
+    x[j1 + R*j2] is in row j2 and column j1), it is transposed so that
+    each column is a row, every row gets an FFT and is multiplied by
+    omega_n^(j1*k2), it is transposed back, every row gets another
+    FFT, and a last transpose puts the results in order.
+    """
+    columns = 1
+    while columns * columns < n:
+        columns *= 2
+    columns = max(1, columns / 2) if columns * columns > n else columns
+    rows = n / columns
+    __transpose(work.first, work.second, rows, columns, block_size)
+    __row_ffts(work.second, columns, rows, block_size, TwiddlePowers(n))
+    __transpose(work.second, work.first, columns, rows, block_size)
+    __row_ffts(work.first, rows, columns, block_size, None)
+    __transpose(work.first, work.second, rows, columns, block_size)
+    return work.second
+
+def __transpose(source, destination, rows, columns, block_size):
+    """
+    Writes the transpose of the rows x columns matrix of complex
+    numbers in source to destination. The source is read a band of
+    whole rows at a time, and each column of the band is written to
+    its place in a row of the destination.
+    """
+    band = max(1, block_size / columns)
+    for start in xrange(0, rows, band):
+        stop = min(start + band, rows)
+        data = array('d')
+        data.fromstring(source[__complex_bytes * start * columns:
+                               __complex_bytes * stop * columns])
+        out = array('d', [0.0]) * (2 * (stop - start))
+        for column in xrange(columns):
+            out[0::2] = data[2*column::2*columns]
+            out[1::2] = data[2*column + 1::2*columns]
+            offset = column * rows
+            destination[__complex_bytes * (offset + start):
+                        __complex_bytes * (offset + stop)] = out.tostring()
+
+def __row_ffts(mapped, rows, columns, block_size, powers):
+    """
+    Replaces each row of the rows x columns matrix of complex numbers
+    in the mapped file with its FFT, a band of rows at a time. If
+    powers is given, element k of row r is also multiplied by
+    omega_n^(r*k).
+    """
+    band = max(1, block_size / columns)
+    for start in xrange(0, rows, band):
+        stop = min(start + band, rows)
+        data = array('d')
+        data.fromstring(mapped[__complex_bytes * start * columns:
+                               __complex_bytes * stop * columns])
+        for row in xrange(start, stop):
+            offset = 2 * (row - start) * columns
+            values = [complex(data[offset + 2*k], data[offset + 2*k + 1])
+                      for k in xrange(columns)]
+            values = fourier.optimalFT(values, 'iterative')
+            for k in xrange(columns):
+                value = values[k]
+                if powers is not None and row and k:
+                    value *= powers.get(row * k)
+                data[offset + 2*k] = value.real
+                data[offset + 2*k + 1] = value.imag
+        mapped[__complex_bytes * start * columns:
+               __complex_bytes * stop * columns] = data.tostring()
+
+def __pack_files(path1, path2, mapped, n, block_size):
+    """
+    Writes the coefficients of path1 as the real parts and those of
+    path2 as the imaginary parts of the n complex numbers in the mapped
+    file, padded with zeroes. Returns a 3-tuple of the Euclidean norms
+    of the two polynomials, and whether all of their coefficients are
+    integers.
+    """
+    squares = [0.0, 0.0]
+    integer = True
+    with open(path1, 'rb') as file1:
+        with open(path2, 'rb') as file2:
+            for start in xrange(0, n, block_size):
+                stop = min(start + block_size, n)
+                out = array('d', [0.0]) * (2 * (stop - start))
+                for (in_file, part) in ((file1, 0), (file2, 1)):
+                    values = array('d')
+                    values.fromstring(in_file.read(8 * (stop - start)))
+                    out[part:2*len(values):2] = values
+                    squares[part] += sum(x * x for x in values)
+                    integer = integer and all(x.is_integer()
+                                              for x in values)
+                mapped[__complex_bytes * start:
+                       __complex_bytes * stop] = out.tostring()
+    return (math.sqrt(squares[0]), math.sqrt(squares[1]), integer)
+
+def __product_spectrum(mapped, n, block_size):
+    """
+    Replaces the FFT z of the packed polynomials in the mapped file with
+    the complex conjugate of the spectrum of their product. Each value
+    at k is computed from z_k and z_(n-k), so the file is read from
+    both ends at once, and the values at k and n-k are written
+    together.
+    """
+    def product(z, z_mirror):
+        z_conjugate = z_mirror.conjugate()
+        return ((z*z - z_conjugate*z_conjugate) * -0.25j).conjugate()
+    def read(start, stop):
+        data = array('d')
+        data.fromstring(mapped[__complex_bytes * start:
+                               __complex_bytes * stop])
+        return [complex(data[2*k], data[2*k + 1])
+                for k in xrange(stop - start)]
+    def write(start, values):
+        data = array('d', [0.0]) * (2 * len(values))
+        data[0::2] = array('d', [value.real for value in values])
+        data[1::2] = array('d', [value.imag for value in values])
+        mapped[__complex_bytes * start:
+               __complex_bytes * (start + len(values))] = data.tostring()
+    half = n / 2
+    ## the values at 0 and n/2 are their own mirrors
+    for k in set([0, half]):
+        z = read(k, k + 1)[0]
+        write(k, [product(z, z)])
+    for start in xrange(1, half, block_size):
+        stop = min(start + block_size, half)
+        front = read(start, stop)
+        back = read(n - stop + 1, n - start + 1)
+        back.reverse() ## so that back[i] is the mirror of front[i]
+        products = [product(z, z_mirror)
+                    for (z, z_mirror) in zip(front, back)]
+        write(start, products)
+        mirrors = [value.conjugate() for value in products]
+        mirrors.reverse()
+        write(n - stop + 1, mirrors)
+
+def __write_product(mapped, out_path, product_length, n, block_size,
+                    rounded=False):
+    """
+    Writes the real parts of the first product_length values of the
+    mapped file, divided by n, to out_path. If rounded is True they are
+    all rounded to the nearest integer, and otherwise only the values
+    that are within 1e-12 of an integer are, as with sanitize_value().
+    """
+    scale = 1.0 / n
+    with open(out_path, 'wb') as out_file:
+        for start in xrange(0, product_length, block_size):
+            stop = min(start + block_size, product_length)
+            data = array('d')
+            data.fromstring(mapped[__complex_bytes * start:
+                                   __complex_bytes * stop])
+            if rounded:
+                out = array('d', [round(x * scale) for x in data[0::2]])
+            else:
+                out = array('d', [float(fourier.sanitize_value(x * scale))
+                                  for x in data[0::2]])
+            out_file.write(out.tostring())
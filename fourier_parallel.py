@@ -0,0 +1,240 @@
+"""
+A module for running very large FFTs from fourier.py on all of the
+cores of a machine.
+
+A transform of length n = R * C is split with the four-step FFT:
+thinking of the coefficients as a matrix of C rows and R columns,
+
+1. every column (of C elements) gets its own FFT,
+2. each result is multiplied by a twiddle factor, omega_n^(j1*k2),
+3. every row of the result (of R elements) gets its own FFT,
+
+and the values come out in order if step 3 writes each row's results
+with a stride of C. The FFTs within steps 1 and 3 are independent, so
+they are divided between the processes of a multiprocessing pool.
+
+The coefficients are kept in two shared memory buffers of interleaved
+real and imaginary parts, which the worker processes inherit when the
+pool is created, so only the small task descriptions are pickled and
+sent to the workers, never the lists themselves. The pool and its
+buffers are created the first time they are needed and kept for the
+transforms after it, so that each transform does not have to start
+its own processes. They are only made again for a transform too long
+for the buffers, or after set_parallel().
+
+Daemonic processes (such as the workers of fourier_service.py) cannot
+start processes of their own, so they transform serially instead.
+
+"""
+
+import math, multiprocessing, os, threading
+from multiprocessing.sharedctypes import RawArray
+import fourier
+
+## the number of worker processes (None for one per CPU) and the
+## smallest transform that is worth starting a pool for. Below that,
+## the serial iterative engine is used.
+__workers = None
+__min_size = 2**18
+
+## the shared buffers, set in each worker process by __init_worker()
+__buffers = None
+
+## the pool, as a tuple of (pool, first buffer, second buffer, the
+## number of complex numbers the buffers hold, the number of workers,
+## the id of the process that made it), or None before the first
+## parallel transform. The lock is held while the pool is in use, so
+## that two threads never share the buffers.
+__pool = None
+__pool_lock = threading.Lock()
+
+def set_parallel(workers=None, min_size=None):
+    """
+    Sets the number of worker processes (None for one per CPU) and, if
+    given, the smallest transform length that is done in parallel. The
+    pool is closed, and is made again with the new number of workers
+    by the next parallel transform.
+    """
+    global __workers, __min_size
+    with __pool_lock:
+        __workers = workers
+        if min_size is not None:
+            __min_size = min_size
+        __close_pool()
+
+def get_parallel():
+    """Returns a 2-tuple of the (workers, min_size) settings."""
+    return (__workers, __min_size)
+
+def parallelFFT(a_list):
+    """
+    The parallelFFT method computes the same values as the serial FFT
+    engines, with the four-step FFT split over a pool of processes.
+    Lists shorter than the minimum size, or whose length is prime, are
+    transformed serially.
+    """
+    n = len(a_list)
+    rows = __split_length(n)
+    if n < __min_size or rows == 1 or __daemonic():
+        return fourier.optimalFT(a_list, 'iterative')
+    return __four_step(a_list, rows, False)
+
+def parallel_inverseFFT(y_list):
+    """
+    The parallel_inverseFFT method is the inverse of parallelFFT(). It
+    uses the fact that the inverse FFT of y is the complex conjugate of
+    the FFT of y's complex conjugate, divided by n.
+    """
+    n = len(y_list)
+    rows = __split_length(n)
+    if n < __min_size or rows == 1 or __daemonic():
+        return fourier.optimal_inverseFT(y_list, 'iterative')
+    return __four_step(y_list, rows, True)
+
+def __daemonic():
+    """
+    Returns True in a daemonic process, which multiprocessing does not
+    allow to start a pool of its own.
+    """
+    return multiprocessing.current_process().daemon
+
+def __split_length(n):
+    """
+    Returns the largest factor of n that is no more than its square
+    root, which is the number of columns (R) for the four-step FFT.
+    """
+    factor = int(math.sqrt(n))
+    while factor > 1 and n % factor:
+        factor -= 1
+    return max(factor, 1)
+
+def __four_step(a_list, columns, inverse):
+    """
+    Runs the four-step FFT of a_list, viewed as a matrix with the given
+    number of columns, and returns the result. If inverse is True, the
+    inverse FFT is computed instead.
+    """
+    n = len(a_list)
+    rows = n / columns
+    sign = -1.0 if inverse else 1.0
+    with __pool_lock:
+        (pool, first, second, workers) = __get_pool(n)
+        first[0:2*n:2] = [float(complex(x).real) for x in a_list]
+        first[1:2*n:2] = [sign * complex(x).imag for x in a_list]
+        try:
+            ## step 1 and 2: one FFT per column, into the rows of second
+            pool.map(__run_task, __tasks('columns', columns, n, columns,
+                                         workers))
+            ## step 3: one FFT per row of second, written back to first
+            ## with a stride, in order
+            pool.map(__run_task, __tasks('rows', rows, n, columns,
+                                         workers))
+        except BaseException:
+            ## the workers may be left in any state
+            __close_pool()
+            raise
+        real = first[0:2*n:2]
+        imag = first[1:2*n:2]
+    if not inverse:
+        return [complex(x, y) for (x, y) in zip(real, imag)]
+    scale = 1.0 / n
+    return [fourier.sanitize_value(complex(x * scale, -y * scale))
+            for (x, y) in zip(real, imag)]
+
+def __get_pool(n):
+    """
+    Returns a 4-tuple of the pool, its two shared buffers (which hold
+    at least n complex numbers) and its number of workers, making them
+    first if there are none yet, or if the buffers are too short. A
+    pool inherited from the parent process is left to the parent. The
+    caller holds __pool_lock.
+    """
+    global __pool
+    if __pool is not None and __pool[5] != os.getpid():
+        __pool = None
+    if __pool is not None and __pool[3] < n:
+        __close_pool()
+    if __pool is None:
+        first = RawArray('d', 2 * n)
+        second = RawArray('d', 2 * n)
+        workers = __workers or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(workers, initializer=__init_worker,
+                                    initargs=(first, second))
+        __pool = (pool, first, second, n, workers, os.getpid())
+    return __pool[:3] + __pool[4:5]
+
+def __close_pool():
+    """
+    Closes the pool, if this process made one, and waits for its
+    workers to exit. The caller holds __pool_lock.
+    """
+    global __pool
+    if __pool is not None and __pool[5] == os.getpid():
+        __pool[0].terminate()
+        __pool[0].join()
+    __pool = None
+
+def __tasks(phase, count, n, columns, workers):
+    """
+    Divides the count columns or rows of a phase into a few tasks per
+    worker, as (phase, start, stop, n, columns) tuples.
+    """
+    chunk = max(1, count / (4 * workers))
+    return [(phase, start, min(start + chunk, count), n, columns)
+            for start in xrange(0, count, chunk)]
+
+def __init_worker(first, second):
+    """Keeps the shared buffers in a worker process."""
+    global __buffers
+    __buffers = (first, second)
+
+def __run_task(task):
+    """
+    Runs the FFTs of one task in a worker process. In the 'columns'
+    phase, column j1 of the first buffer is transformed, multiplied by
+    omega_n^(j1*k2) and stored as row j1 of the second buffer. In the
+    'rows' phase, column k2 of the second buffer is transformed and
+    stored with a stride of C from k2 in the first buffer. Only the
+    first n values of each buffer are used, since the buffers may have
+    been made for a longer transform.
+    """
+    (phase, start, stop, n, columns) = task
+    (first, second) = __buffers
+    rows = n / columns
+    if phase == 'columns':
+        powers = TwiddlePowers(n)
+        for j1 in xrange(start, stop):
+            column = [complex(x, y) for (x, y) in
+                      zip(first[2*j1:2*n:2*columns],
+                          first[2*j1 + 1:2*n:2*columns])]
+            column = fourier.optimalFT(column, 'iterative')
+            for k2 in xrange(1, rows):
+                column[k2] *= powers.get(j1 * k2)
+            second[2*j1*rows:2*(j1 + 1)*rows:2] = \
+                [complex(x).real for x in column]
+            second[2*j1*rows + 1:2*(j1 + 1)*rows:2] = \
+                [complex(x).imag for x in column]
+    else:
+        for k2 in xrange(start, stop):
+            row = [complex(x, y) for (x, y) in
+                   zip(second[2*k2:2*n:2*rows], second[2*k2 + 1:2*n:2*rows])]
+            row = fourier.optimalFT(row, 'iterative')
+            first[2*k2:2*n:2*rows] = [complex(x).real for x in row]
+            first[2*k2 + 1:2*n:2*rows] = [complex(x).imag for x in row]
+
+class TwiddlePowers:
+    """
+    Computes omega_n^m for any m below n with one multiplication, from
+    two tables of about sqrt(n) roots each: omega_n^m is
+    omega_n^(m mod T) times omega_n^(T * (m div T)). This keeps each
+    worker (or each pass of fourier_outofcore.py) from building a
+    twiddle table of all n roots.
+    """
+    def __init__(self, n):
+        self.step = int(math.ceil(math.sqrt(n)))
+        self.low = [fourier.getRoU(n, t) for t in xrange(self.step)]
+        self.high = [fourier.getRoU(n, self.step * u)
+                     for u in xrange(n / self.step + 1)]
+
+    def get(self, m):
+        return self.low[m % self.step] * self.high[m / self.step]
@@ -0,0 +1,437 @@
+"""
+A module that serves polynomial multiplication to many concurrent
+clients, such as the requests of a network service, without letting
+one long transform hold up all the others.
+
+Requests are put on a bounded queue, and a dispatcher thread takes
+them off in small time windows: the requests that arrive within a
+window and pad to the same transform size (see
+fourier.transform_size()) are multiplied together as one batch with
+fourier.multiply_polynomials_batch(), which shares the twiddle tables
+(and, with NumPy, every level of the FFT) between them. The batches
+are run on a pool of worker processes, so the transforms run in
+parallel and do not compete with the threads handling the clients.
+
+When the workers fall behind, the number of batches in flight is
+capped, the queue fills up, and new requests wait (or are turned away)
+instead of piling up without limit. Every request records how long it
+waited in the queue and how long it took altogether, and stats()
+reports the percentiles of both.
+
+The service can also be run as a small server on a Unix socket, which
+reads one JSON request per line, {"a": [...], "b": [...]}, and writes
+back one JSON reply per line, {"product": [...], "latency_ms": ...}.
+
+Usage: python fourier_service.py --socket /tmp/fourier.sock --workers 4
+"""
+
+import argparse, collections, json, multiprocessing, os, Queue, \
+    SocketServer, sys, threading, timeit
+import fourier
+
+## the number of recent requests that the latency percentiles are
+## computed from
+LATENCY_WINDOW = 4096
+
+class PendingProduct(object):
+    """
+    A product that has been asked for but may not be computed yet, as
+    returned by MultiplyService.submit(). The times are in seconds from
+    timeit.default_timer().
+    """
+    def __init__(self, polynom1, polynom2):
+        self.polynom1 = polynom1
+        self.polynom2 = polynom2
+        self.submitted = timeit.default_timer()
+        self.started = None
+        self.finished = None
+        self.__done = threading.Event()
+        self.__product = None
+        self.__error = None
+
+    def done(self):
+        """Returns True if the product (or an error) is ready."""
+        return self.__done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Waits up to timeout seconds (or for as long as it takes, if it is
+        None) and returns the product, or raises the exception that
+        computing it raised. Raises Queue.Empty if it is not ready in
+        time.
+        """
+        if not self.__done.wait(timeout):
+            raise Queue.Empty("The product is not ready yet")
+        if self.__error is not None:
+            raise self.__error
+        return self.__product
+
+    @property
+    def wait(self):
+        """The seconds the request waited before its batch started."""
+        if self.started is None:
+            return None
+        return self.started - self.submitted
+
+    @property
+    def latency(self):
+        """The seconds from submitting the request to its result."""
+        if self.finished is None:
+            return None
+        return self.finished - self.submitted
+
+    def _finish(self, product=None, error=None):
+        self.finished = timeit.default_timer()
+        self.__product = product
+        self.__error = error
+        self.__done.set()
+
+class MultiplyService(object):
+    """
+    Multiplies polynomials for concurrent callers, coalescing the
+    requests that arrive within window seconds of each other and pad to
+    the same transform size into batches of at most max_batch pairs.
+
+    At most max_queue requests wait in the queue, and at most
+    max_in_flight batches are given to the workers at once (by default
+    two per worker, so each one has the next batch ready). With
+    workers=0 the batches are run by the dispatcher thread itself.
+
+    A batch that the workers have not finished within batch_timeout
+    seconds (because a worker died, say) fails each of its requests
+    with multiprocessing.TimeoutError, so that they and the batches
+    waiting behind them are not held up forever.
+    """
+    def __init__(self, workers=None, window=0.002, max_queue=1024,
+                 max_batch=64, max_in_flight=None, engine=None,
+                 batch_timeout=60.0):
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if max_in_flight is None:
+            max_in_flight = max(1, 2 * workers)
+        self.window = window
+        self.max_batch = max_batch
+        self.engine = engine
+        self.batch_timeout = batch_timeout
+        self.queue = Queue.Queue(max_queue)
+        self.pool = multiprocessing.Pool(workers) if workers else None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.waits = collections.deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'requests': 0, 'rejected': 0, 'errors': 0,
+                       'batches': 0, 'batched_requests': 0}
+        self.closed = False
+        self.stalled = False ## set once a batch on the pool has timed out
+        self.dispatcher = threading.Thread(target=self.__dispatch,
+                                           name='fourier-dispatcher')
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def submit(self, polynom1, polynom2, block=True, timeout=None):
+        """
+        Queues the product of two polynomials and returns a
+        PendingProduct for it. If the queue is full this waits for room
+        (up to timeout seconds, if block is True), and then raises
+        Queue.Full, so that a server can turn the request away.
+        """
+        if self.closed:
+            raise ValueError("The service has been closed")
+        pending = PendingProduct(polynom1, polynom2)
+        try:
+            self.queue.put(pending, block, timeout)
+        except Queue.Full:
+            with self.lock:
+                self.counts['rejected'] += 1
+            raise
+        return pending
+
+    def multiply(self, polynom1, polynom2, timeout=None):
+        """
+        Returns the product of two polynomials, waiting in line with the
+        other requests (see submit()).
+        """
+        return self.submit(polynom1, polynom2).result(timeout)
+
+    def stats(self):
+        """
+        Returns a dict of the service's counts (requests, rejected,
+        errors, batches and the mean batch size), the number of requests
+        in the queue, and the 50th, 95th and 99th percentiles and the
+        maximum of the recent requests' latency_ms and wait_ms.
+        """
+        with self.lock:
+            result = dict(self.counts)
+            latencies = sorted(self.latencies)
+            waits = sorted(self.waits)
+        batches = result.pop('batched_requests')
+        result['mean_batch'] = \
+            float(batches) / result['batches'] if result['batches'] else 0.0
+        result['queued'] = self.queue.qsize()
+        result['latency_ms'] = self.__percentiles(latencies)
+        result['wait_ms'] = self.__percentiles(waits)
+        return result
+
+    def close(self):
+        """
+        Stops taking requests, finishes the ones already queued, and
+        stops the workers. If a batch has timed out, the pool would wait
+        for it forever, so the workers are terminated instead.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None) ## tells the dispatcher to stop
+        self.dispatcher.join()
+        if self.pool is not None:
+            if self.stalled:
+                self.pool.terminate()
+            else:
+                self.pool.close()
+            self.pool.join()
+
+    def __dispatch(self):
+        """
+        The dispatcher thread: collects a window of requests, groups
+        them by transform size, and runs each group as a batch, until
+        close() queues None.
+        """
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            requests = [first]
+            stopping = False
+            deadline = timeit.default_timer() + self.window
+            while len(requests) < self.max_batch:
+                remaining = deadline - timeit.default_timer()
+                try:
+                    if remaining > 0:
+                        pending = self.queue.get(True, remaining)
+                    else:
+                        pending = self.queue.get(False)
+                except Queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                requests.append(pending)
+            groups = collections.OrderedDict()
+            for pending in requests:
+                size = fourier.transform_size(
+                    len(pending.polynom1) + len(pending.polynom2) - 1,
+                    self.engine)
+                groups.setdefault(size, []).append(pending)
+            for group in groups.itervalues():
+                self.__run(group)
+            if stopping:
+                return
+
+    def __run(self, group):
+        """
+        Runs a batch of requests, on the pool if there is one, once
+        fewer than max_in_flight batches are running.
+        """
+        self.in_flight.acquire()
+        started = timeit.default_timer()
+        for pending in group:
+            pending.started = started
+        pairs = [(pending.polynom1, pending.polynom2) for pending in group]
+        if self.pool is None:
+            self.__finish(group, batch_task(pairs, self.engine))
+            return
+        try:
+            result = self.pool.apply_async(batch_task, (pairs, self.engine))
+        except Exception:
+            self.__fail(group, sys.exc_info()[1])
+            return
+        ## a pool callback never runs if the worker dies or its result
+        ## cannot be pickled, so a thread waits for the result instead
+        watcher = threading.Thread(target=self.__watch, args=(group, result),
+                                   name='fourier-batch')
+        watcher.daemon = True
+        watcher.start()
+
+    def __watch(self, group, result):
+        """
+        Waits up to batch_timeout seconds for the result of a batch on
+        the pool, and finishes its requests with it, or with the error
+        that getting it raised.
+        """
+        try:
+            outcome = result.get(self.batch_timeout)
+        except multiprocessing.TimeoutError as error:
+            self.stalled = True
+            self.__fail(group, error)
+        except Exception:
+            self.__fail(group, sys.exc_info()[1])
+        else:
+            self.__finish(group, outcome)
+
+    def __fail(self, group, error):
+        """Finishes every request of a batch with the same error."""
+        self.__finish(group, [(None, error)] * len(group))
+
+    def __finish(self, group, outcome):
+        """
+        Hands each request of a batch its product or its error, records
+        their times, and lets the next batch start.
+        """
+        errors = 0
+        for (pending, (product, error)) in zip(group, outcome):
+            pending._finish(product, error)
+            if error is not None:
+                errors += 1
+        with self.lock:
+            self.counts['requests'] += len(group)
+            self.counts['errors'] += errors
+            self.counts['batches'] += 1
+            self.counts['batched_requests'] += len(group)
+            for pending in group:
+                self.latencies.append(pending.latency)
+                self.waits.append(pending.wait)
+        self.in_flight.release()
+
+    def __percentiles(self, ordered):
+        """
+        Returns a dict of the p50, p95, p99 and max, in milliseconds, of
+        a sorted list of times in seconds.
+        """
+        if not ordered:
+            return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+        pick = lambda q: 1000.0 * ordered[min(len(ordered) - 1,
+                                              int(q * len(ordered)))]
+        return {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99),
+                'max': 1000.0 * ordered[-1]}
+
+def multiply_batch(pairs, engine=None):
+    """
+    The multiply_batch method returns the list of products of a list of
+    (polynom1, polynom2) pairs, as lists, with
+    fourier.multiply_polynomials_batch(). The products of integer pairs
+    are exact lists of integers.
+    """
+    fourier.set_demo_mode(False)
+    return [product.tolist() if hasattr(product, 'tolist')
+            else list(product)
+            for product in fourier.multiply_polynomials_batch(pairs, engine)]
+
+def batch_task(pairs, engine=None):
+    """
+    The batch_task method is what the workers run on each batch. It
+    returns a list with a 2-tuple for every pair: its product (see
+    multiply_batch()) and None, or None and the exception multiplying it
+    raised, since a Python 2 pool has no way to hand an exception to a
+    callback. If the batch fails, its pairs are multiplied one at a
+    time, so that one bad request does not fail the others.
+    """
+    try:
+        return [(product, None) for product in multiply_batch(pairs, engine)]
+    except Exception:
+        if len(pairs) == 1:
+            return [(None, sys.exc_info()[1])]
+    return [batch_task([pair], engine)[0] for pair in pairs]
+
+class ServiceHandler(SocketServer.StreamRequestHandler):
+    """
+    Handles one client connection: each line it sends is a JSON object
+    with the coefficient lists "a" and "b" (and optionally an "id",
+    which is sent back), or {"stats": true} for the service's stats().
+    Each reply is one line of JSON, with the "product" and its
+    "latency_ms" and "wait_ms", or an "error" (which is "busy" if the
+    queue stayed full for the server's timeout, and "timeout" if the
+    product was not ready within its result_timeout).
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            reply = self.__reply(line)
+            self.wfile.write(json.dumps(reply) + "\n")
+            self.wfile.flush()
+
+    def __reply(self, line):
+        service = self.server.service
+        try:
+            request = json.loads(line)
+            if request.get('stats'):
+                return service.stats()
+            reply = {'id': request.get('id')}
+            pending = service.submit(request['a'], request['b'],
+                                     timeout=self.server.timeout_seconds)
+            reply['product'] = pending.result(self.server.result_timeout)
+            reply['latency_ms'] = 1000.0 * pending.latency
+            reply['wait_ms'] = 1000.0 * pending.wait
+            return reply
+        except Queue.Full:
+            return {'error': 'busy'}
+        except Queue.Empty:
+            return {'error': 'timeout'}
+        except Exception as error:
+            return {'error': "%s: %s" % (type(error).__name__, error)}
+
+class ServiceServer(SocketServer.ThreadingMixIn,
+                    SocketServer.UnixStreamServer):
+    """
+    A Unix socket server with a thread per client, which all submit to
+    one MultiplyService. A request that cannot be queued within
+    timeout_seconds is answered with a "busy" error, and one whose
+    product is not ready result_timeout seconds later (None waits for
+    as long as it takes) with a "timeout" error.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, service, timeout_seconds=1.0,
+                 result_timeout=120.0):
+        if os.path.exists(path):
+            os.remove(path)
+        SocketServer.UnixStreamServer.__init__(self, path, ServiceHandler)
+        self.service = service
+        self.timeout_seconds = timeout_seconds
+        self.result_timeout = result_timeout
+
+def main(argv=None):
+    """
+    Runs the service on a Unix socket, with the command line arguments
+    in argv (or sys.argv), until it is interrupted.
+    """
+    parser = argparse.ArgumentParser(
+        description="Serves polynomial multiplication on a Unix socket.")
+    parser.add_argument('--socket', default='/tmp/fourier.sock',
+                        help="path of the Unix socket")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU, "
+                             "0 to multiply in the dispatcher thread)")
+    parser.add_argument('--window-ms', type=float, default=2.0,
+                        help="how long to wait for requests to batch")
+    parser.add_argument('--max-queue', type=int, default=1024)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--busy-timeout', type=float, default=1.0,
+                        help="seconds to wait for room in the queue "
+                             "before answering busy")
+    parser.add_argument('--batch-timeout', type=float, default=60.0,
+                        help="seconds a worker has to finish a batch")
+    parser.add_argument('--result-timeout', type=float, default=120.0,
+                        help="seconds to wait for a product before "
+                             "answering timeout")
+    parser.add_argument('--engine', default=None)
+    args = parser.parse_args(argv)
+    fourier.set_demo_mode(False)
+    service = MultiplyService(args.workers, args.window_ms / 1000.0,
+                              args.max_queue, args.max_batch,
+                              engine=args.engine,
+                              batch_timeout=args.batch_timeout)
+    server = ServiceServer(args.socket, service, args.busy_timeout,
+                           args.result_timeout)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+        service.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
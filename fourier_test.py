@@ -1,11 +1,15 @@
-import fourier, sys
+import fourier_bench, fourier_check, sys
 
-sys.setrecursionlimit(6000)
-
-# note: the xrange function in Python uses an inclusive lower
-# bound and an exclusive upper bound.
-input_size = 20
-print "----Now Running Test on Input Size 2^n, n =", input_size
+# checks every engine and multiplication path against the DFT and the
+# schoolbook method (see fourier_check.py), then runs the benchmark
+# suite in fourier_bench.py, with any of its command line arguments
+# (try --help), e.g. to compare against a saved run:
+#   python fourier_test.py --output new.json --baseline old.json
+print "----Now Running Checks"
+sys.stdout.flush()
+status = fourier_check.main([])
+print "----Now Running Benchmarks"
 sys.stdout.flush()
-fourier.run_test(input_size)
+status = fourier_bench.main() or status
 print "----Testing over--------------------------"
+sys.exit(status)
@@ -0,0 +1,397 @@
+"""
+A module for finding, on the machine it runs on, the input sizes where
+the FFT engines in fourier.py become faster than the DFT.
+
+The fixed crossover of 64 terms in fourier.py was measured with
+run_test() on a single laptop, but the crossover is different on every
+machine (and for every engine), so autotune() times the DFT and the
+FFT of each engine on random lists of every power of 2 up to a maximum
+size, and builds a dispatch table for each engine that uses the DFT up
+to the size where the FFT takes over, and the FFT above it.
+
+Each timing is the median of several runs, and the crossover is the
+one that would have cost the least over all of the sizes timed, rather
+than wherever the DFT happened to win, so one disturbed run does not
+leave a hole in the table or move the crossover much.
+
+The same goes for the lengths below which multiplying polynomials
+directly (with the schoolbook method, or Karatsuba's) is faster than
+with the FFT, which measure_crossovers() finds, and for the number of
+points below which evaluating a polynomial with Horner's rule is faster
+than with the subproduct tree, which measure_evaluation_crossover()
+finds.
+
+The tables and crossovers are saved to a small JSON cache file
+(~/.fourier_tune.json, or the file named by the FOURIER_TUNE_CACHE
+environment variable), under this machine's host name, so they only
+have to be measured once per machine.
+
+"""
+
+import json, os, socket, timeit
+import fourier
+
+## the largest power of 2 measured when tuning on first use. The DFT
+## is quadratic, so the crossover is well below this on any machine.
+__first_use_max_power = 8
+
+## the longest polynomials timed when measuring the multiplication
+## crossovers on first use
+__first_use_max_size = 256
+
+## the most points timed when measuring the evaluation crossover on
+## first use. The crossover is usually larger, and is then
+## extrapolated from the timings (see measure_evaluation_crossover()).
+__first_use_max_points = 256
+
+## the largest evaluation crossover that is extrapolated
+__max_evaluation_crossover = 2**20
+
+## each timing in time_method() calls the method at least this many
+## seconds in all, since a single call on a short list takes about as
+## long as the timer's resolution
+__min_timing = 1e-3
+
+## the engines that transform every length tuned with another engine,
+## and so simply share its table: the 'parallel' engine hands lists
+## shorter than its min_size to the 'iterative' engine (please see
+## fourier_parallel.py)
+__shared_tables = {'parallel': 'iterative'}
+
+def cache_path():
+    """Returns the path of the tuning cache file."""
+    return os.environ.get('FOURIER_TUNE_CACHE',
+                          os.path.join(os.path.expanduser('~'),
+                                       '.fourier_tune.json'))
+
+def load_tables(path=None):
+    """
+    Returns the dispatch tables saved for this machine in the cache
+    file, as a dict mapping engine names to lists of booleans, or None
+    if the file does not exist or has no tables for this machine.
+    """
+    if path is None:
+        path = cache_path()
+    try:
+        with open(path) as cache_file:
+            saved = json.load(cache_file)
+    except (IOError, ValueError):
+        return None
+    tables = saved.get(socket.gethostname())
+    if not tables:
+        return None
+    ## the multiplication crossovers are saved with the tables, as a
+    ## dict, and so is the evaluation crossover, as a number (please
+    ## see load_crossovers() and load_evaluation_crossover()). Tables
+    ## with a False element were saved before the tables were made to
+    ## switch to the FFT only once, and are measured again.
+    return dict((str(engine), [True] * len(table))
+                for (engine, table) in tables.items()
+                if isinstance(table, list) and all(table)) or None
+
+def save_tables(tables, path=None):
+    """
+    Saves the dispatch tables for this machine to the cache file,
+    keeping the other tables saved there for this machine and the
+    tables for other machines. The file is written to a temporary file
+    first and then renamed, so that a process reading it never sees
+    half of it.
+    """
+    if path is None:
+        path = cache_path()
+    try:
+        with open(path) as cache_file:
+            saved = json.load(cache_file)
+    except (IOError, ValueError):
+        saved = {}
+    saved.setdefault(socket.gethostname(), {}).update(tables)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'w') as cache_file:
+        json.dump(saved, cache_file, indent=1, sort_keys=True)
+    os.rename(temp_path, path)
+
+def time_method(method, a_list, repeats=5):
+    """
+    Returns the median of repeats timings of method(a_list), in
+    seconds. Each timing calls the method as many times as it takes to
+    last at least __min_timing seconds, and is divided by that number.
+    The median is not thrown off by a run that the rest of the machine
+    slowed down, nor by one that was lucky.
+    """
+    number = 1
+    start_time = timeit.default_timer()
+    method(a_list)
+    total_time = timeit.default_timer() - start_time
+    if total_time < __min_timing:
+        number = int(__min_timing / max(total_time, 1e-7)) + 1
+    times = []
+    for i in xrange(repeats):
+        start_time = timeit.default_timer()
+        for j in xrange(number):
+            method(a_list)
+        times.append((timeit.default_timer() - start_time) / number)
+    times.sort()
+    return times[len(times) / 2]
+
+def best_crossover(times):
+    """
+    Accepts a list of (slow_time, fast_time) pairs for growing sizes,
+    where the slow method should be used up to some size and the fast
+    one above it, and returns the number of sizes to use the slow
+    method for (0 to len(times)): the one with the least total time
+    over all of the sizes. A size where the two methods take about as
+    long hardly changes the total, however the timings there fall.
+    """
+    ## all of the sizes use the fast method to begin with
+    total = sum(fast for (slow, fast) in times)
+    best = (total, 0)
+    for (count, (slow, fast)) in enumerate(times):
+        total += slow - fast
+        best = min(best, (total, count + 1))
+    return best[1]
+
+def measure_table(engine, max_power, repeats=5):
+    """
+    Times the DFT and the FFT of the named engine on a random list of
+    every length 2^k for k up to max_power, and returns the dispatch
+    table, a list of True for each size k that should use the DFT
+    (please see best_crossover()). Lists longer than the table use the
+    FFT, so it has no False elements.
+
+    The engines in __shared_tables are not timed themselves, and get
+    the table of the engine they use instead.
+    """
+    engine = __shared_tables.get(engine, engine)
+    forward = fourier.get_engine(engine)[0]
+    times = []
+    for k in xrange(max_power + 1):
+        a_list = fourier.gen_random_list(2**k)
+        if engine == 'numpy':
+            a_list = fourier.numpy.asarray(a_list,
+                                           dtype=fourier.numpy.complex128)
+        times.append((time_method(fourier.performDFT, a_list, repeats),
+                      time_method(forward, a_list, repeats)))
+    return [True] * best_crossover(times)
+
+def autotune(max_power=10, repeats=5, engines=None, save=True, path=None,
+             multiply=True):
+    """
+    Measures the dispatch table of each engine (every registered
+    engine, if engines is None) and, if multiply is True, the
+    multiplication crossovers (see measure_crossovers()) and the
+    evaluation crossover (see measure_evaluation_crossover()), starts
+    using them in fourier.py and, if save is True, saves them to the
+    cache file. The tables (and the crossovers, as 'multiply' and
+    'evaluation') are also returned.
+    """
+    if engines is None:
+        engines = fourier.engine_names()
+    tables = {}
+    for engine in engines:
+        shared = __shared_tables.get(engine, engine)
+        if shared not in tables:
+            tables[shared] = measure_table(shared, max_power, repeats)
+        tables[engine] = tables[shared]
+    tables = dict((engine, tables[engine]) for engine in engines)
+    fourier.set_dispatch_tables(tables)
+    if multiply:
+        crossovers = measure_crossovers(repeats=repeats)
+        fourier.set_multiply_crossovers(**crossovers)
+        evaluation = measure_evaluation_crossover(repeats=repeats)
+        fourier.set_evaluation_crossover(evaluation)
+    if save:
+        save_tables(tables, path)
+        if multiply:
+            save_tables({'multiply': crossovers,
+                         'evaluation': evaluation}, path)
+    if multiply:
+        tables['multiply'] = crossovers
+        tables['evaluation'] = evaluation
+    return tables
+
+def load_or_tune(engines=None):
+    """
+    Returns the dispatch tables from the cache file. The engines (every
+    registered engine, if engines is None) that have no saved table are
+    tuned first (up to 2^__first_use_max_power terms, to keep this
+    quick, and only once for the engines in __shared_tables), unless the FOURIER_AUTOTUNE environment variable is set to
+    0, in which case they are left out and use the default crossover.
+    """
+    if engines is None:
+        engines = fourier.engine_names()
+    tables = load_tables() or {}
+    missing = [engine for engine in engines if engine not in tables]
+    if missing and os.environ.get('FOURIER_AUTOTUNE', '1') != '0':
+        for engine in missing:
+            shared = __shared_tables.get(engine)
+            if shared in tables:
+                tables[engine] = tables[shared]
+            else:
+                tables[engine] = measure_table(engine, __first_use_max_power)
+        try:
+            save_tables(tables)
+        except (IOError, OSError):
+            pass ## the tables are still used, just not saved
+    return tables
+
+def load_crossovers(path=None):
+    """
+    Returns the multiplication crossovers saved for this machine in the
+    cache file, as a dict with the 'schoolbook' and 'karatsuba' lengths
+    (please see fourier.multiply_method()), or None if there are none.
+    """
+    if path is None:
+        path = cache_path()
+    try:
+        with open(path) as cache_file:
+            saved = json.load(cache_file)
+    except (IOError, ValueError):
+        return None
+    crossovers = saved.get(socket.gethostname(), {}).get('multiply')
+    if not isinstance(crossovers, dict):
+        return None
+    return dict((str(method), int(length))
+                for (method, length) in crossovers.items())
+
+def measure_crossovers(max_size=512, repeats=5):
+    """
+    Times schoolbook_multiply(), karatsuba_multiply() and
+    fft_multiply() on pairs of random integer polynomials of lengths
+    growing by about sqrt(2) up to max_size, and returns the
+    crossovers: the length up to which the schoolbook method should be
+    used, and the length up to which Karatsuba's method should be used
+    above that, as best_crossover() picks them.
+    """
+    methods = (('schoolbook', fourier.schoolbook_multiply),
+               ('karatsuba', fourier.karatsuba_multiply),
+               ('fft', fourier.fft_multiply))
+    lengths = []
+    times = []
+    length = 4
+    while length <= max_size:
+        polynom1 = fourier.gen_random_list(length)
+        polynom2 = fourier.gen_random_list(length)
+        lengths.append(length)
+        times.append(dict((name, time_method(lambda pair: method(*pair),
+                                             (polynom1, polynom2), repeats))
+                          for (name, method) in methods))
+        length = int(length * 1.4142135623730951 + 0.5)
+    ## the schoolbook method against the better of the other two, and
+    ## then Karatsuba's method against the FFT above that
+    schoolbook = best_crossover([(time['schoolbook'],
+                                  min(time['karatsuba'], time['fft']))
+                                 for time in times])
+    karatsuba = schoolbook + best_crossover([(time['karatsuba'],
+                                              time['fft'])
+                                             for time in times[schoolbook:]])
+    return {'schoolbook': lengths[schoolbook - 1] if schoolbook else 0,
+            'karatsuba': lengths[karatsuba - 1] if karatsuba else 0}
+
+def load_or_tune_crossovers():
+    """
+    Returns the multiplication crossovers from the cache file, measuring
+    (up to __first_use_max_size) and saving them first if there are
+    none, unless the FOURIER_AUTOTUNE environment variable is set to 0,
+    in which case None is returned and fourier.py uses its defaults.
+    """
+    crossovers = load_crossovers()
+    if crossovers is None and os.environ.get('FOURIER_AUTOTUNE', '1') != '0':
+        crossovers = measure_crossovers(__first_use_max_size)
+        try:
+            save_tables({'multiply': crossovers})
+        except (IOError, OSError):
+            pass ## the crossovers are still used, just not saved
+    return crossovers
+
+def load_evaluation_crossover(path=None):
+    """
+    Returns the evaluation crossover (please see
+    fourier.evaluate_points()) saved for this machine in the cache
+    file, or None if there is none.
+    """
+    if path is None:
+        path = cache_path()
+    try:
+        with open(path) as cache_file:
+            saved = json.load(cache_file)
+    except (IOError, ValueError):
+        return None
+    crossover = saved.get(socket.gethostname(), {}).get('evaluation')
+    if not isinstance(crossover, int):
+        return None
+    return crossover
+
+def measure_evaluation_crossover(max_points=1024, repeats=5):
+    """
+    Times fourier.evaluate_points() with Horner's rule and with the
+    subproduct tree, for a random integer polynomial of n coefficients
+    at the n-th roots of unity (the points the tree handles best), for
+    n doubling from 64 up to max_points, and returns the crossover: the
+    most points at which Horner's rule was still as fast.
+
+    If Horner's rule was faster at every size, the crossover is
+    extrapolated from the largest one, since Horner's rule takes time
+    proportional to n^2 and the tree to n log^2 n.
+    """
+    import cmath, math
+    n = 64
+    crossover = 0
+    while n <= max_points:
+        polynom = fourier.gen_random_list(n)
+        points = [cmath.exp(2j * math.pi * k / n) for k in xrange(n)]
+        (horner_time, tree_time) = [
+            time_method(lambda polynom: fourier.evaluate_points(
+                            polynom, points, method=method),
+                        polynom, repeats)
+            for method in ('horner', 'tree')]
+        if tree_time < horner_time:
+            return crossover
+        crossover = n
+        n *= 2
+    ## the tree was ratio times slower at the last size timed, and
+    ## that shrinks in proportion to log^2 n / n
+    measured = crossover
+    ratio = tree_time / max(horner_time, 1e-9)
+    while crossover < __max_evaluation_crossover:
+        n = 2 * crossover
+        if ratio * (float(measured) / n) * \
+           (math.log(n) / math.log(measured))**2 < 1:
+            break
+        crossover = n
+    return crossover
+
+def load_or_tune_evaluation_crossover():
+    """
+    Returns the evaluation crossover from the cache file, measuring (up
+    to __first_use_max_points) and saving it first if there is none,
+    unless the FOURIER_AUTOTUNE environment variable is set to 0, in
+    which case None is returned and fourier.py uses its default.
+    """
+    crossover = load_evaluation_crossover()
+    if crossover is None and os.environ.get('FOURIER_AUTOTUNE', '1') != '0':
+        crossover = measure_evaluation_crossover(__first_use_max_points)
+        try:
+            save_tables({'evaluation': crossover})
+        except (IOError, OSError):
+            pass ## the crossover is still used, just not saved
+    return crossover
+
+def compare_multiply_engines(max_power=12, engines=None, repeats=5):
+    """
+    Times multiply_polynomials() with each engine (by default the
+    default FFT engine and the exact 'ntt' engine) on pairs of random
+    polynomials of every length 2^k for k up to max_power, and returns
+    a dict mapping each engine name to its list of times, in seconds.
+    """
+    if engines is None:
+        engines = [None, 'ntt']
+    times = dict((engine, []) for engine in engines)
+    for k in xrange(max_power + 1):
+        polynom1 = fourier.gen_random_list(2**k)
+        polynom2 = fourier.gen_random_list(2**k)
+        for engine in engines:
+            times[engine].append(time_method(
+                lambda pair: fourier.multiply_polynomials(pair[0], pair[1],
+                                                          engine),
+                (polynom1, polynom2), repeats))
+    return times
@@ -4,73 +4,127 @@ Author:Gabriel Arellano
 Advanced Algorithms - Fall 2014 - UTEP
 Prof: Dr Longpre
 
-A class I created to help keep track of the timing of my recursiveFFT
-algorithm for the course project. It will track a series of
-experiments into one object, with an array for each datapoint. In this
-case, I had to keep track of two start/stop timings and an input size,
-so there are five arrays in the TimeDict object.
+A class I created to help keep track of the timing of my FFT
+algorithms. The engines in fourier.py report how long each phase of a
+transform took (see fourier.enable_profiling()), and a TimeDict adds
+the time to a record for the engine and input size.
 
-I noticed that I have to keep the timing of two distinct windows of
-time, as well as the size of the input.
+Originally this kept every start and stop time in five lists, which
+grew with every call, so a large run took more memory for the timings
+than for the transform. Now each record is a fixed-size histogram per
+phase: a count, a total, and the number of calls whose time in
+nanoseconds fell in each power of 2. The memory used only grows with
+the number of different engines and sizes, and the records can be
+written out as CSV or JSON.
 
 """
 
-import sys
+import json, timeit
+from array import array
+
+## the phases of a transform that are timed. 'total' is the whole
+## call, and the rest are the parts of a divide and conquer FFT:
+## splitting the input, the recursive calls (or the smaller FFTs), and
+## combining the results with butterflies.
+PHASES = ('total', 'split', 'recurse', 'combine')
+
+## bucket b counts the calls that took from 2^b up to 2^(b+1)
+## nanoseconds (bucket 0 also counts anything shorter)
+BUCKETS = 48
+
+def clock():
+    """
+    Returns the current time in nanoseconds, as an integer. This uses
+    the most precise timer the platform has (timeit.default_timer).
+    """
+    return int(timeit.default_timer() * 1e9)
 
 class TimeDict:
     def __init__(self):
-        self.start0 = []
-        self.end0 = [] 
-        self.start1 = []
-        self.end1 = []
-        self.n = []
-        
-    def add(self, start_zero, end_zero, start_one, end_one, lngth):
-        """add one set of data points from one experimental run"""
-        if self.data_ready_for_append():
-            self.start0.append(start_zero)
-            self.end0.append(end_zero) 
-            self.start1.append(start_one)
-            self.end1.append(end_one)
-            self.n.append(lngth)
-        else:
-            ## light error checking
-            print "Something went wrong, lists of unequal length.", \
-                "Some data is missing so the remaining data", \
-                "appended would not be valid."
-            sys.stdout.flush()
-            sys.exit(1) # exit since there's a problem
-
-    def print_results(self, output_on=True, save_data=False):
-        """print_results can either print to stdout, a file, or both"""
-        out_file = None
-        if save_data:
-            out_file = open("overhead_stats.csv", 'w')
-        for i in xrange(len(self.start0)):
-            total_time = repr(float(self.end0[i] - self.start0[i]) + \
-                         float(self.end1[i] - self.start1[i]))
-            if output_on:
-                print "Number of elements:", self.n[i], \
-                    " | Total time spent:", repr(total_time)
-            if save_data:
-                out_string = str(self.n[i]) + ","+ \
-                             str(total_time)+ "\n"
-                out_file.write(out_string)
-        if save_data:
-            out_file.close()
-            
-    def print_and_write_results(self):
-        """wrapper for print_results, causes data to save to file"""
-        self.print_results(save_data=True)
-    
-    def write_results(self):
-        """wrapper for print_results, writes to file, not stdout"""
-        self.print_results(output_on=False, save_data=True)
-
-    def data_ready_for_append(self):
+        ## maps (name, n) to a 2-tuple of arrays: the call counts and
+        ## histograms, and the total nanoseconds of each phase
+        self.records = {}
+
+    def add(self, name, n, phase, elapsed):
+        """
+        Adds one timing, of elapsed nanoseconds, to the phase of the
+        record for the named engine and input size n.
+        """
+        key = (name, n)
+        record = self.records.get(key)
+        if record is None:
+            record = (array('L', [0]) * (len(PHASES) * (BUCKETS + 1)),
+                      array('d', [0.0]) * len(PHASES))
+            self.records[key] = record
+        (counts, totals) = record
+        index = PHASES.index(phase)
+        bucket = min(max(int(elapsed), 1).bit_length() - 1, BUCKETS - 1)
+        counts[index * (BUCKETS + 1)] += 1
+        counts[index * (BUCKETS + 1) + 1 + bucket] += 1
+        totals[index] += elapsed
+
+    def clear(self):
+        """removes every record"""
+        self.records.clear()
+
+    def results(self):
         """
-        checks if all object lists are equal length, i.e. that the
-        object still has a valid state.
+        Returns a list of dicts, one per engine, size and phase that was
+        timed, sorted by engine and size. Each has the name, n, phase,
+        calls, total_ns and mean_ns, the median_ns (the upper bound of
+        the bucket that holds the median call) and the histogram.
         """
-        return len(self.start0) == len(self.end0) == \
-            len(self.start1) == len(self.end1)
+        rows = []
+        for (name, n) in sorted(self.records):
+            (counts, totals) = self.records[(name, n)]
+            for (index, phase) in enumerate(PHASES):
+                start = index * (BUCKETS + 1)
+                calls = counts[start]
+                if not calls:
+                    continue
+                histogram = list(counts[start + 1:start + 1 + BUCKETS])
+                rows.append({'name': name, 'n': n, 'phase': phase,
+                             'calls': calls, 'total_ns': totals[index],
+                             'mean_ns': totals[index] / calls,
+                             'median_ns': self.__median(histogram, calls),
+                             'histogram': histogram})
+        return rows
+
+    def __median(self, histogram, calls):
+        """
+        Returns the upper bound, in nanoseconds, of the histogram bucket
+        that holds the median call.
+        """
+        seen = 0
+        for (bucket, count) in enumerate(histogram):
+            seen += count
+            if 2 * seen >= calls:
+                return 2**(bucket + 1)
+        return 2**len(histogram)
+
+    def print_results(self):
+        """prints one line of results per engine, size and phase"""
+        for row in self.results():
+            print "Engine:", row['name'], "| n:", row['n'], \
+                "| phase:", row['phase'], "| calls:", row['calls'], \
+                "| total ns:", int(row['total_ns']), \
+                "| mean ns:", int(row['mean_ns'])
+
+    def write_csv(self, path="overhead_stats.csv"):
+        """
+        writes the results, without the histograms, to a CSV file with
+        a header line
+        """
+        columns = ('name', 'n', 'phase', 'calls', 'total_ns', 'mean_ns',
+                   'median_ns')
+        with open(path, 'w') as out_file:
+            out_file.write(",".join(columns) + "\n")
+            for row in self.results():
+                out_file.write(",".join(str(row[column])
+                                        for column in columns) + "\n")
+
+    def write_json(self, path="overhead_stats.json"):
+        """writes the results, with the histograms, to a JSON file"""
+        with open(path, 'w') as out_file:
+            json.dump({'buckets': BUCKETS, 'results': self.results()},
+                      out_file, indent=1, sort_keys=True)